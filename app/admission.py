@@ -0,0 +1,102 @@
+import asyncio
+import logging
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from kombu.exceptions import ChannelError
+
+from app import metrics
+from app.celery_app import celery_app
+from app.config import settings
+
+logger = logging.getLogger("app.admission")
+
+# Admission control for write and bulk routes. Each route gets a gate: at most ADMISSION_<KIND>_LIMIT
+# of its requests run at once, up to ADMISSION_<KIND>_QUEUE more wait for a slot, and the rest are
+# turned away at once with 503 and Retry-After. Waiting happens on the event loop, so a queued or
+# rejected request never holds a threadpool thread or the SQLite writer lock; reads keep both.
+# Limits are per worker process.
+
+
+def _rejected(status_code: int, gate: str, reason: str, detail: str) -> HTTPException:
+    metrics.ADMISSION_REJECTIONS.labels(gate, reason).inc()
+    return HTTPException(status_code=status_code, detail=detail,
+                         headers={"Retry-After": str(settings.admission_retry_after)})
+
+
+class Gate:
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.waiting = 0
+        self._semaphore = None
+        self._key = None
+
+    def _limits(self):
+        return getattr(settings, f"admission_{self.kind}_limit"), getattr(settings, f"admission_{self.kind}_queue")
+
+    def _semaphore_for(self, limit: int) -> asyncio.Semaphore:
+        # asyncio primitives belong to one event loop; rebuild for a new loop or a new limit
+        key = (asyncio.get_running_loop(), limit)
+        if self._key != key:
+            self._key, self._semaphore, self.waiting = key, asyncio.Semaphore(limit), 0
+        return self._semaphore
+
+    async def __call__(self):
+        limit, queue = self._limits()
+        if not settings.admission_enabled or not limit:
+            yield
+            return
+
+        semaphore = self._semaphore_for(limit)
+        if semaphore.locked():
+            if self.waiting >= queue:
+                raise _rejected(503, self.name, "queue_full", "Server busy, retry later")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(semaphore.acquire(), settings.admission_queue_timeout)
+            except asyncio.TimeoutError:
+                raise _rejected(503, self.name, "timeout", "Server busy, retry later")
+            finally:
+                self.waiting -= 1
+        else:
+            await semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+# One gate per route, shared by its sync and async handlers
+GATES = {}
+
+
+def gate(name: str, kind: str = "write") -> Gate:
+    return GATES.setdefault(name, Gate(name, kind))
+
+
+def task_backlog() -> int:
+    # Messages waiting in the default Celery queue; nothing is queued when tasks run eagerly
+    if celery_app.conf.task_always_eager:
+        return 0
+    with celery_app.connection_for_read() as conn:
+        conn.ensure_connection(max_retries=1)
+        try:
+            declared = conn.default_channel.queue_declare(queue=celery_app.conf.task_default_queue, passive=True)
+        except ChannelError:
+            return 0  # not declared yet, so empty
+        return declared.message_count
+
+
+async def import_backlog():
+    # Bulk uploads fan out into import tasks; refuse new ones while the workers are behind
+    limit = settings.admission_max_task_backlog
+    if not settings.admission_enabled or not limit:
+        return
+    try:
+        backlog = await run_in_threadpool(task_backlog)
+    except Exception:
+        logger.exception("Could not read the Celery queue depth")
+        raise _rejected(503, "import_backlog", "broker_unavailable", "Task queue unavailable, retry later")
+    if backlog >= limit:
+        raise _rejected(429, "import_backlog", "backlog", f"{backlog} tasks are waiting, retry later")
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import ArchiveSessionLocal, dialect_insert
+
+# Rentals returned before a cutoff are copied to the archive database and deleted from `rentals`,
+# so the live table and its indexes only hold active and recently closed rentals. Rollups are
+# unaffected: archived rentals were counted when they were returned.
+
+
+def archive_batch(db: Session, archive_db: Session, cutoff: datetime, batch_size: int) -> int:
+    rental, vehicle = models.Rental, models.Vehicle
+    # Oldest returns first, a range scan on ix_rentals_active_due
+    rows = db.execute(
+        select(*rental.__table__.columns, vehicle.type.label("vehicle_type"))
+        .outerjoin(vehicle, vehicle.id == rental.vehicle_id)
+        .where(rental.actual_return < cutoff)
+        .order_by(rental.actual_return)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return 0
+
+    # Copy first and commit, then delete. The databases don't share a transaction; if the delete is
+    # lost, the next run copies the same rows again, which is a no-op.
+    archived_at = datetime.utcnow()
+    archived = models.ArchivedRental.__table__
+    archive_db.execute(
+        dialect_insert(archive_db, archived).on_conflict_do_nothing(index_elements=[archived.c.id]),
+        [{**row._mapping, "archived_at": archived_at} for row in rows],
+    )
+    archive_db.commit()
+
+    # An id already in the archive is only a lost delete if the copy there is this rental. Otherwise the
+    # id was reused (a table that predates AUTOINCREMENT, see app.schema) and deleting would lose the row.
+    ids = [row.id for row in rows]
+    columns = [column.name for column in rental.__table__.columns]
+    copies = {copy.id: tuple(copy) for copy in archive_db.execute(
+        select(*(archived.c[name] for name in columns)).where(archived.c.id.in_(ids))
+    )}
+    mismatched = [row.id for row in rows if copies.get(row.id) != tuple(getattr(row, name) for name in columns)]
+    if mismatched:
+        raise RuntimeError(f"Archive already holds different rentals with ids {mismatched}; nothing was deleted")
+
+    db.execute(delete(models.RentalReminder).where(models.RentalReminder.rental_id.in_(ids)))
+    db.execute(delete(rental).where(rental.id.in_(ids), rental.actual_return < cutoff))
+    db.commit()
+    return len(ids)
+
+
+def archive_rentals(db: Session, archive_db: Session, cutoff: datetime, batch_size: int, max_batches: int) -> int:
+    moved = 0
+    for _ in range(max_batches):
+        count = archive_batch(db, archive_db, cutoff, batch_size)
+        moved += count
+        if count < batch_size:
+            break
+    return moved
+
+
+def get_rental(rental_id: int):
+    # Fallback for reads by id that miss the live table
+    with ArchiveSessionLocal() as archive_db:
+        return archive_db.get(models.ArchivedRental, rental_id)
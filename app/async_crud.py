@@ -0,0 +1,136 @@
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from . import cache, crud, models, rollups, schemas, versions
+from .expansion import attach, latest_statement, load_options, to_many
+from .pagination import page_of, seek
+from datetime import datetime
+from typing import Optional
+
+# asyncio counterparts of the crud.py functions served by the async routers
+
+
+async def _page(db: AsyncSession, stmt, key_column, after_id: Optional[int], limit: int, entities: bool = False):
+    result = await db.execute(seek(stmt, key_column, after_id, limit))
+    return page_of(result.scalars().all() if entities else result.all(), key_column, limit)
+
+async def _first(db: AsyncSession, stmt):
+    return (await db.execute(stmt)).scalars().first()
+
+async def _apply(db: AsyncSession, statements):
+    for stmt, params in statements:
+        await db.execute(stmt, params)
+
+async def _instance(db: AsyncSession, model, values):
+    instance = model(**values)
+    make_transient_to_detached(instance)
+    return await db.merge(instance, load=False)
+
+async def _loaded(db: AsyncSession, model, row):
+    return await _instance(db, model, row._mapping)
+
+async def _row(db: AsyncSession, columns, *criteria) -> Optional[dict]:
+    row = (await db.execute(select(*columns).where(*criteria))).first()
+    return None if row is None else dict(row._mapping)
+
+# Vehicles
+async def get_vehicles(db: AsyncSession, after_id: Optional[int] = None, limit: int = 100,
+                       is_available: Optional[bool] = None, type: Optional[str] = None):
+    stmt = select(*crud.VEHICLE_COLUMNS).where(*crud.vehicle_filters(is_available, type))
+    return await _page(db, stmt, models.Vehicle.id, after_id, limit)
+
+async def get_vehicle(db: AsyncSession, vehicle_id: int, version: Optional[str] = None):
+    values = await cache.vehicles.get_async(
+        vehicle_id, lambda: _row(db, crud.VEHICLE_COLUMNS, models.Vehicle.id == vehicle_id), version,
+    )
+    return None if values is None else await _instance(db, models.Vehicle, values)
+
+async def create_veh(db: AsyncSession, vehicle: schemas.VehicleCreate):
+    row = (await db.execute(crud.insert_vehicle(vehicle))).one()
+    await db.commit()
+    # The version store may be Redis, which is blocking I/O
+    await run_in_threadpool(versions.vehicles_changed, [row.id])
+    return await _loaded(db, models.Vehicle, row)
+
+# Users
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    row = (await db.execute(crud.insert_user(user))).one()
+    await db.commit()
+    return await _loaded(db, models.User, row)
+
+async def _load_to_many(db: AsyncSession, relations, expand, parents):
+    if parents:
+        for attr in to_many(relations, expand):
+            attach(attr, parents, (await db.execute(latest_statement(attr, parents))).scalars().all())
+    return parents
+
+async def get_users(db: AsyncSession, after_id: Optional[int] = None, limit: int = 100, expand=()):
+    if expand:
+        stmt = select(models.User).options(*load_options(crud.USER_RELATIONS, expand))
+        users, next_after_id = await _page(db, stmt, models.User.id, after_id, limit, entities=True)
+        return await _load_to_many(db, crud.USER_RELATIONS, expand, users), next_after_id
+    return await _page(db, select(*crud.USER_COLUMNS), models.User.id, after_id, limit)
+
+async def get_user(db: AsyncSession, user_id: int, expand=()):
+    if expand:
+        stmt = select(models.User).options(*load_options(crud.USER_RELATIONS, expand))
+        user = await _first(db, stmt.where(models.User.id == user_id))
+        if user is not None:
+            await _load_to_many(db, crud.USER_RELATIONS, expand, [user])
+        return user
+    values = await cache.users.get_async(user_id, lambda: _row(db, crud.USER_COLUMNS, models.User.id == user_id))
+    return None if values is None else await _instance(db, models.User, values)
+
+# Rentals
+async def create_rental(db: AsyncSession, rental: schemas.RentalCreate):
+    if (await db.execute(crud.claim_vehicle(rental.vehicle_id))).rowcount != 1:
+        await db.rollback()
+        exists = await get_vehicle(db, rental.vehicle_id) is not None
+        raise crud.vehicle_unavailable_error(rental.vehicle_id, exists)
+
+    row = (await db.execute(crud.insert_rental(rental))).one()
+    await _apply(db, rollups.on_checkout(db, [row]))
+    await db.commit()
+    await run_in_threadpool(versions.vehicles_changed, [row.vehicle_id])
+    return await _loaded(db, models.Rental, row)
+
+async def get_rentals(db: AsyncSession, after_id: Optional[int] = None, limit: int = 100,
+                      user_id: Optional[int] = None, vehicle_id: Optional[int] = None,
+                      status: Optional[schemas.RentalStatus] = None,
+                      expected_return_from: Optional[datetime] = None,
+                      expected_return_to: Optional[datetime] = None, expand=()):
+    criteria = crud.rental_filters(user_id, vehicle_id, status, expected_return_from, expected_return_to)
+    if expand:
+        stmt = select(models.Rental).options(*load_options(crud.RENTAL_RELATIONS, expand)).where(*criteria)
+        return await _page(db, stmt, models.Rental.id, after_id, limit, entities=True)
+    return await _page(db, select(*crud.RENTAL_COLUMNS).where(*criteria), models.Rental.id, after_id, limit)
+
+async def get_rental(db: AsyncSession, rental_id: int, expand=()):
+    stmt = select(models.Rental).options(*load_options(crud.RENTAL_RELATIONS, expand))
+    return await _first(db, stmt.where(models.Rental.id == rental_id))
+
+async def return_vehicle(db: AsyncSession, rental_id: int):
+    row = (await db.execute(crud.close_rental(rental_id))).first()
+    if row is None:
+        await db.rollback()
+        if await get_rental(db, rental_id) is None:
+            return None
+        raise ValueError(f"Rental with ID {rental_id} has already been returned.")
+
+    vehicle_type = (await db.execute(crud.release_vehicle(row.vehicle_id))).scalar()
+    await _apply(db, rollups.on_return(db, [(row, vehicle_type)]))
+    await db.commit()
+    await run_in_threadpool(versions.vehicles_changed, [row.vehicle_id])
+    return await _loaded(db, models.Rental, row)
+
+async def delete_rental(db: AsyncSession, rental_id: int):
+    row = (await db.execute(crud.remove_rental(rental_id))).first()
+    if row is None:
+        await db.rollback()
+        return False
+    vehicle_type = (await db.execute(select(models.Vehicle.type).where(models.Vehicle.id == row.vehicle_id))).scalar()
+    await _apply(db, rollups.on_delete(db, row, vehicle_type))
+    await db.commit()
+    await run_in_threadpool(versions.vehicles_changed, [row.vehicle_id])
+    return True
@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+import orjson
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger("app.cache")
+
+# Read-through caching of single rows by id. Values are plain dicts of column values.
+#
+# Entries of a versioned cache are keyed by the resource's version counters (app/versions.py),
+# which every write path bumps after it commits. A write therefore invalidates the entry in every
+# process's local tier and in the shared tier at once, without deleting anything. The caller passes
+# the versions in: GET /vehicles/{id} has already read them for its ETag, so a local hit costs no
+# I/O. Reading them here instead would put a version-store round trip in front of every lookup,
+# which costs more than the primary-key read it saves, so lookups without versions skip the cache.
+
+
+class LocalCache:
+    # LRU with a TTL
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    # Eviction beyond the TTL is Redis' own (maxmemory-policy allkeys-lru)
+    def __init__(self, url: str, ttl: float, prefix: str = "cache:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = max(1, int(ttl))
+        self.prefix = prefix
+        self.errors = redis.RedisError
+
+    # An unreachable shared tier is a miss, not a failed request
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            raw = self.client.get(self.prefix + key)
+        except self.errors as e:
+            logger.warning(f"Shared cache unavailable: {e}")
+            return None
+        return None if raw is None else orjson.loads(raw)
+
+    def set(self, key: str, value: dict):
+        try:
+            self.client.set(self.prefix + key, orjson.dumps(value), ex=self.ttl)
+        except self.errors as e:
+            logger.warning(f"Shared cache unavailable: {e}")
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+def create_shared(url: Optional[str]):
+    if url is None:
+        return None
+    if url == "memory://":
+        return LocalCache(settings.cache_local_size, settings.cache_ttl)
+    return RedisCache(url, settings.cache_ttl)
+
+
+class ReadThrough:
+    def __init__(self, name: str, versioned: bool = False):
+        self.name = name
+        self.versioned = versioned
+        self._tiers = None
+
+    @property
+    def tiers(self):
+        # Built on first use, so settings can be changed before then
+        if self._tiers is None:
+            self._tiers = (LocalCache(settings.cache_local_size, settings.cache_ttl), create_shared(settings.cache_url))
+        return self._tiers
+
+    def key(self, item_id: int, version: Optional[str] = None) -> str:
+        key = f"{self.name}:{item_id}"
+        if version is not None:
+            key += ":" + version
+        return key
+
+    def _bypassed(self, version: Optional[str]) -> bool:
+        if not settings.cache_enabled:
+            return True
+        if self.versioned and version is None:
+            CACHE_REQUESTS.labels(self.name, "bypass").inc()
+            return True
+        return False
+
+    def _lookup(self, item_id: int, version: Optional[str]):
+        local, shared = self.tiers
+        key = self.key(item_id, version)
+        value, result = local.get(key), "local_hit"
+        if value is None and shared is not None:
+            value, result = shared.get(key), "shared_hit"
+            if value is not None:
+                local.set(key, value)
+        return key, value, result
+
+    def _store(self, key: str, value: Optional[dict]):
+        # Misses (including ids that don't exist) are not cached
+        if value is not None:
+            local, shared = self.tiers
+            local.set(key, value)
+            if shared is not None:
+                shared.set(key, value)
+
+    def get(self, item_id: int, load: Callable[[], Optional[dict]], version: Optional[str] = None) -> Optional[dict]:
+        # `version` is required for a versioned cache: the item's current version counters
+        if self._bypassed(version):
+            return load()
+        key, value, result = self._lookup(item_id, version)
+        if value is None:
+            value, result = load(), "miss"
+            self._store(key, value)
+        CACHE_REQUESTS.labels(self.name, result).inc()
+        return value
+
+    async def get_async(self, item_id: int, load: Callable[[], Awaitable[Optional[dict]]],
+                        version: Optional[str] = None) -> Optional[dict]:
+        # The shared tier may be Redis, which is blocking I/O
+        if self._bypassed(version):
+            return await load()
+        key, value, result = await run_in_threadpool(self._lookup, item_id, version)
+        if value is None:
+            value, result = await load(), "miss"
+            await run_in_threadpool(self._store, key, value)
+        CACHE_REQUESTS.labels(self.name, result).inc()
+        return value
+
+    def clear(self):
+        for tier in self.tiers:
+            if tier is not None:
+                tier.clear()
+
+
+# Vehicles change on every checkout and return, so their entries are keyed by the tag of
+# versions.vehicle_keys(vehicle_id); users are never updated
+vehicles = ReadThrough("vehicle", versioned=True)
+users = ReadThrough("user")
@@ -1,14 +1,29 @@
 
+import os
+
 from celery import Celery
 from celery.schedules import crontab
+from app.config import settings
 
 celery_app = Celery(
     "rental_manager",
-    broker="redis://localhost:6379/0",
-    backend="redis://localhost:6379/0"
+    broker=settings.redis_url,
+    backend=settings.redis_url
 )
 
 
+def _reset_broker_pools():
+    # The broker connection pool is opened on the first publish. Celery resets it only in children
+    # forked through multiprocessing; pre-fork web servers use a plain fork(), so reset it there too.
+    # The inherited connections are dropped without talking to the broker, and the pools refill lazily.
+    for pool in (celery_app.producer_pool, celery_app.pool):
+        pool.force_close_all(close_pool=False)
+        pool.setup()
+
+
+os.register_at_fork(after_in_child=_reset_broker_pools)
+
+
 celery_app.conf.update(
     task_track_started=True,
     task_time_limit=30,
@@ -20,10 +35,26 @@ celery_app.conf.update(
             # "schedule": crontab(hour=8, minute=0),  # Every day at 8:00 AM
             "schedule": crontab(minute="*/5"),  # Every 5 minutes
         },
+        # Safety net for confirmations whose scheduled flush was lost
+        "flush-rental-confirmations": {
+            "task": "app.celery_app.tasks.flush_rental_confirmations",
+            "schedule": 60.0,
+        },
+        # Brings the /reports rollups up to date with recent checkouts, returns and deletes
+        "fold-rollup-changes": {
+            "task": "app.celery_app.tasks.fold_rollups",
+            "schedule": settings.rollup_fold_interval,
+        },
+        # Moves rentals closed more than ARCHIVE_AFTER_DAYS ago out of the live table, in batches
+        "archive-closed-rentals": {
+            "task": "app.celery_app.tasks.archive_rentals",
+            "schedule": crontab(minute=15),  # Hourly
+        },
     }
 )
 
 
 celery_app.autodiscover_tasks(["app.celery_app"])
 import app.celery_app.tasks
+import app.metrics  # task runtime / queue wait signal handlers
 
@@ -1,115 +1,208 @@
-import csv
-from io import StringIO
-from app import models
-from app.database import SessionLocal
+from celery import chord
+from app import archive, importer, notifications, rollups, schemas
+from app.config import settings
+from app.database import ArchiveSessionLocal, SessionLocal
 from app.celery_app import celery_app
 from .. import crud
+from app.utils import batched
 import logging
+import uuid
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 
 
 
+@celery_app.task(time_limit=settings.import_plan_time_limit)
+def plan_import(job_id: str, kind: str, path: str):
+    db = SessionLocal()
+    try:
+        try:
+            shards, total = importer.split_into_shards(path)
+        finally:
+            importer.discard_upload(path)
+        crud.update_import_job(db, job_id, status="running", total_rows=total, shards_total=len(shards))
+    except Exception as e:
+        crud.update_import_job(db, job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+        raise
+    finally:
+        db.close()
+
+    logging.info(f"Import job {job_id}: {total} rows split into {len(shards)} shards")
+    callback = finish_import.s(job_id).on_error(fail_import.si(job_id))
+    if not shards:
+        callback.delay([])
+        return
+    chord(import_shard.s(job_id, kind, shard) for shard in shards)(callback)
+
 @celery_app.task
-def process_bulk_vehicles(file_data: str):
+def import_shard(job_id: str, kind: str, path: str):
     db = SessionLocal()
-    reader = csv.DictReader(StringIO(file_data))
-    for row in reader:
-        vehicle = models.Vehicle(
-            name=row['name'],
-            type=row['type'],
-            registration_number=row['registration_number'],
-            is_available=row.get('is_available', 'True') == 'True'
+    try:
+        result = importer.import_file(
+            db, kind, path,
+            on_batch=lambda session, delta: crud.add_import_progress(session, job_id, delta),
         )
-        db.add(vehicle)
-    db.commit()
-    db.close()
+        crud.finish_import_shard(db, job_id)
+    finally:
+        db.close()
+        importer.discard_upload(path)
+    return result.dict()
 
 @celery_app.task
-def process_bulk_users(file_data: str):
+def finish_import(shard_results: list, job_id: str):
+    total = schemas.ImportResult()
+    for result in shard_results:
+        total.add(schemas.ImportResult(**result))
+
     db = SessionLocal()
-    reader = csv.DictReader(StringIO(file_data))
-    for row in reader:
-        user = models.User(
-            name=row['name'],
-            email=row['email']
+    try:
+        crud.update_import_job(
+            db, job_id, status="completed", finished_at=datetime.utcnow(),
+            processed_rows=total.processed, **total.dict(),
         )
-        db.add(user)
-    db.commit()
-    db.close()
+    finally:
+        db.close()
+    logging.info(f"Import job {job_id} finished: {total}")
+    return total.dict()
 
+@celery_app.task
+def fail_import(job_id: str):
+    db = SessionLocal()
+    try:
+        crud.update_import_job(db, job_id, status="failed", error="One or more shards failed", finished_at=datetime.utcnow())
+    finally:
+        db.close()
+
+
+def queue_rental_confirmations(rental_ids: list):
+    # Confirmations are coalesced: the push that finds the queue empty schedules one flush
+    # for the whole window, later pushes ride along with it
+    pending = notifications.pending_confirmations().push(rental_ids)
+    if pending == len(rental_ids):
+        flush_rental_confirmations.apply_async(countdown=settings.notification_flush_window)
+
+def _confirmation_rows(db: Session, rental_ids: list) -> list:
+    rows = crud.get_rental_confirmations(db, rental_ids)
+    missing = set(rental_ids) - {row.rental_id for row in rows}
+    if missing:
+        logging.error(f"Rentals {sorted(missing)} not found, no confirmation sent.")
+    return rows
+
+def send_rental_confirmations(db: Session, rental_ids: list) -> int:
+    rows = _confirmation_rows(db, rental_ids)
+    notifications.get_sink().send_many(notifications.rental_confirmation(row) for row in rows)
+    return len(rows)
+
+@celery_app.task(name="app.celery_app.tasks.flush_rental_confirmations")
+def flush_rental_confirmations():
+    pending = notifications.pending_confirmations()
+    db = SessionLocal()
+    sent = 0
+    try:
+        while True:
+            rental_ids = pending.pop(settings.notification_batch_size)
+            if not rental_ids:
+                break
+            rows = _confirmation_rows(db, rental_ids)
+            try:
+                notifications.get_sink().send_many(notifications.rental_confirmation(row) for row in rows)
+            except notifications.SendFailed as e:
+                # Put back only the confirmations that didn't go out, so none is sent twice
+                pending.push([row.rental_id for row in rows[e.sent:]])
+                raise
+            except Exception:
+                # Nothing is known to have gone out: put the batch back for the next flush
+                pending.push(rental_ids)
+                raise
+            sent += len(rows)
+    finally:
+        db.close()
+    if sent:
+        logging.info(f"Sent {sent} rental confirmation emails")
+    return sent
 
 @celery_app.task
 def send_rental_conf_email(rental_id: int):
     db = SessionLocal()
     try:
-        rental = crud.get_rental(db, rental_id)
-        if not rental:
-            logging.error(f"Rental with ID {rental_id} not found.")
-            return
-        
-        user = crud.get_user(db, rental.user_id)
-        vehicle = crud.get_vehicle(db, rental.vehicle_id)
-        if not user or not vehicle:
-            logging.error(f"User or Vehicle data missing for Rental ID {rental_id}.")
-            return
-
-        # Construct the email content
-        to_email = user.contact
-        subject = "Rental Confirmation"
-        body = (
-            f"Dear {user.name},\n\n"
-            f"Thank you for renting with us! Here are your rental details:\n"
-            f"Vehicle: {vehicle.name} {vehicle.registration_number}\n"
-            f"Rental Start: {rental.rent_start}\n"
-            f"Rental End: {rental.expected_return}\n\n"
-            f"Enjoy your ride!\n"
-        )
-
-        # Simulate sending the email
-        send_email(to_email, subject, body)
-        logging.info(f"Rental confirmation email sent to {to_email} for Rental ID {rental_id}.")
+        send_rental_confirmations(db, [rental_id])
     except Exception as e:
         logging.error(f"Error sending rental confirmation email for Rental ID {rental_id}: {e}")
     finally:
         db.close()
 
-# Placeholder function for sending emails
-def send_email(to_email: str, subject: str, body: str):
-    # Simulate email sending (implementation not required)
-    print(f"Email sent to {to_email} with subject '{subject}' and body:\n{body}")
-
 
 @celery_app.task(name="app.celery_app.tasks.send_return_reminders")
 def send_return_reminders():
     db: Session = SessionLocal()
     try:
-        tomorrow = datetime.now() + timedelta(days=1)
-        upcoming_rentals = db.query(models.Rental).filter(
-            models.Rental.expected_return >= datetime.now(),
-            models.Rental.expected_return < tomorrow,
-            models.Rental.actual_return == None, 
-        ).all()
-
-        for rental in upcoming_rentals:
-            user = crud.get_user(db, rental.user_id)
-            vehicle = crud.get_vehicle(db, rental.vehicle_id)
-
-            if not user or not vehicle:
-                continue
-
-            subject = "Rental Return Reminder"
-            body = (
-                f"Dear {user.name},\n\n"
-                f"This is a friendly reminder to return your rental vehicle tomorrow.\n\n"
-                f"Vehicle: {vehicle.name} ({vehicle.registration_number})\n"
-                f"Expected Return: {rental.expected_return.strftime('%Y-%m-%d %H:%M')}\n\n"
-                f"Thank you!"
-            )
-
-            send_email(user.contact, subject, body)
-            logging.info(f"Sent return reminder to {user.contact}")
+        now = datetime.now()
+        horizon = now + timedelta(hours=settings.reminder_horizon_hours)
+        due = crud.iter_due_reminders(db, now, horizon, settings.reminder_stream_chunk)
+
+        queued = 0
+        for batch in batched(due, settings.reminder_batch_size):
+            for reminder in batch:
+                reminder["expected_return"] = reminder["expected_return"].isoformat()
+            send_reminder_batch.delay(batch)
+            queued += len(batch)
+        logging.info(f"Queued {queued} return reminders")
     except Exception as e:
         logging.error(f"Error in sending return reminders: {e}")
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# A failed send is retried under the same task id, so the token re-claims the rows it left unsent
+@celery_app.task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=10)
+def send_reminder_batch(self, reminders: list):
+    # New dicts: a retry is sent with the task's original arguments
+    reminders = [{**reminder, "expected_return": datetime.fromisoformat(reminder["expected_return"])}
+                 for reminder in reminders]
+
+    db: Session = SessionLocal()
+    try:
+        # Claiming in the ledger first makes overlapping beats and redelivered batches harmless
+        token = self.request.id or uuid.uuid4().hex
+        claimed = crud.claim_reminders(db, reminders, token)
+
+        batch = [reminder for reminder in reminders if reminder["rental_id"] in claimed]
+        try:
+            notifications.get_sink().send_many(notifications.return_reminder(reminder) for reminder in batch)
+        except notifications.SendFailed as e:
+            # Mark what went out before the failure, so the retry doesn't send it again
+            if e.sent:
+                crud.mark_reminders_sent(db, token, [reminder["rental_id"] for reminder in batch[:e.sent]])
+            raise
+        sent = [reminder["rental_id"] for reminder in batch]
+        logging.info(f"Sent {len(sent)} return reminders")
+
+        if sent:
+            crud.mark_reminders_sent(db, token, sent)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.celery_app.tasks.archive_rentals", time_limit=600)
+def archive_rentals():
+    cutoff = datetime.utcnow() - timedelta(days=settings.archive_after_days)
+    db, archive_db = SessionLocal(), ArchiveSessionLocal()
+    try:
+        moved = archive.archive_rentals(db, archive_db, cutoff, settings.archive_batch_size, settings.archive_max_batches)
+    finally:
+        archive_db.close()
+        db.close()
+    logging.info(f"Archived {moved} rentals returned before {cutoff.isoformat()}")
+    return moved
+
+
+@celery_app.task(name="app.celery_app.tasks.fold_rollups")
+def fold_rollups():
+    db = SessionLocal()
+    try:
+        folded = rollups.fold(db, settings.rollup_fold_batch_size)
+    finally:
+        db.close()
+    if folded:
+        logging.info(f"Folded {folded} rental changes into the report rollups")
+    return folded
@@ -0,0 +1,112 @@
+from typing import Optional
+
+from pydantic import BaseSettings
+
+
+class Settings(BaseSettings):
+    database_url: str = "sqlite:///./rental.db"
+    # Optional engine for GET/HEAD requests, e.g. a replica. Pointing it at the same SQLite
+    # file gives readers their own query_only pool that never waits for a writer under WAL.
+    read_database_url: Optional[str] = None
+    # Create missing tables and search indexes when the app starts. Turn off with several
+    # workers and run `python -m app.schema` once before starting them instead.
+    create_schema_on_startup: bool = True
+
+    # Connection pool
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+
+    # SQLite connection pragmas
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size: int = -64 * 1024  # negative values are KiB
+    sqlite_busy_timeout: int = 5000  # milliseconds
+
+    # Serve the core vehicle/user/rental routes from async handlers on an AsyncEngine.
+    # The async URL defaults to DATABASE_URL with an asyncio driver (aiosqlite / asyncpg).
+    async_db: bool = False
+    async_database_url: Optional[str] = None
+
+    # Bulk CSV imports
+    import_staging_dir: str = "./imports"
+    import_batch_size: int = 1000
+    import_shard_rows: int = 20000
+    import_plan_time_limit: int = 600
+
+    # Broker, result backend and default store for pending notifications
+    redis_url: str = "redis://localhost:6379/0"
+
+    # Notifications. EMAIL_BACKEND is one of console, smtp, file or memory.
+    email_backend: str = "console"
+    email_sender: str = "rentals@example.com"
+    email_file_path: str = "./outbox.txt"
+    smtp_host: str = "localhost"
+    smtp_port: int = 25
+    smtp_username: Optional[str] = None
+    smtp_password: Optional[str] = None
+    smtp_starttls: bool = False
+    # Confirmations are queued here and flushed in batches; "memory://" keeps them in-process
+    notification_queue_url: Optional[str] = None
+    notification_flush_window: float = 2.0  # seconds
+    notification_batch_size: int = 200
+
+    # Version counters behind the ETags of the vehicle routes; "memory://" keeps them in-process
+    version_store_url: Optional[str] = None
+    # Bumps that failed while the store was down are retried this often
+    version_retry_interval: float = 5.0  # seconds
+
+    # Read-through cache for vehicle and user lookups by id: an in-process LRU, plus an optional
+    # shared tier at CACHE_URL (Redis; "memory://" is an in-process stand-in)
+    cache_enabled: bool = True
+    cache_ttl: float = 60.0  # seconds
+    cache_local_size: int = 10000
+    cache_url: Optional[str] = None
+
+    # Admission control for write and bulk routes, per worker process; a limit of 0 disables it.
+    # Past a route's limit requests wait in a bounded queue for up to ADMISSION_QUEUE_TIMEOUT
+    # seconds; beyond that they get 503 with Retry-After.
+    admission_enabled: bool = True
+    admission_write_limit: int = 16
+    admission_write_queue: int = 64
+    admission_bulk_limit: int = 2
+    admission_bulk_queue: int = 4
+    admission_queue_timeout: float = 2.0
+    admission_retry_after: int = 2  # seconds
+    # Bulk uploads get 429 while this many Celery messages are waiting
+    admission_max_task_backlog: int = 1000
+
+    # Metrics. Requests slower than SLOW_REQUEST_MS are logged with the SQL they ran.
+    metrics_enabled: bool = True
+    slow_request_ms: Optional[float] = None
+
+    # Archival of closed rentals out of the live rentals table
+    archive_database_url: str = "sqlite:///./rental_archive.db"
+    archive_after_days: int = 90
+    archive_batch_size: int = 1000
+    archive_max_batches: int = 50  # per run of the archival task
+
+    # Rollups behind /reports: checkouts, returns and deletes are recorded in an outbox and folded
+    # into the rollup tables by a periodic task, so reports trail writes by up to this interval
+    rollup_fold_interval: float = 30.0  # seconds
+    rollup_fold_batch_size: int = 10000
+
+    # Most recent items embedded per to-many ?expand= (e.g. a user's rentals)
+    expand_many_limit: int = 20
+
+    # Streaming exports: rows fetched and encoded per chunk
+    export_chunk_size: int = 1000
+
+    # Return reminders
+    reminder_horizon_hours: int = 24
+    reminder_batch_size: int = 100
+    reminder_stream_chunk: int = 500
+
+    class Config:
+        env_file = ".env"
+
+
+settings = Settings()
@@ -1,71 +1,491 @@
-from sqlalchemy.orm import Session
-from . import models, schemas
+from contextlib import contextmanager
+from sqlalchemy import and_, delete, exists, func, insert, or_, select, update
+from sqlalchemy.orm import Session, make_transient_to_detached
+from . import cache, models, rollups, schemas, versions
+from .database import dialect_insert
+from .expansion import attach, latest_statement, load_options, to_many
+from .pagination import keyset
+from .serialization import columns_for
 from datetime import datetime
+from typing import Optional
+import uuid
 
 
-def get_vehicles(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Vehicle).offset(skip).limit(limit).all()
+# Filter criteria and write statements are shared with the asyncio path in async_crud.py
 
-def get_vehicle(db: Session, vehicle_id: int):
-    return db.query(models.Vehicle).filter(models.Vehicle.id == vehicle_id).first()
+# Unit of work: every writer runs in one, and a caller can wrap several writers in an outer one
+# to commit them together. Inner units join the outer transaction; an exception anywhere rolls
+# back the whole unit, and after-commit work (version bumps, which also invalidate the cache)
+# waits for the single commit.
+class UnitOfWork:
+    def __init__(self):
+        self.callbacks = []
+
+    def after_commit(self, callback, *args):
+        self.callbacks.append((callback, args))
+
+@contextmanager
+def unit_of_work(db: Session):
+    unit = db.info.get("unit_of_work")
+    if unit is not None:
+        yield unit
+        return
+
+    unit = db.info["unit_of_work"] = UnitOfWork()
+    try:
+        yield unit
+        # Instances built from RETURNING rows hold exactly what is committed; keep them loaded
+        expire_on_commit, db.expire_on_commit = db.expire_on_commit, False
+        try:
+            db.commit()
+        finally:
+            db.expire_on_commit = expire_on_commit
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        del db.info["unit_of_work"]
+    for callback, args in unit.callbacks:
+        callback(*args)
+
+# List endpoints fetch plain rows of just the columns their response schema reads
+VEHICLE_COLUMNS = columns_for(models.Vehicle, schemas.Vehicle)
+USER_COLUMNS = columns_for(models.User, schemas.User)
+RENTAL_COLUMNS = columns_for(models.Rental, schemas.Rental)
+
+# What ?expand= can include: name -> (relationship, columns of the nested schema)
+RENTAL_RELATIONS = {"user": (models.Rental.user, USER_COLUMNS), "vehicle": (models.Rental.vehicle, VEHICLE_COLUMNS)}
+USER_RELATIONS = {"rentals": (models.User.rentals, RENTAL_COLUMNS)}
+
+def vehicle_filters(is_available: Optional[bool] = None, type: Optional[str] = None):
+    criteria = []
+    if is_available is not None:
+        criteria.append(models.Vehicle.is_available == is_available)
+    if type is not None:
+        criteria.append(models.Vehicle.type == type)
+    return criteria
+
+def get_vehicles(db: Session, after_id: Optional[int] = None, limit: int = 100,
+                 is_available: Optional[bool] = None, type: Optional[str] = None):
+    query = db.query(*VEHICLE_COLUMNS).filter(*vehicle_filters(is_available, type))
+    return keyset(query, models.Vehicle.id, after_id, limit)
+
+def rental_overlaps(start: datetime, end: datetime, now: datetime):
+    # A returned rental holds its vehicle for [rent_start, actual_return); an active one until
+    # expected_return, or indefinitely once it is overdue since nobody knows when it comes back.
+    rental = models.Rental
+    return and_(
+        rental.rent_start < end,
+        or_(
+            rental.actual_return > start,
+            and_(rental.actual_return == None, or_(rental.expected_return > start, rental.expected_return < now)),
+        ),
+    )
+
+def get_available_vehicles(db: Session, start: datetime, end: datetime, type: Optional[str] = None,
+                           after_id: Optional[int] = None, limit: int = 100):
+    vehicle, rental = models.Vehicle, models.Rental
+    blocked = exists().where(rental.vehicle_id == vehicle.id, rental_overlaps(start, end, datetime.utcnow()))
+    # is_available is false both while rented and when out of service; only the latter excludes the vehicle
+    rented_out = exists().where(rental.vehicle_id == vehicle.id, rental.actual_return == None)
+
+    query = db.query(*VEHICLE_COLUMNS).filter(~blocked, or_(vehicle.is_available == True, rented_out))
+    if type is not None:
+        query = query.filter(vehicle.type == type)
+    return keyset(query, vehicle.id, after_id, limit)
+
+def _row(db: Session, columns, *criteria) -> Optional[dict]:
+    row = db.execute(select(*columns).where(*criteria)).first()
+    return None if row is None else dict(row._mapping)
+
+def get_vehicle(db: Session, vehicle_id: int, version: Optional[str] = None):
+    # Cached only when the caller passes the vehicle's current tag (see app/cache.py)
+    values = cache.vehicles.get(vehicle_id, lambda: _row(db, VEHICLE_COLUMNS, models.Vehicle.id == vehicle_id), version)
+    return None if values is None else _instance(db, models.Vehicle, values)
+
+def insert_vehicle(vehicle: schemas.VehicleCreate):
+    return insert(models.Vehicle).values(**vehicle.dict()).returning(*models.Vehicle.__table__.columns)
 
 def create_veh(db: Session, vehicle: schemas.VehicleCreate):
-    db_vehicle = models.Vehicle(**vehicle.dict())
-    db.add(db_vehicle)
-    db.commit()
-    db.refresh(db_vehicle)
-    return db_vehicle
+    with unit_of_work(db) as unit:
+        row = db.execute(insert_vehicle(vehicle)).one()
+        unit.after_commit(versions.vehicles_changed, [row.id])
+    return _loaded(db, models.Vehicle, row)
 
 # Users
+def insert_user(user: schemas.UserCreate):
+    return insert(models.User).values(**user.dict()).returning(*models.User.__table__.columns)
+
 def create_user(db: Session, user: schemas.UserCreate):
-    db_user = models.User(**user.dict())
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    with unit_of_work(db):
+        row = db.execute(insert_user(user)).one()
+    return _loaded(db, models.User, row)
+
+def load_to_many(db: Session, relations, expand, parents):
+    # The latest EXPAND_MANY_LIMIT children of each parent, one SELECT per expansion
+    if parents:
+        for attr in to_many(relations, expand):
+            attach(attr, parents, db.execute(latest_statement(attr, parents)).scalars().all())
+    return parents
+
+def get_users(db: Session, after_id: Optional[int] = None, limit: int = 100, expand=()):
+    # Plain rows, or User objects with the expanded relationships loaded
+    if not expand:
+        return keyset(db.query(*USER_COLUMNS), models.User.id, after_id, limit)
+    users, next_after_id = keyset(db.query(models.User).options(*load_options(USER_RELATIONS, expand)),
+                                  models.User.id, after_id, limit)
+    return load_to_many(db, USER_RELATIONS, expand, users), next_after_id
+
+def get_user(db: Session, user_id: int, expand=()):
+    if expand:
+        user = db.query(models.User).options(*load_options(USER_RELATIONS, expand)).filter(models.User.id == user_id).first()
+        if user is not None:
+            load_to_many(db, USER_RELATIONS, expand, [user])
+        return user
+    values = cache.users.get(user_id, lambda: _row(db, USER_COLUMNS, models.User.id == user_id))
+    return None if values is None else _instance(db, models.User, values)
 
-def get_users(db: Session):
-    return db.query(models.User).all()
+def _instance(db: Session, model, values):
+    # A persistent instance from known column values, without the SELECT a refresh would cost
+    instance = model(**values)
+    make_transient_to_detached(instance)
+    return db.merge(instance, load=False)
 
-def get_user(db: Session, user_id: int):
-    return db.query(models.User).filter(models.User.id == user_id).first()
+def _loaded(db: Session, model, row):
+    # From a RETURNING row
+    return _instance(db, model, row._mapping)
 
 #rentals
+def claim_vehicle(vehicle_id: int):
+    # Conditional UPDATE: of two concurrent checkouts only one sees a matching row
+    return (
+        update(models.Vehicle)
+        .where(models.Vehicle.id == vehicle_id, models.Vehicle.is_available == True)
+        .values(is_available=False)
+        .execution_options(synchronize_session=False)
+    )
+
+def release_vehicle(vehicle_id: int):
+    return (
+        update(models.Vehicle)
+        .where(models.Vehicle.id == vehicle_id)
+        .values(is_available=True)
+        .returning(models.Vehicle.type)
+        .execution_options(synchronize_session=False)
+    )
+
+def insert_rental(rental: schemas.RentalCreate):
+    return (
+        insert(models.Rental)
+        .values(**rental.dict(), rent_start=datetime.utcnow())
+        .returning(*models.Rental.__table__.columns)
+    )
+
+def close_rental(rental_id: int):
+    # Only the first return of a rental matches
+    return (
+        update(models.Rental)
+        .where(models.Rental.id == rental_id, models.Rental.actual_return == None)
+        .values(actual_return=datetime.utcnow())
+        .returning(*models.Rental.__table__.columns)
+        .execution_options(synchronize_session=False)
+    )
+
+class VehicleUnavailable(ValueError):
+    pass
+
+def vehicle_unavailable_error(vehicle_id: int, exists: bool) -> VehicleUnavailable:
+    if not exists:
+        return VehicleUnavailable(f"Vehicle with ID {vehicle_id} does not exist.")
+    return VehicleUnavailable(f"Vehicle with ID {vehicle_id} is not available for rental.")
+
 def create_rental(db: Session, rental: schemas.RentalCreate):
-    # Check if the vehicle is available
-    vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == rental.vehicle_id).first()
-    if not vehicle:
-        raise ValueError(f"Vehicle with ID {rental.vehicle_id} does not exist.")
-    if vehicle.is_available == False:
-        raise ValueError(f"Vehicle with ID {rental.vehicle_id} is not available for rental.")
-
-    # Create the rental
-    db_rental = models.Rental(**rental.dict())
-    db.query(models.Vehicle).filter(models.Vehicle.id == rental.vehicle_id).update({"is_available": False})
-    db.add(db_rental)
-    db.commit()
-    db.refresh(db_rental)
-    return db_rental
+    with unit_of_work(db) as unit:
+        if db.execute(claim_vehicle(rental.vehicle_id)).rowcount != 1:
+            # Not through the cache: this transaction may hold writes that are about to be rolled back
+            exists = _row(db, [models.Vehicle.id], models.Vehicle.id == rental.vehicle_id) is not None
+            raise vehicle_unavailable_error(rental.vehicle_id, exists)
+
+        # Create the rental in the same transaction
+        row = db.execute(insert_rental(rental)).one()
+        rollups.apply(db, rollups.on_checkout(db, [row]))
+        unit.after_commit(versions.vehicles_changed, [row.vehicle_id])
+    return _loaded(db, models.Rental, row)
+
+# Batch checkout and return: one statement per step and a single commit for the whole batch.
+# Each returns a list of (rental, error) pairs in request order.
+def claim_vehicles(vehicle_ids):
+    return (
+        update(models.Vehicle)
+        .where(models.Vehicle.id.in_(vehicle_ids), models.Vehicle.is_available == True)
+        .values(is_available=False)
+        .returning(models.Vehicle.id)
+        .execution_options(synchronize_session=False)
+    )
+
+def release_vehicles(vehicle_ids):
+    return (
+        update(models.Vehicle)
+        .where(models.Vehicle.id.in_(vehicle_ids))
+        .values(is_available=True)
+        .returning(models.Vehicle.id, models.Vehicle.type)
+        .execution_options(synchronize_session=False)
+    )
 
-def get_rentals(db: Session):
-    return db.query(models.Rental).all()
+def insert_rentals(rentals):
+    now = datetime.utcnow()
+    return (
+        insert(models.Rental)
+        .values([{**rental.dict(), "rent_start": now} for rental in rentals])
+        .returning(*models.Rental.__table__.columns)
+    )
 
-def get_rental(db: Session, rental_id: int):
-    return db.query(models.Rental).filter(models.Rental.id == rental_id).first()
+def close_rentals(rental_ids):
+    return (
+        update(models.Rental)
+        .where(models.Rental.id.in_(rental_ids), models.Rental.actual_return == None)
+        .values(actual_return=datetime.utcnow())
+        .returning(*models.Rental.__table__.columns)
+        .execution_options(synchronize_session=False)
+    )
+
+def _first_requests(keys, duplicate_error):
+    # Index of the first request per key; repeats are rejected up front
+    results, first = [None] * len(keys), {}
+    for index, key in enumerate(keys):
+        if key in first:
+            results[index] = (None, duplicate_error(key))
+        else:
+            first[key] = index
+    return results, first
+
+def create_rentals(db: Session, rentals):
+    results, first = _first_requests(
+        [rental.vehicle_id for rental in rentals],
+        lambda vehicle_id: f"Vehicle with ID {vehicle_id} is requested more than once.",
+    )
+    with unit_of_work(db) as unit:
+        claimed = set(db.execute(claim_vehicles(list(first))).scalars())
+
+        unclaimed = set(first) - claimed
+        if unclaimed:
+            existing = set(db.execute(select(models.Vehicle.id).where(models.Vehicle.id.in_(unclaimed))).scalars())
+            for vehicle_id in unclaimed:
+                results[first[vehicle_id]] = (None, str(vehicle_unavailable_error(vehicle_id, vehicle_id in existing)))
+
+        rows = []
+        if claimed:
+            rows = db.execute(insert_rentals(rentals[first[vehicle_id]] for vehicle_id in claimed)).all()
+            rollups.apply(db, rollups.on_checkout(db, rows))
+            unit.after_commit(versions.vehicles_changed, [row.vehicle_id for row in rows])
+    for row in rows:
+        results[first[row.vehicle_id]] = (_loaded(db, models.Rental, row), None)
+    return results
+
+def return_vehicles(db: Session, rental_ids):
+    results, first = _first_requests(
+        rental_ids, lambda rental_id: f"Rental with ID {rental_id} is requested more than once.",
+    )
+    with unit_of_work(db) as unit:
+        rows = db.execute(close_rentals(list(first))).all()
+        if rows:
+            types = dict(db.execute(release_vehicles([row.vehicle_id for row in rows])).all())
+            rollups.apply(db, rollups.on_return(db, [(row, types[row.vehicle_id]) for row in rows]))
+            unit.after_commit(versions.vehicles_changed, [row.vehicle_id for row in rows])
+
+        unclosed = set(first) - {row.id for row in rows}
+        if unclosed:
+            existing = set(db.execute(select(models.Rental.id).where(models.Rental.id.in_(unclosed))).scalars())
+            for rental_id in unclosed:
+                error = (f"Rental with ID {rental_id} has already been returned." if rental_id in existing
+                         else f"Rental with ID {rental_id} not found.")
+                results[first[rental_id]] = (None, error)
+    for row in rows:
+        results[first[row.id]] = (_loaded(db, models.Rental, row), None)
+    return results
+
+def rental_filters(user_id: Optional[int] = None, vehicle_id: Optional[int] = None,
+                   status: Optional[schemas.RentalStatus] = None,
+                   expected_return_from: Optional[datetime] = None,
+                   expected_return_to: Optional[datetime] = None):
+    criteria = []
+    if user_id is not None:
+        criteria.append(models.Rental.user_id == user_id)
+    if vehicle_id is not None:
+        criteria.append(models.Rental.vehicle_id == vehicle_id)
+    if status == schemas.RentalStatus.active:
+        criteria.append(models.Rental.actual_return == None)
+    elif status == schemas.RentalStatus.returned:
+        criteria.append(models.Rental.actual_return != None)
+    if expected_return_from is not None:
+        criteria.append(models.Rental.expected_return >= expected_return_from)
+    if expected_return_to is not None:
+        criteria.append(models.Rental.expected_return < expected_return_to)
+    return criteria
+
+def get_rentals(db: Session, after_id: Optional[int] = None, limit: int = 100,
+                user_id: Optional[int] = None, vehicle_id: Optional[int] = None,
+                status: Optional[schemas.RentalStatus] = None,
+                expected_return_from: Optional[datetime] = None,
+                expected_return_to: Optional[datetime] = None, expand=()):
+    # Plain rows, or Rental objects with the expanded relationships loaded
+    query = (db.query(models.Rental).options(*load_options(RENTAL_RELATIONS, expand)) if expand
+             else db.query(*RENTAL_COLUMNS))
+    query = query.filter(*rental_filters(user_id, vehicle_id, status, expected_return_from, expected_return_to))
+    return keyset(query, models.Rental.id, after_id, limit)
+
+def get_rental(db: Session, rental_id: int, expand=()):
+    query = db.query(models.Rental).options(*load_options(RENTAL_RELATIONS, expand))
+    return query.filter(models.Rental.id == rental_id).first()
 
 def return_vehicle(db: Session, rental_id: int):
-    rental = get_rental(db, rental_id)
-    if rental:
-        rental.actual_return = datetime.utcnow()
-        db.query(models.Vehicle).filter(models.Vehicle.id == rental.vehicle_id).update({"is_available": True})
-        db.commit()
-        db.refresh(rental)
-    return rental
+    with unit_of_work(db) as unit:
+        row = db.execute(close_rental(rental_id)).first()
+        if row is None:
+            if get_rental(db, rental_id) is None:
+                return None
+            raise ValueError(f"Rental with ID {rental_id} has already been returned.")
+
+        # Release the vehicle in the same transaction
+        vehicle_type = db.execute(release_vehicle(row.vehicle_id)).scalar()
+        rollups.apply(db, rollups.on_return(db, [(row, vehicle_type)]))
+        unit.after_commit(versions.vehicles_changed, [row.vehicle_id])
+    return _loaded(db, models.Rental, row)
+
+def remove_rental(rental_id: int):
+    return (
+        delete(models.Rental)
+        .where(models.Rental.id == rental_id)
+        .returning(*models.Rental.__table__.columns)
+        .execution_options(synchronize_session=False)
+    )
 
 def delete_rental(db: Session, rental_id: int):
-    rental = db.query(models.Rental).filter(models.Rental.id == rental_id).first()
-    if rental:
-        db.delete(rental)
-        db.commit()
-        return True
-    return False
+    with unit_of_work(db) as unit:
+        # The deleted row comes back for the rollups, without a SELECT first
+        row = db.execute(remove_rental(rental_id)).first()
+        if row is None:
+            return False
+        vehicle_type = db.query(models.Vehicle.type).filter(models.Vehicle.id == row.vehicle_id).scalar()
+        rollups.apply(db, rollups.on_delete(db, row, vehicle_type))
+        unit.after_commit(versions.vehicles_changed, [row.vehicle_id])
+    return True
+
+def get_rental_confirmations(db: Session, rental_ids):
+    # Everything a confirmation email needs for a batch of rentals, in one query
+    rental, user, vehicle = models.Rental, models.User, models.Vehicle
+    return (
+        db.query(
+            rental.id.label("rental_id"), rental.rent_start, rental.expected_return,
+            user.name.label("user_name"), user.contact,
+            vehicle.name.label("vehicle_name"), vehicle.registration_number,
+        )
+        .join(user, user.id == rental.user_id)
+        .join(vehicle, vehicle.id == rental.vehicle_id)
+        .filter(rental.id.in_(rental_ids))
+        .order_by(rental.id)
+        .all()
+    )
+
+# Import jobs
+def create_import_job(db: Session, kind: str):
+    with unit_of_work(db):
+        row = db.execute(
+            insert(models.ImportJob)
+            .values(id=uuid.uuid4().hex, kind=kind, status="pending")
+            .returning(*models.ImportJob.__table__.columns)
+        ).one()
+    return _loaded(db, models.ImportJob, row)
+
+def get_import_job(db: Session, job_id: str):
+    return db.query(models.ImportJob).filter(models.ImportJob.id == job_id).first()
+
+def update_import_job(db: Session, job_id: str, **values):
+    db.query(models.ImportJob).filter(models.ImportJob.id == job_id).update(values)
+    db.commit()
+
+def add_import_progress(db: Session, job_id: str, delta: schemas.ImportResult):
+    # Relative update so concurrent shards never overwrite each other's counts; caller commits
+    job = models.ImportJob
+    db.query(job).filter(job.id == job_id).update({
+        job.processed_rows: job.processed_rows + delta.processed,
+        job.inserted: job.inserted + delta.inserted,
+        job.updated: job.updated + delta.updated,
+        job.skipped: job.skipped + delta.skipped,
+        job.failed: job.failed + delta.failed,
+    }, synchronize_session=False)
+
+def finish_import_shard(db: Session, job_id: str):
+    job = models.ImportJob
+    db.query(job).filter(job.id == job_id).update(
+        {job.shards_done: job.shards_done + 1}, synchronize_session=False
+    )
+    db.commit()
+
+# Return reminders
+def _reminder_candidates(db: Session, *criteria):
+    rental, user, vehicle, reminder = models.Rental, models.User, models.Vehicle, models.RentalReminder
+    return (
+        db.query(
+            rental.id.label("rental_id"), rental.expected_return,
+            user.name.label("user_name"), user.contact,
+            vehicle.name.label("vehicle_name"), vehicle.registration_number,
+        )
+        .join(user, user.id == rental.user_id)
+        .join(vehicle, vehicle.id == rental.vehicle_id)
+        # Anti-join on the ledger: rentals already reminded for this due date drop out
+        .outerjoin(reminder, and_(reminder.rental_id == rental.id, reminder.due_at == rental.expected_return))
+        .filter(rental.actual_return == None, reminder.id == None, *criteria)
+    )
+
+def iter_due_reminders(db: Session, now: datetime, horizon: datetime, chunk_size: int = 500):
+    # Stream rentals due in [now, horizon) that have not been reminded yet, then advance the scan
+    # watermark. After the first run only two slices are read: rentals whose due date entered the
+    # window since the last scan, and rentals created since then that are due in the part already scanned.
+    rental = models.Rental
+    state = db.get(models.ReminderScan, 1)
+    max_rental_id = db.query(func.max(rental.id)).scalar() or 0
+    window = [rental.expected_return >= now, rental.expected_return < horizon]
+
+    if state is None:
+        slices = [window]
+    else:
+        scanned_until = max(state.scanned_until, now)
+        slices = [
+            window + [rental.expected_return >= scanned_until],
+            window + [rental.expected_return < scanned_until, rental.id > state.max_rental_id],
+        ]
+    for criteria in slices:
+        for row in _reminder_candidates(db, *criteria).yield_per(chunk_size):
+            yield dict(row._mapping)
+
+    if state is None:
+        db.add(models.ReminderScan(id=1, scanned_until=horizon, max_rental_id=max_rental_id))
+    else:
+        state.scanned_until = max(state.scanned_until, horizon)
+        state.max_rental_id = max(state.max_rental_id, max_rental_id)
+    db.commit()
+
+def claim_reminders(db: Session, reminders: list, token: str):
+    # Claims that lose to an existing ledger row are dropped; return only the rentals this token won and
+    # has not sent yet, so a redelivered task (same token) picks up where it stopped instead of resending
+    ledger = models.RentalReminder
+    db.execute(
+        dialect_insert(db, ledger.__table__).on_conflict_do_nothing(index_elements=["rental_id", "due_at"]),
+        [{"rental_id": r["rental_id"], "due_at": r["expected_return"], "claimed_by": token, "claimed_at": datetime.utcnow()}
+         for r in reminders],
+    )
+    db.commit()
+    return set(db.execute(
+        select(ledger.rental_id).where(ledger.claimed_by == token, ledger.sent_at.is_(None))
+    ).scalars())
+
+def mark_reminders_sent(db: Session, token: str, rental_ids):
+    ledger = models.RentalReminder
+    db.execute(
+        update(ledger)
+        .where(ledger.claimed_by == token, ledger.rental_id.in_(rental_ids))
+        .values(sent_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
@@ -1,10 +1,213 @@
-from sqlalchemy import create_engine
+import os
+import sqlite3
+import threading
+from functools import partial
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, registry, sqlite as sqlite_dialect
+from sqlalchemy.dialects.sqlite.aiosqlite import SQLiteDialect_aiosqlite
+from sqlalchemy.dialects.sqlite.base import SQLiteCompiler
+from sqlalchemy.dialects.sqlite.pysqlite import SQLiteDialect_pysqlite
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.config import settings
+
+DATABASE_URL = settings.database_url
+
+# SQLite has supported INSERT/UPDATE/DELETE ... RETURNING since 3.35, but SQLAlchemy 1.4 only
+# compiles it for server databases. Engines built here use SQLite dialects whose compiler renders
+# it; the stock sqlite dialects are left alone, so other engines in the process are unaffected.
+class SQLiteReturningCompiler(SQLiteCompiler):
+    def returning_clause(self, stmt, returning_cols):
+        columns = [
+            self._label_returning_column(stmt, column, fallback_label_name=column._non_anon_label)
+            for returned in returning_cols
+            for column in returned._select_iterable
+        ]
+        return "RETURNING " + ", ".join(columns)
+
+
+class SQLiteReturningDialect(SQLiteDialect_pysqlite):
+    statement_compiler = SQLiteReturningCompiler
+    supports_statement_cache = True
+
+
+class AioSQLiteReturningDialect(SQLiteDialect_aiosqlite):
+    statement_compiler = SQLiteReturningCompiler
+    supports_statement_cache = True
+
+
+registry.register("sqlite.pysqlite_returning", __name__, "SQLiteReturningDialect")
+registry.register("sqlite.aiosqlite_returning", __name__, "AioSQLiteReturningDialect")
+
+
+def engine_url(url: str):
+    # The URL to create an engine with: SQLite URLs get the RETURNING-capable dialect for their driver
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or sqlite3.sqlite_version_info < (3, 35):
+        return parsed
+    return parsed.set(drivername=f"sqlite+{parsed.get_driver_name()}_returning")
+
+
+def dialect_insert(db, table):
+    # INSERT that supports on_conflict_do_update / on_conflict_do_nothing on the session's database
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite_dialect.insert(table)
+    raise NotImplementedError(f"ON CONFLICT inserts are not supported on {dialect}")
+
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record, read_only: bool = False):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size}")
+    cursor.execute(f"PRAGMA cache_size={settings.sqlite_cache_size}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout}")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def engine_options(url: str, pool_class=QueuePool) -> dict:
+    options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if _is_sqlite(url):
+        database = make_url(url).database
+        if not database or database == ":memory:":
+            # Every connection to an in-memory database is a different database: keep the dialect default pool
+            return {"connect_args": {"check_same_thread": False}}
+        # SQLAlchemy 1.4 defaults file databases to NullPool, which would re-run the pragmas on every checkout
+        options.update(poolclass=pool_class, connect_args={"check_same_thread": False})
+    return options
+
+
+def create_db_engine(url: str, read_only: bool = False) -> Engine:
+    engine = create_engine(engine_url(url), **engine_options(url))
+    if _is_sqlite(url):
+        event.listen(engine, "connect", partial(_set_sqlite_pragmas, read_only=read_only))
+    return engine
+
+
+# Engines and session factories are built on first use in each process rather than at import. A
+# pre-fork server (gunicorn, uvicorn --workers) may import the app in the parent, and a pool must
+# never hand the same connection to two processes; see _after_fork for engines a child inherits.
+_engines = {}
+_engines_lock = threading.Lock()
+_sessionmakers = {}
+
+
+def _engine(name: str) -> Engine:
+    if name not in _engines:
+        with _engines_lock:
+            if name not in _engines:
+                url = {"primary": DATABASE_URL, "read": settings.read_database_url,
+                       "archive": settings.archive_database_url}[name]
+                _engines[name] = create_db_engine(url, read_only=name == "read")
+    return _engines[name]
+
+
+def get_engine() -> Engine:
+    return _engine("primary")
+
 
-DATABASE_URL = "sqlite:///./rental.db" 
+def get_read_engine() -> Optional[Engine]:
+    # Optional engine for GET/HEAD requests; None when READ_DATABASE_URL is unset
+    return _engine("read") if settings.read_database_url else None
+
+
+# Closed rentals are moved to a separate archive database once they are old enough (app/archive.py).
+# It may be the same database as DATABASE_URL; the archive tables have their own names.
+def get_archive_engine() -> Engine:
+    return _engine("archive")
+
+
+def _sessionmaker(name: str) -> sessionmaker:
+    if name not in _sessionmakers:
+        _sessionmakers[name] = sessionmaker(autocommit=False, autoflush=False, bind=_engine(name))
+    return _sessionmakers[name]
+
+
+def SessionLocal() -> Session:
+    return _sessionmaker("primary")()
+
+
+def ReadSessionLocal() -> Session:
+    return _sessionmaker("read" if settings.read_database_url else "primary")()
+
+
+def ArchiveSessionLocal() -> Session:
+    return _sessionmaker("archive")()
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
+ArchiveBase = declarative_base()
+
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def create_async_db_engine(url: str, read_only: bool = False):
+    async_engine = create_async_engine(engine_url(url), **engine_options(url, pool_class=AsyncAdaptedQueuePool))
+    if _is_sqlite(url):
+        event.listen(async_engine.sync_engine, "connect", partial(_set_sqlite_pragmas, read_only=read_only))
+    return async_engine
+
+
+_async_sessionmakers = {}
+_async_engines = []
+
+
+def _async_sessionmaker(read_only: bool):
+    # The async engines are only built when the async path is used, so their drivers stay optional
+    if read_only not in _async_sessionmakers:
+        if read_only and not settings.read_database_url:
+            _async_sessionmakers[True] = _async_sessionmaker(read_only=False)
+        else:
+            url = async_url(settings.read_database_url) if read_only else settings.async_database_url or async_url(DATABASE_URL)
+            async_engine = create_async_db_engine(url, read_only=read_only)
+            _async_engines.append(async_engine)
+            _async_sessionmakers[read_only] = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    return _async_sessionmakers[read_only]
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    return _async_sessionmaker(read_only=False)()
+
+
+def AsyncReadSessionLocal() -> AsyncSession:
+    return _async_sessionmaker(read_only=True)()
+
+
+def _after_fork():
+    # A child inherits the parent's pools: start it on fresh ones without closing the parent's
+    # connections, which the parent is still using
+    for engine in list(_engines.values()) + [async_engine.sync_engine for async_engine in _async_engines]:
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_after_fork)
@@ -1,8 +1,18 @@
-from app.database import SessionLocal
+from fastapi import Request
+from app.database import AsyncReadSessionLocal, AsyncSessionLocal, ReadSessionLocal, SessionLocal
 
-def get_db():
-    db = SessionLocal()
+# Requests with these methods get a session on the read engine when one is configured
+READ_METHODS = {"GET", "HEAD"}
+
+def get_db(request: Request):
+    db = ReadSessionLocal() if request.method in READ_METHODS else SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db(request: Request):
+    session_factory = AsyncReadSessionLocal if request.method in READ_METHODS else AsyncSessionLocal
+    async with session_factory() as db:
+        yield db
@@ -0,0 +1,65 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased, noload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.config import settings
+
+# ?expand=a,b on the rental and user routes. `relations` maps each expandable name to
+# (relationship attribute, columns of the nested schema); see crud.RENTAL_RELATIONS.
+
+
+class Expand:
+    def __init__(self, relations: Dict[str, tuple]):
+        self.relations = relations
+
+    def __call__(
+        self,
+        expand: Optional[str] = Query(None, description="Comma-separated related resources to include, e.g. user,vehicle"),
+    ) -> Tuple[str, ...]:
+        names = tuple(dict.fromkeys(name.strip() for name in expand.split(",") if name.strip())) if expand else ()
+        unknown = [name for name in names if name not in self.relations]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot expand {', '.join(unknown)}; expandable: {', '.join(self.relations)}",
+            )
+        return names
+
+
+def load_options(relations: Dict[str, tuple], expand: Tuple[str, ...]) -> list:
+    # One SELECT ... WHERE ... IN (...) per expansion, however many rows are loaded. To-many
+    # relationships are left empty here and filled by latest_statement/attach.
+    return [noload(attr) if attr.property.uselist else selectinload(attr)
+            for attr in (relations[name][0] for name in expand)]
+
+
+def to_many(relations: Dict[str, tuple], expand: Tuple[str, ...]) -> list:
+    return [relations[name][0] for name in expand if relations[name][0].property.uselist]
+
+
+def latest_statement(attr, parents: List, limit: Optional[int] = None):
+    # The newest `limit` children of each parent, oldest first, in one SELECT. A row_number() window
+    # over just these parents' children, so a parent with a long history never loads all of it.
+    prop = attr.property
+    (parent_column, child_column), = prop.local_remote_pairs
+    child, key = prop.mapper.class_, prop.mapper.primary_key[0]
+    ranked = (
+        select(child, func.row_number().over(partition_by=child_column, order_by=key.desc()).label("rank"))
+        .where(child_column.in_({getattr(parent, parent_column.key) for parent in parents}))
+        .subquery()
+    )
+    latest = aliased(child, ranked)
+    return select(latest).where(ranked.c.rank <= (limit or settings.expand_many_limit)).order_by(ranked.c[key.name])
+
+
+def attach(attr, parents: List, children: List):
+    (parent_column, child_column), = attr.property.local_remote_pairs
+    by_parent = defaultdict(list)
+    for child in children:
+        by_parent[getattr(child, child_column.key)].append(child)
+    for parent in parents:
+        set_committed_value(parent, attr.key, by_parent[getattr(parent, parent_column.key)])
@@ -0,0 +1,117 @@
+import csv
+import heapq
+import io
+import itertools
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+import orjson
+from sqlalchemy import select
+
+from app import models
+from app.config import settings
+from app.database import ArchiveSessionLocal, ReadSessionLocal
+
+# Full-table exports streamed as CSV or NDJSON. Rows are read with stream_results/yield_per
+# (a server-side cursor on PostgreSQL) and encoded a chunk at a time, so memory stays flat
+# however many rows match and the first chunk goes out as soon as it is read.
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _stream(session_factory, stmt, chunk_size: int) -> Iterator:
+    # Each export opens its own session; it outlives the request handler while the body streams
+    with session_factory() as db:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=chunk_size))
+        for partition in result.partitions():
+            yield from partition
+
+
+def _range(column, start: Optional[datetime], end: Optional[datetime]) -> list:
+    criteria = []
+    if start is not None:
+        criteria.append(column >= start)
+    if end is not None:
+        criteria.append(column < end)
+    return criteria
+
+
+def _unique_by_id(rows: Iterable) -> Iterator:
+    # A rental is in both databases for a moment while it is being archived
+    last_id = None
+    for row in rows:
+        if row.id != last_id:
+            yield row
+        last_id = row.id
+
+
+def rental_rows(start: Optional[datetime] = None, end: Optional[datetime] = None, include_archived: bool = True,
+                chunk_size: Optional[int] = None) -> Iterator:
+    # Rentals that started in [start, end), live and archived merged in id order
+    chunk_size = chunk_size or settings.export_chunk_size
+    rental = models.Rental.__table__
+    live = select(rental).where(*_range(rental.c.rent_start, start, end)).order_by(rental.c.id)
+    rows = _stream(ReadSessionLocal, live, chunk_size)
+    if include_archived:
+        archived = models.ArchivedRental.__table__
+        columns = [archived.c[column.name] for column in rental.columns]
+        stmt = select(*columns).where(*_range(archived.c.rent_start, start, end)).order_by(archived.c.id)
+        rows = _unique_by_id(heapq.merge(_stream(ArchiveSessionLocal, stmt, chunk_size), rows, key=lambda row: row.id))
+    return rows
+
+
+def table_rows(model, *criteria, chunk_size: Optional[int] = None) -> Iterator:
+    stmt = select(model.__table__).where(*criteria).order_by(model.id)
+    return _stream(ReadSessionLocal, stmt, chunk_size or settings.export_chunk_size)
+
+
+def _chunks(rows: Iterator, chunk_size: int) -> Iterator[list]:
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(columns: List[str], rows: Iterator, chunk_size: int) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    # The header goes out before the first row is read
+    yield buffer.getvalue().encode()
+    for chunk in _chunks(rows, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in row] for row in chunk)
+        yield buffer.getvalue().encode()
+
+
+def ndjson_lines(columns: List[str], rows: Iterator, chunk_size: int) -> Iterator[bytes]:
+    for chunk in _chunks(rows, chunk_size):
+        yield b"".join(orjson.dumps(dict(zip(columns, row))) + b"\n" for row in chunk)
+
+
+def gzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    # A sync flush per chunk so the client can decompress what it has received so far
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def encode(format: str, columns: List[str], rows: Iterator, compress: bool = False,
+           chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    lines = csv_lines if format == "csv" else ndjson_lines
+    chunks = lines(columns, rows, chunk_size or settings.export_chunk_size)
+    return gzipped(chunks) if compress else chunks
@@ -0,0 +1,219 @@
+import csv
+import logging
+import os
+import uuid
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app import models, schemas, versions
+from app.config import settings
+from app.database import dialect_insert
+from app.utils import batched
+
+CHUNK_SIZE = 1024 * 1024
+TRUE_VALUES = {"true", "1", "yes", "y"}
+
+
+# Staging
+async def stage_upload(file: UploadFile) -> str:
+    # Spool the upload to disk chunk by chunk so only a path goes through the broker
+    os.makedirs(settings.import_staging_dir, exist_ok=True)
+    path = os.path.join(settings.import_staging_dir, f"{uuid.uuid4().hex}.csv")
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        discard_upload(path)
+        raise
+    return path
+
+
+def discard_upload(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def iter_csv_rows(path: str) -> Iterator[Dict[str, str]]:
+    # DictReader pulls buffered lines from the file, so only the current row is held in memory
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        yield from csv.DictReader(fh)
+
+
+# Row mapping
+def _clean(row: Dict[str, str], key: str) -> str:
+    return (row.get(key) or "").strip()
+
+
+def vehicle_mapping(row: Dict[str, str]) -> Optional[dict]:
+    name, type_, registration_number = _clean(row, "name"), _clean(row, "type"), _clean(row, "registration_number")
+    if not (name and type_ and registration_number):
+        return None
+    is_available = _clean(row, "is_available") or "True"
+    return {
+        "name": name,
+        "type": type_,
+        "registration_number": registration_number,
+        "is_available": is_available.lower() in TRUE_VALUES,
+    }
+
+
+def user_mapping(row: Dict[str, str]) -> Optional[dict]:
+    # Older export files label the contact column "email"
+    name, contact = _clean(row, "name"), _clean(row, "contact") or _clean(row, "email")
+    if not (name and contact):
+        return None
+    return {"name": name, "contact": contact}
+
+
+# Statements
+def _vehicle_upsert(db: Session):
+    table = models.Vehicle.__table__
+    stmt = dialect_insert(db, table)
+    # Availability belongs to checkout and return: a re-import must never free a rented vehicle,
+    # so is_available only applies to vehicles the file creates
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.registration_number],
+        set_={
+            "name": stmt.excluded.name,
+            "type": stmt.excluded.type,
+        },
+    )
+
+
+def _write_vehicles(db: Session, rows: List[dict]) -> schemas.ImportResult:
+    # Rows repeating a registration number within the batch: last one wins
+    unique = {row["registration_number"]: row for row in rows}
+    existing = set(db.execute(
+        select(models.Vehicle.registration_number)
+        .where(models.Vehicle.registration_number.in_(unique.keys()))
+    ).scalars())
+    db.execute(_vehicle_upsert(db), list(unique.values()))
+    return schemas.ImportResult(
+        inserted=len(unique) - len(existing),
+        updated=len(existing),
+        skipped=len(rows) - len(unique),
+    )
+
+
+def _write_users(db: Session, rows: List[dict]) -> schemas.ImportResult:
+    db.execute(insert(models.User.__table__), rows)
+    return schemas.ImportResult(inserted=len(rows))
+
+
+def _commit_batch(db: Session, writer: Callable, rows: List[dict], on_batch: Optional[Callable],
+                  skipped: int = 0) -> schemas.ImportResult:
+    delta = writer(db, rows)
+    delta.skipped += skipped
+    if on_batch:
+        # Progress is recorded in the same transaction as the rows it counts
+        on_batch(db, delta)
+    db.commit()
+    return delta
+
+
+def _write_batch(db: Session, writer: Callable, rows: List[dict], on_batch: Optional[Callable],
+                 skipped: int = 0) -> schemas.ImportResult:
+    try:
+        return _commit_batch(db, writer, rows, on_batch, skipped)
+    except SQLAlchemyError as e:
+        db.rollback()
+        logging.warning(f"Bulk import batch of {len(rows)} rows failed, retrying row by row: {e}")
+
+    # Isolate the offending rows instead of dropping the whole batch
+    result = schemas.ImportResult()
+    for row in rows:
+        try:
+            result.add(_commit_batch(db, writer, [row], on_batch))
+        except SQLAlchemyError as e:
+            db.rollback()
+            result.failed += 1
+            logging.error(f"Bulk import row failed {row}: {e}")
+
+    remainder = schemas.ImportResult(skipped=skipped, failed=result.failed)
+    if on_batch and remainder.processed:
+        on_batch(db, remainder)
+        db.commit()
+    result.skipped += skipped
+    return result
+
+
+def import_rows(db: Session, rows, mapper: Callable, writer: Callable, batch_size: int = None,
+                on_batch: Callable = None, on_commit: Callable = None) -> schemas.ImportResult:
+    result = schemas.ImportResult()
+    invalid = 0
+
+    def valid_rows():
+        nonlocal invalid
+        for row in rows:
+            mapped = mapper(row)
+            if mapped is None:
+                invalid += 1
+                continue
+            yield mapped
+
+    for batch in batched(valid_rows(), batch_size or settings.import_batch_size):
+        # Invalid rows seen while filling this batch are reported along with it
+        skipped, invalid = invalid, 0
+        result.add(_write_batch(db, writer, batch, on_batch, skipped))
+        if on_commit:
+            on_commit()
+
+    if invalid:
+        if on_batch:
+            on_batch(db, schemas.ImportResult(skipped=invalid))
+            db.commit()
+        result.skipped += invalid
+    return result
+
+
+# kind -> (row mapper, batch writer, called after each committed batch)
+IMPORTERS = {
+    "vehicles": (vehicle_mapping, _write_vehicles, versions.vehicles_imported),
+    "users": (user_mapping, _write_users, None),
+}
+
+
+def import_file(db: Session, kind: str, path: str, batch_size: int = None, on_batch: Callable = None) -> schemas.ImportResult:
+    mapper, writer, on_commit = IMPORTERS[kind]
+    return import_rows(db, iter_csv_rows(path), mapper, writer, batch_size, on_batch, on_commit)
+
+
+def import_vehicles(db: Session, path: str, batch_size: int = None) -> schemas.ImportResult:
+    return import_file(db, "vehicles", path, batch_size)
+
+
+def import_users(db: Session, path: str, batch_size: int = None) -> schemas.ImportResult:
+    return import_file(db, "users", path, batch_size)
+
+
+# Sharding
+def split_into_shards(path: str, shard_rows: int = None) -> Tuple[List[str], int]:
+    # Row-range shards of at most `shard_rows` data rows, each repeating the header.
+    # Returns the shard paths and the total number of data rows.
+    shard_rows = shard_rows or settings.import_shard_rows
+    shards, total = [], 0
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        reader = csv.reader(fh)
+        header = next(reader, None)
+        if header is None:
+            return shards, total
+        for chunk in batched(reader, shard_rows):
+            shard_path = f"{path}.{total}-{total + len(chunk)}"
+            with open(shard_path, "w", newline="", encoding="utf-8") as out:
+                writer = csv.writer(out)
+                writer.writerow(header)
+                writer.writerows(chunk)
+            shards.append(shard_path)
+            total += len(chunk)
+    return shards, total
@@ -1,13 +1,47 @@
-from fastapi import FastAPI
-from app.routers import vehicles, users, rentals
-from app.database import Base, engine
-from app import models
+from fastapi import APIRouter, FastAPI
+from app.config import settings
+from app.routers import vehicles, users, rentals, imports, reports, exports
+from app.routers.aio import vehicles as aio_vehicles, users as aio_users, rentals as aio_rentals
+from app import metrics, schema
 
-app = FastAPI(title="Rental Vehicle Manager")
 
-app.include_router(vehicles.router)
-app.include_router(rentals.router)
-app.include_router(users.router)
+def _route_key(route):
+    return route.path, frozenset(route.methods)
 
 
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+def with_async_routes(router: APIRouter, async_router: APIRouter) -> APIRouter:
+    # Swap in the async handlers in place, keeping the sync router's order so that
+    # static paths such as /vehicles/availability still match before /vehicles/{vehicle_id}
+    replacements = {_route_key(route): route for route in async_router.routes}
+    missing = replacements.keys() - {_route_key(route) for route in router.routes}
+    if missing:
+        raise RuntimeError(f"async routes without a sync counterpart: {missing}")
+
+    merged = APIRouter()
+    merged.routes = [replacements.get(_route_key(route), route) for route in router.routes]
+    return merged
+
+
+def create_app(async_db: bool = settings.async_db) -> FastAPI:
+    app = FastAPI(title="Rental Vehicle Manager")
+    # Nothing touches the database at import; see app/schema.py for multi-worker deployments
+    if settings.create_schema_on_startup:
+        app.add_event_handler("startup", schema.create)
+
+    routers = [
+        (vehicles.router, aio_vehicles.router),
+        (rentals.router, aio_rentals.router),
+        (users.router, aio_users.router),
+    ]
+    for router, async_router in routers:
+        app.include_router(with_async_routes(router, async_router) if async_db else router)
+    app.include_router(imports.router)
+    app.include_router(reports.router)
+    app.include_router(exports.router)
+    if settings.metrics_enabled:
+        app.add_middleware(metrics.MetricsMiddleware)
+        app.include_router(metrics.router)
+    return app
+
+
+app = create_app()
@@ -0,0 +1,183 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from celery import signals
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+from app.config import settings
+
+logger = logging.getLogger("app.metrics")
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"],
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request", ["method", "route"],
+    buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in SQL per HTTP request", ["method", "route"],
+)
+TASK_SECONDS = Histogram(
+    "celery_task_duration_seconds", "Celery task runtime", ["task", "state"],
+)
+TASK_QUEUE_SECONDS = Histogram(
+    "celery_task_queue_wait_seconds", "Time between publishing a Celery task and a worker starting it", ["task"],
+)
+TASK_QUERIES = Histogram(
+    "celery_task_db_queries", "SQL statements executed per Celery task", ["task"],
+    buckets=QUERY_BUCKETS,
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Read-through cache lookups by outcome (local_hit, shared_hit, miss, bypass)", ["cache", "result"],
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total", "Requests turned away by admission control", ["gate", "reason"],
+)
+
+
+
+class QueryStats:
+    # SQL executed within one request or task
+    def __init__(self, keep_statements: bool = False):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Optional[List[Tuple[float, str]]] = [] if keep_statements else None
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+MAX_LOGGED_STATEMENTS = 50
+
+
+# SQL hooks. Listening on the Engine class covers every engine, including the sync side of async ones.
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.count += 1
+    stats.seconds += elapsed
+    if stats.statements is not None and len(stats.statements) < MAX_LOGGED_STATEMENTS:
+        stats.statements.append((elapsed, statement))
+
+
+@event.listens_for(Engine, "handle_error")
+def _query_failed(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def track_queries(keep_statements: bool = False) -> Tuple[QueryStats, object]:
+    stats = QueryStats(keep_statements)
+    return stats, _current.set(stats)
+
+
+# HTTP
+def _route_template(app, scope) -> str:
+    # Label by route template, not the raw path, so ids don't explode the label set
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        slow_ms = settings.slow_request_ms
+        stats, token = track_queries(keep_statements=slow_ms is not None)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            method, route = scope["method"], _route_template(scope["app"], scope)
+            REQUEST_SECONDS.labels(method, route, str(status)).observe(elapsed)
+            REQUEST_QUERIES.labels(method, route).observe(stats.count)
+            REQUEST_DB_SECONDS.labels(method, route).observe(stats.seconds)
+            if slow_ms is not None and elapsed * 1000 >= slow_ms:
+                _log_slow_request(method, scope["path"], status, elapsed, stats)
+
+
+def _log_slow_request(method: str, path: str, status: int, elapsed: float, stats: QueryStats):
+    lines = [f"Slow request {method} {path} -> {status} in {elapsed * 1000:.1f} ms, "
+             f"{stats.count} queries in {stats.seconds * 1000:.1f} ms"]
+    lines += [f"  {seconds * 1000:8.2f} ms  {statement}" for seconds, statement in stats.statements]
+    if stats.count > len(stats.statements):
+        lines.append(f"  ... {stats.count - len(stats.statements)} more")
+    logger.warning("\n".join(lines))
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def read_metrics():
+    # With PROMETHEUS_MULTIPROC_DIR set, API workers and Celery workers on this host write their
+    # samples to that directory and are aggregated here
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+# Celery
+@signals.before_task_publish.connect
+def _stamp_published_at(headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault("published_at", time.time())
+
+
+@signals.task_prerun.connect
+def _task_started(task_id=None, task=None, **kwargs):
+    published_at = getattr(task.request, "published_at", None)
+    if published_at is not None:
+        TASK_QUEUE_SECONDS.labels(task.name).observe(max(0.0, time.time() - published_at))
+    stats, token = track_queries()
+    task.request.metrics = (time.perf_counter(), stats, token)
+
+
+@signals.task_postrun.connect
+def _task_finished(task_id=None, task=None, state=None, **kwargs):
+    started = getattr(task.request, "metrics", None)
+    if started is None:
+        return
+    started_at, stats, token = started
+    task.request.metrics = None
+    _current.reset(token)
+    TASK_SECONDS.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started_at)
+    TASK_QUERIES.labels(task.name).observe(stats.count)
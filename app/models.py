@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean
-from .database import Base
-from sqlalchemy import ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, Date, Float
+from .database import ArchiveBase, Base
+from sqlalchemy import ForeignKey, DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -9,9 +9,9 @@ class Vehicle(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    type = Column(String, nullable=False)
+    type = Column(String, nullable=False, index=True)
     registration_number = Column(String, unique=True, index=True)
-    is_available = Column(Boolean, default=True)
+    is_available = Column(Boolean, default=True, index=True)
 
 
 class User(Base):
@@ -21,7 +21,7 @@ class User(Base):
     name = Column(String, nullable=False)
     contact = Column(String, nullable=False)
 
-    rentals = relationship("Rental", back_populates="user")
+    rentals = relationship("Rental", back_populates="user", order_by="Rental.id")
 
 
 class Rental(Base):
@@ -29,10 +29,113 @@ class Rental(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     vehicle_id = Column(Integer, ForeignKey("vehicles.id"))
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     rent_start = Column(DateTime, default=datetime.utcnow)
-    expected_return = Column(DateTime)
+    expected_return = Column(DateTime, index=True)
     actual_return = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        # Active/returned filters, and due-date scans over active rentals
+        Index("ix_rentals_active_due", "actual_return", "expected_return"),
+        # Covers the per-vehicle overlap probe of the availability search
+        Index("ix_rentals_vehicle_window", "vehicle_id", "rent_start", "expected_return", "actual_return"),
+        # Never reuse the id of a rental that was archived (and deleted) from the top of the table
+        {"sqlite_autoincrement": True},
+    )
+
     vehicle = relationship("Vehicle")
     user = relationship("User", back_populates="rentals")
+
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending")
+    total_rows = Column(Integer, nullable=True)
+    processed_rows = Column(Integer, nullable=False, default=0)
+    shards_total = Column(Integer, nullable=False, default=0)
+    shards_done = Column(Integer, nullable=False, default=0)
+    inserted = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class RentalReminder(Base):
+    # Ledger of return reminders: at most one per rental and due date
+    __tablename__ = "rental_reminders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    rental_id = Column(Integer, ForeignKey("rentals.id"), nullable=False)
+    due_at = Column(DateTime, nullable=False)
+    claimed_by = Column(String, nullable=False, index=True)
+    claimed_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (UniqueConstraint("rental_id", "due_at", name="uq_rental_reminders_window"),)
+
+
+class ReminderScan(Base):
+    # Single-row watermark of what the reminder beat has already scanned
+    __tablename__ = "reminder_scans"
+
+    id = Column(Integer, primary_key=True)
+    scanned_until = Column(DateTime, nullable=False)
+    max_rental_id = Column(Integer, nullable=False)
+
+
+class DailyTypeUsage(Base):
+    # Rollup of returned rentals per UTC day and vehicle type. Rented time is split across the days
+    # a rental spans; returns, their total length and late returns count on the day of return.
+    __tablename__ = "daily_type_usage"
+
+    day = Column(Date, primary_key=True)
+    vehicle_type = Column(String, primary_key=True)
+    rented_seconds = Column(Float, nullable=False, default=0)
+    returns = Column(Integer, nullable=False, default=0)
+    returned_seconds = Column(Float, nullable=False, default=0)
+    late_returns = Column(Integer, nullable=False, default=0)
+
+
+class RollupChange(Base):
+    # Outbox of rental changes not yet folded into the rollups. A checkout counts +1 in `checkouts`,
+    # a return +1 in `returns`; a delete takes back both (returns only if the rental was returned).
+    __tablename__ = "rollup_changes"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    vehicle_type = Column(String, nullable=True)
+    rent_start = Column(DateTime, nullable=False)
+    expected_return = Column(DateTime, nullable=True)
+    actual_return = Column(DateTime, nullable=True)
+    checkouts = Column(Integer, nullable=False, default=0)
+    returns = Column(Integer, nullable=False, default=0)
+
+
+class CustomerTotal(Base):
+    # Rollup of rentals per user
+    __tablename__ = "customer_totals"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    rentals = Column(Integer, nullable=False, default=0, index=True)
+    rental_seconds = Column(Float, nullable=False, default=0)
+    last_rental_at = Column(DateTime, nullable=True)
+
+
+class ArchivedRental(ArchiveBase):
+    # A closed rental moved out of `rentals`, with the vehicle type it was rolled up under
+    __tablename__ = "archived_rentals"
+
+    id = Column(Integer, primary_key=True)
+    vehicle_id = Column(Integer, nullable=False)
+    vehicle_type = Column(String, nullable=True)
+    user_id = Column(Integer, nullable=False)
+    rent_start = Column(DateTime, nullable=False)
+    expected_return = Column(DateTime)
+    actual_return = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
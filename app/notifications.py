@@ -0,0 +1,216 @@
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from typing import Iterable, List, NamedTuple, Optional
+
+from app.config import settings
+
+
+class Message(NamedTuple):
+    to_email: str
+    subject: str
+    body: str
+
+
+class SendFailed(Exception):
+    # A send_many that stopped partway: the first `sent` messages went out, the rest did not
+    def __init__(self, sent: int):
+        super().__init__(f"Sending stopped after {sent} messages")
+        self.sent = sent
+
+
+# Sinks: where outgoing messages end up. Selected by EMAIL_BACKEND.
+class ConsoleSink:
+    def send_many(self, messages: Iterable[Message]):
+        for message in messages:
+            print(f"Email sent to {message.to_email} with subject '{message.subject}' and body:\n{message.body}")
+
+
+class MemorySink:
+    # In-process outbox for tests
+    def __init__(self):
+        self.outbox: List[Message] = []
+
+    def send_many(self, messages: Iterable[Message]):
+        self.outbox.extend(messages)
+
+
+class FileSink:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send_many(self, messages: Iterable[Message]):
+        with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+            for message in messages:
+                fh.write(f"To: {message.to_email}\nSubject: {message.subject}\n\n{message.body}\n\n")
+
+
+class SMTPSink:
+    # Keeps one SMTP connection per process and reuses it across batches
+    def __init__(self, host: str, port: int, username: Optional[str] = None, password: Optional[str] = None,
+                 starttls: bool = False, sender: str = "", idle_timeout: float = 60.0):
+        self.host, self.port = host, port
+        self.username, self.password = username, password
+        self.starttls, self.sender = starttls, sender
+        self.idle_timeout = idle_timeout
+        self._connection: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password or "")
+        self.connections_opened += 1
+        return connection
+
+    def _live_connection(self) -> smtplib.SMTP:
+        if self._connection is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            # Servers drop idle sessions; check before trusting it with a batch
+            try:
+                self._connection.noop()
+            except smtplib.SMTPException:
+                self._connection = None
+        if self._connection is None:
+            self._connection = self._connect()
+        return self._connection
+
+    def _send(self, message: Message):
+        email = EmailMessage()
+        email["From"] = self.sender
+        email["To"] = message.to_email
+        email["Subject"] = message.subject
+        email.set_content(message.body)
+        try:
+            self._live_connection().send_message(email)
+        except smtplib.SMTPServerDisconnected:
+            self._connection = None
+            self._live_connection().send_message(email)
+        self._last_used = time.monotonic()
+
+    def send_many(self, messages: Iterable[Message]):
+        with self._lock:
+            sent = 0
+            for message in messages:
+                try:
+                    self._send(message)
+                except Exception as e:
+                    raise SendFailed(sent) from e
+                sent += 1
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    self._connection.quit()
+                except smtplib.SMTPException:
+                    pass
+                self._connection = None
+
+
+def create_sink(backend: str):
+    if backend == "console":
+        return ConsoleSink()
+    if backend == "memory":
+        return MemorySink()
+    if backend == "file":
+        return FileSink(settings.email_file_path)
+    if backend == "smtp":
+        return SMTPSink(
+            settings.smtp_host, settings.smtp_port, settings.smtp_username, settings.smtp_password,
+            settings.smtp_starttls, settings.email_sender,
+        )
+    raise ValueError(f"Unknown email backend {backend!r}")
+
+
+_sink = None
+
+
+def get_sink():
+    global _sink
+    if _sink is None:
+        _sink = create_sink(settings.email_backend)
+    return _sink
+
+
+# Pending confirmations collected between flushes. Selected by NOTIFICATION_QUEUE_URL.
+class MemoryQueue:
+    def __init__(self):
+        self._items: List[int] = []
+        self._lock = threading.Lock()
+
+    def push(self, items: List[int]) -> int:
+        with self._lock:
+            self._items.extend(items)
+            return len(self._items)
+
+    def pop(self, count: int) -> List[int]:
+        with self._lock:
+            items, self._items = self._items[:count], self._items[count:]
+            return items
+
+
+class RedisQueue:
+    def __init__(self, url: str, key: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.key = key
+
+    def push(self, items: List[int]) -> int:
+        return self.client.rpush(self.key, *items)
+
+    def pop(self, count: int) -> List[int]:
+        pipe = self.client.pipeline(transaction=True)
+        pipe.lrange(self.key, 0, count - 1)
+        pipe.ltrim(self.key, count, -1)
+        items, _ = pipe.execute()
+        return [int(item) for item in items]
+
+
+def create_queue(url: str, key: str):
+    if url == "memory://":
+        return MemoryQueue()
+    return RedisQueue(url, key)
+
+
+_queues = {}
+
+
+def get_queue(key: str):
+    if key not in _queues:
+        _queues[key] = create_queue(settings.notification_queue_url or settings.redis_url, key)
+    return _queues[key]
+
+
+def pending_confirmations():
+    return get_queue("notifications:rental_confirmations")
+
+
+# Templates
+def rental_confirmation(row) -> Message:
+    body = (
+        f"Dear {row.user_name},\n\n"
+        f"Thank you for renting with us! Here are your rental details:\n"
+        f"Vehicle: {row.vehicle_name} {row.registration_number}\n"
+        f"Rental Start: {row.rent_start}\n"
+        f"Rental End: {row.expected_return}\n\n"
+        f"Enjoy your ride!\n"
+    )
+    return Message(row.contact, "Rental Confirmation", body)
+
+
+def return_reminder(reminder: dict) -> Message:
+    body = (
+        f"Dear {reminder['user_name']},\n\n"
+        f"This is a friendly reminder to return your rental vehicle tomorrow.\n\n"
+        f"Vehicle: {reminder['vehicle_name']} ({reminder['registration_number']})\n"
+        f"Expected Return: {reminder['expected_return'].strftime('%Y-%m-%d %H:%M')}\n\n"
+        f"Thank you!"
+    )
+    return Message(reminder["contact"], "Rental Return Reminder", body)
@@ -0,0 +1,63 @@
+import base64
+import json
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Query, Request, Response
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> int:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))["id"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(last_id, int):
+        raise ValueError("Invalid cursor")
+    return last_id
+
+
+class PageParams:
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="Opaque token from the previous page's X-Next-Cursor header"),
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    ):
+        try:
+            self.after_id = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        self.limit = limit
+
+
+def seek(query, key_column, after_id: Optional[int], limit: int):
+    # Seek past the last seen key instead of OFFSET so every page costs the same.
+    # Works on both ORM queries and select() statements; one extra row tells whether more pages exist.
+    if after_id is not None:
+        query = query.filter(key_column > after_id)
+    return query.order_by(key_column).limit(limit + 1)
+
+
+def page_of(rows: List, key_column, limit: int) -> Tuple[List, Optional[int]]:
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, getattr(rows[-1], key_column.key)
+    return rows, None
+
+
+def keyset(query, key_column, after_id: Optional[int], limit: int) -> Tuple[List, Optional[int]]:
+    return page_of(seek(query, key_column, after_id, limit).all(), key_column, limit)
+
+
+def set_page_headers(request: Request, response: Response, next_after_id: Optional[int]):
+    if next_after_id is None:
+        return
+    token = encode_cursor(next_after_id)
+    response.headers["X-Next-Cursor"] = token
+    response.headers["Link"] = f'<{request.url.include_query_params(cursor=token)}>; rel="next"'
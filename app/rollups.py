@@ -0,0 +1,312 @@
+"""Rental analytics rollups behind the /reports endpoints.
+
+Checkouts, returns and deletes append a row to the rollup_changes outbox in their own transaction;
+the fold_rollups Celery task folds the outbox into the rollup tables every ROLLUP_FOLD_INTERVAL
+seconds. Writes thus never contend on the shared rollup rows, and reports trail them by up to that
+interval. Rebuild the rollups from raw rentals (after a migration, or to pick up history) with:
+
+    python -m app.rollups backfill
+"""
+import argparse
+import time as timer
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, delete, extract, func, insert, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import dialect_insert
+from app.utils import batched
+
+USAGE_COLUMNS = ("rented_seconds", "returns", "returned_seconds", "late_returns")
+
+
+def day_slices(start: datetime, end: datetime) -> Iterable[Tuple[date, float]]:
+    # Seconds of [start, end) falling on each UTC day
+    while start < end:
+        midnight = datetime.combine(start.date() + timedelta(days=1), time.min)
+        stop = min(end, midnight)
+        yield start.date(), (stop - start).total_seconds()
+        start = stop
+
+
+class Totals:
+    # Rollup deltas accumulated in memory, then written with one upsert per table
+    def __init__(self):
+        self.usage: Dict[Tuple[date, str], List[float]] = defaultdict(lambda: [0.0, 0, 0.0, 0])
+        self.customers: Dict[int, List] = defaultdict(lambda: [0, 0.0, None])
+
+    def checkout(self, user_id: int, rent_start: datetime, sign: int = 1):
+        customer = self.customers[user_id]
+        customer[0] += sign
+        if sign > 0 and (customer[2] is None or rent_start > customer[2]):
+            customer[2] = rent_start
+
+    def returned(self, user_id: int, vehicle_type: str, rent_start: datetime, expected_return: datetime,
+                 actual_return: datetime, sign: int = 1):
+        for day, seconds in day_slices(rent_start, actual_return):
+            self.usage[(day, vehicle_type)][0] += sign * seconds
+        length = (actual_return - rent_start).total_seconds()
+        on_return_day = self.usage[(actual_return.date(), vehicle_type)]
+        on_return_day[1] += sign
+        on_return_day[2] += sign * length
+        on_return_day[3] += sign * (expected_return is not None and actual_return > expected_return)
+        self.customers[user_id][1] += sign * length
+
+    def usage_rows(self):
+        return [{"day": day, "vehicle_type": vehicle_type, **dict(zip(USAGE_COLUMNS, values))}
+                for (day, vehicle_type), values in self.usage.items()]
+
+    def customer_rows(self):
+        return [{"user_id": user_id, "rentals": rentals, "rental_seconds": seconds, "last_rental_at": last}
+                for user_id, (rentals, seconds, last) in self.customers.items()]
+
+    def statements(self, db) -> List[tuple]:
+        # (statement, parameters) pairs
+        statements = []
+        if self.usage:
+            statements.append((_usage_upsert(db), self.usage_rows()))
+        if self.customers:
+            statements.append((_customer_upsert(db), self.customer_rows()))
+        return statements
+
+
+def _usage_upsert(db):
+    table = models.DailyTypeUsage.__table__
+    stmt = dialect_insert(db, table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.vehicle_type],
+        set_={name: table.c[name] + stmt.excluded[name] for name in USAGE_COLUMNS},
+    )
+
+
+def _customer_upsert(db):
+    table = models.CustomerTotal.__table__
+    stmt = dialect_insert(db, table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={
+            "rentals": table.c.rentals + stmt.excluded.rentals,
+            "rental_seconds": table.c.rental_seconds + stmt.excluded.rental_seconds,
+            "last_rental_at": func.coalesce(stmt.excluded.last_rental_at, table.c.last_rental_at),
+        },
+    )
+
+
+# Changes recorded by crud before it commits. Each returns (statement, parameters) pairs, executed
+# by both the sync and the asyncio session.
+def _record(changes: List[dict]) -> List[tuple]:
+    return [(insert(models.RollupChange.__table__), changes)] if changes else []
+
+
+def _change(rental, vehicle_type: Optional[str] = None, checkouts: int = 0, returns: int = 0) -> dict:
+    return {
+        "user_id": rental.user_id, "vehicle_type": vehicle_type, "rent_start": rental.rent_start,
+        "expected_return": rental.expected_return, "actual_return": rental.actual_return,
+        "checkouts": checkouts, "returns": returns,
+    }
+
+
+def on_checkout(db, rentals) -> List[tuple]:
+    return _record([_change(rental, checkouts=1) for rental in rentals])
+
+
+def on_return(db, returned) -> List[tuple]:
+    # `returned`: (rental, vehicle type) pairs of rentals that were just closed
+    return _record([_change(rental, vehicle_type, returns=1) for rental, vehicle_type in returned])
+
+
+def on_delete(db, rental, vehicle_type: Optional[str]) -> List[tuple]:
+    return _record([_change(rental, vehicle_type, checkouts=-1, returns=-(rental.actual_return is not None))])
+
+
+def apply(db: Session, statements: List[tuple]):
+    for stmt, params in statements:
+        db.execute(stmt, params)
+
+
+def _claim_changes(batch_size: int):
+    # Deleting the oldest changes hands them to exactly one folder, even with several running
+    changes = models.RollupChange.__table__
+    oldest = select(changes.c.id).order_by(changes.c.id).limit(batch_size)
+    return delete(changes).where(changes.c.id.in_(oldest)).returning(*changes.columns)
+
+
+def fold(db: Session, batch_size: int = 10_000) -> int:
+    # Folds the outbox into the rollup tables, one transaction per batch
+    folded = 0
+    while True:
+        changes = db.execute(_claim_changes(batch_size)).all()
+        if not changes:
+            return folded
+        totals = Totals()
+        for change in changes:
+            if change.checkouts:
+                totals.checkout(change.user_id, change.rent_start, change.checkouts)
+            if change.returns:
+                totals.returned(change.user_id, change.vehicle_type, change.rent_start, change.expected_return,
+                                change.actual_return, change.returns)
+        apply(db, totals.statements(db))
+        db.commit()
+        folded += len(changes)
+
+
+# Backfill
+def rebuild(db: Session, chunk_size: int = 10_000, archive_db: Optional[Session] = None):
+    # Pass the archive session so that rentals moved out of the live table (app/archive.py) count too
+    rental, vehicle, archived = models.Rental, models.Vehicle, models.ArchivedRental
+    totals = Totals()
+    per_user = [db.query(rental.user_id, func.count(), func.max(rental.rent_start)).group_by(rental.user_id)]
+    returned = [
+        db.query(rental.user_id, vehicle.type, rental.rent_start, rental.expected_return, rental.actual_return)
+        .join(vehicle, vehicle.id == rental.vehicle_id)
+        .filter(rental.actual_return != None)
+        .yield_per(chunk_size)
+    ]
+    if archive_db is not None:
+        per_user.append(archive_db.query(archived.user_id, func.count(), func.max(archived.rent_start)).group_by(archived.user_id))
+        returned.append(
+            archive_db.query(archived.user_id, archived.vehicle_type, archived.rent_start, archived.expected_return,
+                             archived.actual_return).yield_per(chunk_size)
+        )
+
+    for query in per_user:
+        for user_id, rentals, last in query:
+            customer = totals.customers[user_id]
+            customer[0] += rentals
+            if customer[2] is None or last > customer[2]:
+                customer[2] = last
+    for query in returned:
+        for row in query:
+            totals.returned(*row)
+
+    # Recorded changes are part of the raw rentals just read
+    db.query(models.RollupChange).delete(synchronize_session=False)
+    db.query(models.DailyTypeUsage).delete(synchronize_session=False)
+    db.query(models.CustomerTotal).delete(synchronize_session=False)
+    for table, rows in ((models.DailyTypeUsage.__table__, totals.usage_rows()),
+                        (models.CustomerTotal.__table__, totals.customer_rows())):
+        for batch in batched(rows, chunk_size):
+            db.execute(insert(table), batch)
+    db.commit()
+    return len(totals.usage), len(totals.customers)
+
+
+# Reports
+EPOCH = datetime(1970, 1, 1)
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+def _epoch(moment: datetime) -> float:
+    return (moment - EPOCH).total_seconds()
+
+
+def utilization(db: Session, start: date, end: date, vehicle_type: Optional[str] = None, now: datetime = None):
+    now = now or datetime.utcnow()
+    usage = models.DailyTypeUsage
+    seconds = defaultdict(float)
+    query = db.query(usage.day, usage.vehicle_type, usage.rented_seconds).filter(usage.day >= start, usage.day < end)
+    if vehicle_type is not None:
+        query = query.filter(usage.vehicle_type == vehicle_type)
+    for day, type_, rented in query:
+        seconds[(day, type_)] += rented
+
+    # Rentals still out are not in the rollup until they are returned. Their time so far is added
+    # from per-(type, start day) aggregates over the active-rentals index: each rental is out for
+    # the whole of every day after the one it started on, and on that day from its start.
+    rental, vehicle = models.Rental, models.Vehicle
+    window_end = min(_day_start(end), now)
+    start_day = func.date(rental.rent_start, type_=Date)
+    active = (
+        db.query(vehicle.type, start_day, func.count(), func.sum(extract("epoch", rental.rent_start)))
+        .join(vehicle, vehicle.id == rental.vehicle_id)
+        .filter(rental.actual_return == None, rental.rent_start < window_end)
+        .group_by(vehicle.type, start_day)
+    )
+    if vehicle_type is not None:
+        active = active.filter(vehicle.type == vehicle_type)
+    for type_, started_on, count, epoch_sum in active:
+        day = max(started_on, start)
+        while _day_start(day) < window_end:
+            day_end = min(_day_start(day + timedelta(days=1)), window_end)
+            if day == started_on:
+                seconds[(day, type_)] += count * _epoch(day_end) - epoch_sum
+            else:
+                seconds[(day, type_)] += count * (day_end - _day_start(day)).total_seconds()
+            day += timedelta(days=1)
+
+    fleet = dict(db.query(vehicle.type, func.count()).group_by(vehicle.type))
+    rows = []
+    for (day, type_), rented in sorted(seconds.items()):
+        available = fleet.get(type_, 0) * 86400
+        rows.append({
+            "day": day, "vehicle_type": type_, "fleet_size": fleet.get(type_, 0),
+            "rented_hours": rented / 3600, "utilization": rented / available if available else None,
+        })
+    return rows
+
+
+def rental_lengths(db: Session, start: date, end: date, vehicle_type: Optional[str] = None):
+    usage = models.DailyTypeUsage
+    query = (
+        db.query(usage.vehicle_type, func.sum(usage.returns), func.sum(usage.returned_seconds), func.sum(usage.late_returns))
+        .filter(usage.day >= start, usage.day < end)
+        .group_by(usage.vehicle_type)
+        .order_by(usage.vehicle_type)
+    )
+    if vehicle_type is not None:
+        query = query.filter(usage.vehicle_type == vehicle_type)
+    return [
+        {"vehicle_type": type_, "returns": returns, "average_hours": seconds / returns / 3600 if returns else None,
+         "late_returns": late}
+        for type_, returns, seconds, late in query if returns
+    ]
+
+
+def overdue(db: Session, start: date, end: date, now: datetime = None):
+    now = now or datetime.utcnow()
+    rental, usage = models.Rental, models.DailyTypeUsage
+    # Range scan on ix_rentals_active_due
+    overdue_now = db.query(func.count()).filter(rental.actual_return == None, rental.expected_return < now).scalar()
+    late = db.query(func.sum(usage.late_returns)).filter(usage.day >= start, usage.day < end).scalar()
+    return {"overdue": overdue_now, "late_returns": late or 0}
+
+
+def top_customers(db: Session, limit: int = 10):
+    totals, user = models.CustomerTotal, models.User
+    query = (
+        db.query(totals.user_id, user.name, totals.rentals, totals.rental_seconds, totals.last_rental_at)
+        .join(user, user.id == totals.user_id)
+        .filter(totals.rentals > 0)
+        .order_by(totals.rentals.desc(), totals.user_id.desc())
+        .limit(limit)
+    )
+    return [
+        {"user_id": user_id, "name": name, "rentals": rentals, "rental_hours": seconds / 3600, "last_rental_at": last}
+        for user_id, name, rentals, seconds, last in query
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    from app import schema
+    from app.database import ArchiveSessionLocal, SessionLocal
+
+    schema.create()
+    started = timer.perf_counter()
+    with SessionLocal() as db, ArchiveSessionLocal() as archive_db:
+        days, customers = rebuild(db, args.chunk_size, archive_db)
+    print(f"Rebuilt {days:,} day/type rows and {customers:,} customer totals in {timer.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
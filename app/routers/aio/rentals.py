@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from ... import admission, archive, async_crud, crud, schemas
+from app.celery_app.tasks import queue_rental_confirmations
+from app.dependencies import get_async_db
+from app.pagination import PageParams
+from app.expansion import Expand
+from app.serialization import item_response, objects_response, rows_response
+from datetime import datetime
+from typing import Optional
+
+router = APIRouter(prefix="/rentals", tags=["rentals"])
+expand_rental = Expand(crud.RENTAL_RELATIONS)
+
+@router.post("/", response_model=schemas.Rental, dependencies=[Depends(admission.gate("checkout"))])
+async def create_rental(rental: schemas.RentalCreate, db: AsyncSession = Depends(get_async_db)):
+    try:
+        new_rental = await async_crud.create_rental(db, rental)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Queueing goes to Redis, which is blocking I/O, keep it off the event loop
+    await run_in_threadpool(queue_rental_confirmations, [new_rental.id])
+    return new_rental
+
+@router.get("/", response_model=list[schemas.RentalExpanded])
+async def read_rentals(request: Request, page: PageParams = Depends(), expand: tuple = Depends(expand_rental),
+                       user_id: Optional[int] = None, vehicle_id: Optional[int] = None,
+                       status: Optional[schemas.RentalStatus] = None,
+                       expected_return_from: Optional[datetime] = None,
+                       expected_return_to: Optional[datetime] = None,
+                       db: AsyncSession = Depends(get_async_db)):
+    rentals, next_after_id = await async_crud.get_rentals(
+        db, page.after_id, page.limit,
+        user_id=user_id, vehicle_id=vehicle_id, status=status,
+        expected_return_from=expected_return_from, expected_return_to=expected_return_to, expand=expand,
+    )
+    if expand:
+        return objects_response(request, rentals, crud.RENTAL_COLUMNS, expand, crud.RENTAL_RELATIONS, next_after_id)
+    return rows_response(request, rentals, next_after_id)
+
+@router.get("/{rental_id}", response_model=schemas.RentalExpanded)
+async def read_rental(rental_id: int, expand: tuple = Depends(expand_rental), db: AsyncSession = Depends(get_async_db)):
+    db_rental, related = await async_crud.get_rental(db, rental_id, expand), None
+    if db_rental is None:
+        db_rental = await run_in_threadpool(archive.get_rental, rental_id)
+        if db_rental is not None and expand:
+            related = {"user": await async_crud.get_user(db, db_rental.user_id),
+                       "vehicle": await async_crud.get_vehicle(db, db_rental.vehicle_id)}
+    if db_rental is None:
+        raise HTTPException(status_code=404, detail="Rental not found")
+    return item_response(db_rental, crud.RENTAL_COLUMNS, expand, crud.RENTAL_RELATIONS, related)
+
+@router.post("/{rental_id}/return", response_model=schemas.Rental, dependencies=[Depends(admission.gate("return"))])
+async def return_vehicle(rental_id: int, db: AsyncSession = Depends(get_async_db)):
+    try:
+        rental = await async_crud.return_vehicle(db, rental_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if rental is None:
+        raise HTTPException(status_code=404, detail="Rental not found")
+    return rental
+
+@router.delete("/{rental_id}", status_code=204, dependencies=[Depends(admission.gate("delete_rental"))])
+async def delete_rental(rental_id: int, db: AsyncSession = Depends(get_async_db)):
+    success = await async_crud.delete_rental(db, rental_id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Rental not found")
+    return
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from ... import admission, async_crud, crud, schemas
+from app.dependencies import get_async_db
+from app.pagination import PageParams
+from app.expansion import Expand
+from app.serialization import item_response, objects_response, rows_response
+
+router = APIRouter(prefix="/users", tags=["users"])
+expand_user = Expand(crud.USER_RELATIONS)
+
+@router.post("/", response_model=schemas.User, dependencies=[Depends(admission.gate("create_user"))])
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.create_user(db, user)
+
+@router.get("/", response_model=list[schemas.UserExpanded])
+async def read_users(request: Request, page: PageParams = Depends(), expand: tuple = Depends(expand_user),
+                     db: AsyncSession = Depends(get_async_db)):
+    users, next_after_id = await async_crud.get_users(db, page.after_id, page.limit, expand)
+    if expand:
+        return objects_response(request, users, crud.USER_COLUMNS, expand, crud.USER_RELATIONS, next_after_id)
+    return rows_response(request, users, next_after_id)
+
+@router.get("/{user_id}", response_model=schemas.UserExpanded)
+async def read_user(user_id: int, expand: tuple = Depends(expand_user), db: AsyncSession = Depends(get_async_db)):
+    db_user = await async_crud.get_user(db, user_id, expand)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="user Not Found")
+    return item_response(db_user, crud.USER_COLUMNS, expand, crud.USER_RELATIONS)
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from ... import admission, async_crud, schemas, versions
+from app.dependencies import get_async_db
+from app.pagination import PageParams
+from app.serialization import rows_response
+from typing import Optional
+
+router = APIRouter(prefix="/vehicles", tags=["vehicles"])
+
+@router.post("/", response_model=schemas.Vehicle, dependencies=[Depends(admission.gate("create_vehicle"))])
+async def create_vehicle(vehicle: schemas.VehicleCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.create_veh(db, vehicle)
+
+@router.get("/", response_model=list[schemas.Vehicle])
+async def read_vehicles(request: Request, page: PageParams = Depends(),
+                        is_available: Optional[bool] = None, type: Optional[str] = None,
+                        db: AsyncSession = Depends(get_async_db)):
+    tag, not_modified = await run_in_threadpool(versions.check, request, [versions.VEHICLES])
+    if not_modified:
+        return not_modified
+    vehicles, next_after_id = await async_crud.get_vehicles(db, page.after_id, page.limit, is_available=is_available, type=type)
+    response = rows_response(request, vehicles, next_after_id)
+    if tag:
+        response.headers["ETag"] = tag
+    return response
+
+@router.get("/{vehicle_id}", response_model=schemas.Vehicle)
+async def read_vehicle(vehicle_id: int, request: Request, response: Response,
+                       db: AsyncSession = Depends(get_async_db)):
+    tag, not_modified = await run_in_threadpool(versions.check, request, versions.vehicle_keys(vehicle_id))
+    if not_modified:
+        return not_modified
+    db_vehicle = await async_crud.get_vehicle(db, vehicle_id, version=tag)
+    if db_vehicle is None:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    if tag:
+        response.headers["ETag"] = tag
+    return db_vehicle
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from .. import crud, export, models, schemas
+from datetime import date, datetime, time
+from typing import Optional, Union
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+class ExportParams:
+    def __init__(self, format: schemas.ExportFormat = schemas.ExportFormat.csv, gzip: bool = False):
+        self.format = format.value
+        self.gzip = gzip
+
+def _as_datetime(value: Union[datetime, date, None]) -> Optional[datetime]:
+    # A bare date means midnight UTC
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.combine(value, time.min)
+
+class ExportRange:
+    # [start, end) as timestamps or dates; open-ended on either side when omitted
+    def __init__(self, start: Union[datetime, date, None] = None, end: Union[datetime, date, None] = None):
+        self.start, self.end = _as_datetime(start), _as_datetime(end)
+        if self.start is not None and self.end is not None and self.start >= self.end:
+            raise HTTPException(status_code=400, detail="start must be before end")
+
+def _response(name: str, model, rows, params: ExportParams) -> StreamingResponse:
+    columns = [column.name for column in model.__table__.columns]
+    filename = f"{name}.{params.format}" + (".gz" if params.gzip else "")
+    return StreamingResponse(
+        export.encode(params.format, columns, rows, params.gzip),
+        media_type="application/gzip" if params.gzip else export.MEDIA_TYPES[params.format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/rentals")
+def export_rentals(period: ExportRange = Depends(), include_archived: bool = True,
+                   params: ExportParams = Depends()):
+    # Rentals that started in [start, end), archived ones included, in id order
+    rows = export.rental_rows(period.start, period.end, include_archived)
+    return _response("rentals", models.Rental, rows, params)
+
+@router.get("/vehicles")
+def export_vehicles(is_available: Optional[bool] = None, type: Optional[str] = None,
+                    params: ExportParams = Depends()):
+    rows = export.table_rows(models.Vehicle, *crud.vehicle_filters(is_available, type))
+    return _response("vehicles", models.Vehicle, rows, params)
+
+@router.get("/users")
+def export_users(params: ExportParams = Depends()):
+    return _response("users", models.User, export.table_rows(models.User), params)
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from .. import crud, schemas
+from app.dependencies import get_db
+
+router = APIRouter(prefix="/imports", tags=["imports"])
+
+@router.get("/{job_id}", response_model=schemas.ImportJob)
+def read_import_job(job_id: str, db: Session = Depends(get_db)):
+    job = crud.get_import_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
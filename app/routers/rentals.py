@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-from .. import crud, schemas
-from app.celery_app.tasks import send_rental_conf_email
+from .. import admission, archive, crud, schemas
+from app.celery_app.tasks import queue_rental_confirmations
 from app.dependencies import get_db
+from app.pagination import PageParams
+from app.expansion import Expand
+from app.serialization import item_response, objects_response, rows_response
+from datetime import datetime
+from typing import Optional
 
 router = APIRouter(prefix="/rentals", tags=["rentals"])
+expand_rental = Expand(crud.RENTAL_RELATIONS)
 
 # def get_db():
 #     db = SessionLocal()
@@ -13,35 +19,70 @@ router = APIRouter(prefix="/rentals", tags=["rentals"])
 #     finally:
 #         db.close()
 
-@router.post("/", response_model=schemas.Rental)
+@router.post("/", response_model=schemas.Rental, dependencies=[Depends(admission.gate("checkout"))])
 def create_rental(rental: schemas.RentalCreate, db: Session = Depends(get_db)):
     try:
         new_rental = crud.create_rental(db, rental)
-        # Trigger the Celery task to send the confirmation email
-        send_rental_conf_email.delay(new_rental.id)
+        # Queue the confirmation email; queued rentals are mailed together in one flush
+        queue_rental_confirmations([new_rental.id])
         return new_rental
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/", response_model=list[schemas.Rental])
-def read_rentals(db: Session = Depends(get_db)):
-    return crud.get_rentals(db)
+@router.post("/batch", response_model=list[schemas.RentalBatchResult],
+             dependencies=[Depends(admission.gate("batch_checkout"))])
+def create_rentals(batch: schemas.RentalBatchCreate, db: Session = Depends(get_db)):
+    results = crud.create_rentals(db, batch.rentals)
+    created = [rental.id for rental, _ in results if rental is not None]
+    if created:
+        queue_rental_confirmations(created)
+    return [schemas.RentalBatchResult(rental=rental, error=error) for rental, error in results]
 
-@router.get("/{rental_id}", response_model=schemas.Rental)
-def read_rental(rental_id: int, db: Session = Depends(get_db)):
-    db_rental = crud.get_rental(db, rental_id)
+@router.post("/batch_return", response_model=list[schemas.RentalBatchResult],
+             dependencies=[Depends(admission.gate("batch_return"))])
+def return_vehicles(batch: schemas.RentalBatchReturn, db: Session = Depends(get_db)):
+    results = crud.return_vehicles(db, batch.rental_ids)
+    return [schemas.RentalBatchResult(rental=rental, error=error) for rental, error in results]
+
+@router.get("/", response_model=list[schemas.RentalExpanded])
+def read_rentals(request: Request, page: PageParams = Depends(), expand: tuple = Depends(expand_rental),
+                 user_id: Optional[int] = None, vehicle_id: Optional[int] = None,
+                 status: Optional[schemas.RentalStatus] = None,
+                 expected_return_from: Optional[datetime] = None,
+                 expected_return_to: Optional[datetime] = None,
+                 db: Session = Depends(get_db)):
+    rentals, next_after_id = crud.get_rentals(
+        db, page.after_id, page.limit,
+        user_id=user_id, vehicle_id=vehicle_id, status=status,
+        expected_return_from=expected_return_from, expected_return_to=expected_return_to, expand=expand,
+    )
+    if expand:
+        return objects_response(request, rentals, crud.RENTAL_COLUMNS, expand, crud.RENTAL_RELATIONS, next_after_id)
+    return rows_response(request, rentals, next_after_id)
+
+@router.get("/{rental_id}", response_model=schemas.RentalExpanded)
+def read_rental(rental_id: int, expand: tuple = Depends(expand_rental), db: Session = Depends(get_db)):
+    db_rental, related = crud.get_rental(db, rental_id, expand), None
+    if db_rental is None:
+        db_rental = archive.get_rental(rental_id)
+        if db_rental is not None and expand:
+            # Archived rentals live in another database, so their user and vehicle are looked up by id
+            related = {"user": crud.get_user(db, db_rental.user_id), "vehicle": crud.get_vehicle(db, db_rental.vehicle_id)}
     if db_rental is None:
         raise HTTPException(status_code=404, detail="Rental not found")
-    return db_rental
+    return item_response(db_rental, crud.RENTAL_COLUMNS, expand, crud.RENTAL_RELATIONS, related)
 
-@router.post("/{rental_id}/return", response_model=schemas.Rental)
+@router.post("/{rental_id}/return", response_model=schemas.Rental, dependencies=[Depends(admission.gate("return"))])
 def return_vehicle(rental_id: int, db: Session = Depends(get_db)):
-    rental = crud.return_vehicle(db, rental_id)
+    try:
+        rental = crud.return_vehicle(db, rental_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if rental is None:
         raise HTTPException(status_code=404, detail="Rental not found")
     return rental
 
-@router.delete("/{rental_id}", status_code=204)
+@router.delete("/{rental_id}", status_code=204, dependencies=[Depends(admission.gate("delete_rental"))])
 def delete_rental(rental_id: int, db: Session = Depends(get_db)):
     success = crud.delete_rental(db, rental_id)
     if not success:
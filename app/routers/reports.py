@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from .. import rollups, schemas
+from app.dependencies import get_db
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+class DateRange:
+    # [start, end) in UTC days; the last 30 days up to and including today by default
+    def __init__(self, start: Optional[date] = None, end: Optional[date] = None):
+        self.end = end or datetime.utcnow().date() + timedelta(days=1)
+        self.start = start or self.end - timedelta(days=30)
+        if self.start >= self.end:
+            raise HTTPException(status_code=400, detail="start must be before end")
+
+@router.get("/utilization", response_model=list[schemas.UtilizationReport])
+def read_utilization(period: DateRange = Depends(), type: Optional[str] = None, db: Session = Depends(get_db)):
+    return rollups.utilization(db, period.start, period.end, type)
+
+@router.get("/rental_length", response_model=list[schemas.RentalLengthReport])
+def read_rental_length(period: DateRange = Depends(), type: Optional[str] = None, db: Session = Depends(get_db)):
+    return rollups.rental_lengths(db, period.start, period.end, type)
+
+@router.get("/overdue", response_model=schemas.OverdueReport)
+def read_overdue(period: DateRange = Depends(), db: Session = Depends(get_db)):
+    return rollups.overdue(db, period.start, period.end)
+
+@router.get("/top_customers", response_model=list[schemas.TopCustomer])
+def read_top_customers(limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    return rollups.top_customers(db, limit)
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from .. import crud, schemas
+from .. import admission, crud, importer, schemas, search
 from app.dependencies import get_db
-from app.celery_app.tasks import process_bulk_users
+from app.pagination import PageParams
+from app.expansion import Expand
+from app.serialization import item_response, objects_response, rows_response
+from app.celery_app.tasks import plan_import
 
 router = APIRouter(prefix="/users", tags=["users"])
+expand_user = Expand(crud.USER_RELATIONS)
 
 # def get_db():
 #     db = SessionLocal()
@@ -13,52 +18,65 @@ router = APIRouter(prefix="/users", tags=["users"])
 #     finally:
 #         db.close()
 
-@router.post("/", response_model=schemas.User)
+@router.post("/", response_model=schemas.User, dependencies=[Depends(admission.gate("create_user"))])
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return crud.create_user(db, user)
 
-@router.get("/", response_model=list[schemas.User])
-def read_users(db: Session = Depends(get_db)):
-    return crud.get_users(db)
+@router.get("/", response_model=list[schemas.UserExpanded])
+def read_users(request: Request, page: PageParams = Depends(), expand: tuple = Depends(expand_user),
+               db: Session = Depends(get_db)):
+    users, next_after_id = crud.get_users(db, page.after_id, page.limit, expand)
+    if expand:
+        return objects_response(request, users, crud.USER_COLUMNS, expand, crud.USER_RELATIONS, next_after_id)
+    return rows_response(request, users, next_after_id)
 
-@router.get("/{user_id}", response_model=schemas.User)
-def read_users(user_id:int, db: Session = Depends(get_db)):
-    db_user = crud.get_user(db, user_id)
-    if db_user in None:
+@router.get("/search", response_model=list[schemas.User])
+def search_users(request: Request, q: str = Query(..., min_length=search.MIN_QUERY_LENGTH),
+                 limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)):
+    # Matches name and contact by substring, best match first
+    return rows_response(request, search.search_users(db, q, limit))
+
+@router.get("/{user_id}", response_model=schemas.UserExpanded)
+def read_user(user_id:int, expand: tuple = Depends(expand_user), db: Session = Depends(get_db)):
+    db_user = crud.get_user(db, user_id, expand)
+    if db_user is None:
         raise HTTPException(status_code=404, detail="user Not Found")
-    return db_user
+    return item_response(db_user, crud.USER_COLUMNS, expand, crud.USER_RELATIONS)
 
-@router.post("/Onboard&Rent")
+@router.post("/Onboard&Rent", dependencies=[Depends(admission.gate("onboarding"))])
 def onboard_user_and_rent(data: schemas.OnboardUserRental, db: Session = Depends(get_db)):
-    #Create user
-    new_user = crud.create_user(db, schemas.UserCreate(name=data.name, contact=data.contact))
-    
-    #Check vehicle avail
-    vehicle = crud.get_vehicle(db, data.vehicle_id)
-    if not vehicle or not vehicle.is_available:
-        raise HTTPException(status_code=400, detail="Vehicle not available")
-
-    #Create rental using new user id
-    rental_data = schemas.RentalCreate(
-        vehicle_id=data.vehicle_id,
-        user_id=new_user.id,
-        expected_return=data.expected_return
-    )
-    new_rental = crud.create_rental(db, rental_data)
+    # One transaction: if the vehicle cannot be rented, the user is not created either
+    try:
+        with crud.unit_of_work(db):
+            new_user = crud.create_user(db, schemas.UserCreate(name=data.name, contact=data.contact))
+            rental_data = schemas.RentalCreate(
+                vehicle_id=data.vehicle_id,
+                user_id=new_user.id,
+                expected_return=data.expected_return
+            )
+            new_rental = crud.create_rental(db, rental_data)
+    except crud.VehicleUnavailable as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return {
         "user": new_user,
         "rental": new_rental
     }
 
-@router.post("/users_bulk")
-async def upload_user_csv(file: UploadFile = File(...)):
+@router.post("/users_bulk",
+             dependencies=[Depends(admission.import_backlog), Depends(admission.gate("user_import", "bulk"))])
+async def upload_user_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
     if not file.filename.endswith(".csv"):
         raise HTTPException(status_code=400, detail="File must be a CSV")
 
-    content = await file.read()
-    content_str = content.decode("utf-8")
-    
-    # Trigger Celery task
-    process_bulk_users.delay(content_str)
-    return {"message": "File received. Processing in background."}
\ No newline at end of file
+    path = await importer.stage_upload(file)
+    try:
+        job = await run_in_threadpool(crud.create_import_job, db, "users")
+
+        # Trigger Celery task; progress is available at /imports/{job_id}
+        plan_import.delay(job.id, "users", path)
+    except Exception:
+        # No task will ever read the staged file
+        importer.discard_upload(path)
+        raise
+    return {"message": "File received. Processing in background.", "job_id": job.id}
\ No newline at end of file
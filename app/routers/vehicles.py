@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from .. import crud, schemas, models
+from .. import admission, crud, importer, schemas, models, search, versions
 from app.dependencies import get_db
-from app.celery_app.tasks import process_bulk_vehicles
+from app.pagination import PageParams
+from app.serialization import rows_response
+from datetime import datetime
+from typing import Optional
+from app.celery_app.tasks import plan_import
 
 router = APIRouter(prefix="/vehicles", tags=["vehicles"])
 
@@ -13,29 +18,64 @@ router = APIRouter(prefix="/vehicles", tags=["vehicles"])
 #     finally:
 #         db.close()
 
-@router.post("/", response_model=schemas.Vehicle)
+@router.post("/", response_model=schemas.Vehicle, dependencies=[Depends(admission.gate("create_vehicle"))])
 def create_vehicle(vehicle: schemas.VehicleCreate, db: Session = Depends(get_db)):
     return crud.create_veh(db, vehicle)
 
 @router.get("/", response_model=list[schemas.Vehicle])
-def read_vehicles(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_vehicles(db, skip, limit)
+def read_vehicles(request: Request, page: PageParams = Depends(),
+                  is_available: Optional[bool] = None, type: Optional[str] = None,
+                  db: Session = Depends(get_db)):
+    tag, not_modified = versions.check(request, [versions.VEHICLES])
+    if not_modified:
+        return not_modified
+    vehicles, next_after_id = crud.get_vehicles(db, page.after_id, page.limit, is_available=is_available, type=type)
+    response = rows_response(request, vehicles, next_after_id)
+    if tag:
+        response.headers["ETag"] = tag
+    return response
+
+@router.get("/availability", response_model=list[schemas.Vehicle])
+def read_available_vehicles(request: Request, start: datetime, end: datetime,
+                            type: Optional[str] = None, page: PageParams = Depends(),
+                            db: Session = Depends(get_db)):
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    vehicles, next_after_id = crud.get_available_vehicles(db, start, end, type, page.after_id, page.limit)
+    return rows_response(request, vehicles, next_after_id)
+
+@router.get("/search", response_model=list[schemas.Vehicle])
+def search_vehicles(request: Request, q: str = Query(..., min_length=search.MIN_QUERY_LENGTH),
+                    limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)):
+    # Matches name, registration number and type by substring, best match first
+    return rows_response(request, search.search_vehicles(db, q, limit))
 
 @router.get("/{vehicle_id}", response_model=schemas.Vehicle)
-def read_vehicle(vehicle_id: int, db: Session = Depends(get_db)):
-    db_vehicle = crud.get_vehicle(db, vehicle_id)
+def read_vehicle(vehicle_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    tag, not_modified = versions.check(request, versions.vehicle_keys(vehicle_id))
+    if not_modified:
+        return not_modified
+    db_vehicle = crud.get_vehicle(db, vehicle_id, version=tag)
     if db_vehicle is None:
         raise HTTPException(status_code=404, detail="Vehicle not found")
+    if tag:
+        response.headers["ETag"] = tag
     return db_vehicle
 
-@router.post("/vehicles_bulk/")
-async def upload_vehicle_csv(file: UploadFile = File(...)):
+@router.post("/vehicles_bulk/",
+             dependencies=[Depends(admission.import_backlog), Depends(admission.gate("vehicle_import", "bulk"))])
+async def upload_vehicle_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
     if not file.filename.endswith(".csv"):
         raise HTTPException(status_code=400, detail="File must be a CSV")
 
-    content = await file.read()
-    content_str = content.decode("utf-8")
-    
-    # Trigger Celery task
-    process_bulk_vehicles.delay(content_str)
-    return {"message": "File received. Processing in background."}
+    path = await importer.stage_upload(file)
+    try:
+        job = await run_in_threadpool(crud.create_import_job, db, "vehicles")
+
+        # Trigger Celery task; progress is available at /imports/{job_id}
+        plan_import.delay(job.id, "vehicles", path)
+    except Exception:
+        # No task will ever read the staged file
+        importer.discard_upload(path)
+        raise
+    return {"message": "File received. Processing in background.", "job_id": job.id}
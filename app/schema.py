@@ -0,0 +1,74 @@
+"""Create the database schema: live tables, archive tables and search indexes.
+
+Idempotent. The app runs it at startup unless CREATE_SCHEMA_ON_STARTUP is off; with several workers,
+turn that off and run it once before they start:
+
+    python -m app.schema
+
+It also migrates tables that create_all would leave as they are (see migrate).
+"""
+from sqlalchemy import MetaData, func, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateTable
+
+from app import models, search  # models registers the tables on the bases
+from app.database import ArchiveBase, Base, get_archive_engine, get_engine
+
+
+def _rentals_reuse_ids(conn) -> bool:
+    # A rentals table created before it was declared AUTOINCREMENT
+    ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'rentals'")).scalar()
+    return ddl is not None and "AUTOINCREMENT" not in ddl.upper()
+
+
+def _rebuild_rentals(conn):
+    # SQLite can't add AUTOINCREMENT to a table: copy the rows into a new one and swap it in
+    rentals = models.Rental.__table__
+    # Built outside Base.metadata, next to copies of the tables its foreign keys point at
+    metadata = MetaData()
+    for referenced in (models.User.__table__, models.Vehicle.__table__):
+        referenced.to_metadata(metadata)
+    rebuilt = rentals.to_metadata(metadata, name="rentals_rebuild")
+    columns = ", ".join(column.name for column in rentals.columns)
+    # Left behind if an earlier rebuild stopped before its copy; SQLite runs DDL outside the transaction
+    conn.execute(text("DROP TABLE IF EXISTS rentals_rebuild"))
+    conn.execute(CreateTable(rebuilt))
+    conn.execute(text(f"INSERT INTO rentals_rebuild ({columns}) SELECT {columns} FROM rentals"))
+    conn.execute(text("DROP TABLE rentals"))
+    conn.execute(text("ALTER TABLE rentals_rebuild RENAME TO rentals"))
+    for index in rentals.indexes:
+        index.create(conn)
+
+
+def _reserve_rental_ids(conn, archived_max: int):
+    # Ids archived from the top of the table are gone from it, so the sequence must start past them too
+    seq = conn.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'rentals'")).scalar()
+    floor = max(archived_max, conn.execute(text("SELECT coalesce(max(id), 0) FROM rentals")).scalar())
+    if seq is None:
+        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('rentals', :seq)"), {"seq": floor})
+    elif seq < floor:
+        conn.execute(text("UPDATE sqlite_sequence SET seq = :seq WHERE name = 'rentals'"), {"seq": floor})
+
+
+def migrate(engine: Engine, archive_engine: Engine):
+    # Only SQLite reuses ids; PostgreSQL's serial sequences never go back
+    if engine.dialect.name != "sqlite":
+        return
+    with archive_engine.connect() as conn:
+        archived_max = conn.execute(select(func.coalesce(func.max(models.ArchivedRental.id), 0))).scalar()
+    with engine.begin() as conn:
+        if _rentals_reuse_ids(conn):
+            _rebuild_rentals(conn)
+        _reserve_rental_ids(conn, archived_max)
+
+
+def create():
+    Base.metadata.create_all(bind=get_engine())
+    ArchiveBase.metadata.create_all(bind=get_archive_engine())
+    migrate(get_engine(), get_archive_engine())
+    search.install(get_engine())
+
+
+if __name__ == "__main__":
+    create()
+    print("Schema is up to date")
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, conlist, create_model, validator
+from datetime import date, datetime
+from typing import List, Optional
+from enum import Enum
 
 class VehicleBase(BaseModel):
     name: str
@@ -33,6 +34,10 @@ class User(UserBase):
 
 
 # Rental schemas
+class RentalStatus(str, Enum):
+    active = "active"
+    returned = "returned"
+
 class RentalBase(BaseModel):
     vehicle_id: int
     user_id: int
@@ -49,8 +54,105 @@ class Rental(RentalBase):
     class Config:
         orm_mode = True
 
+def with_expansions(schema, **relations):
+    # `schema` plus optional nested fields, included when requested with ?expand=
+    fields = {name: (Optional[nested], None) for name, nested in relations.items()}
+    return create_model(f"{schema.__name__}Expanded", __base__=schema, **fields)
+
+RentalExpanded = with_expansions(Rental, user=User, vehicle=Vehicle)
+UserExpanded = with_expansions(User, rentals=List[Rental])
+
+class RentalBatchCreate(BaseModel):
+    rentals: conlist(RentalCreate, min_items=1, max_items=500)
+
+class RentalBatchReturn(BaseModel):
+    rental_ids: conlist(int, min_items=1, max_items=500)
+
+class RentalBatchResult(BaseModel):
+    # One per requested item, in request order: the rental, or why it was rejected
+    rental: Optional[Rental] = None
+    error: Optional[str] = None
+
 class OnboardUserRental(BaseModel):
     name: str
     contact: str
     vehicle_id: int
-    expected_return: datetime
\ No newline at end of file
+    expected_return: datetime
+
+class ImportResult(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    failed: int = 0
+
+    @property
+    def processed(self) -> int:
+        return self.inserted + self.updated + self.skipped + self.failed
+
+    def add(self, other: "ImportResult"):
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.skipped += other.skipped
+        self.failed += other.failed
+
+
+class ImportJob(BaseModel):
+    id: str
+    kind: str
+    status: str
+    total_rows: Optional[int]
+    processed_rows: int
+    shards_total: int
+    shards_done: int
+    inserted: int
+    updated: int
+    skipped: int
+    failed: int
+    error: Optional[str]
+    created_at: datetime
+    finished_at: Optional[datetime]
+    progress: float = 0.0
+
+    @validator("progress", always=True)
+    def compute_progress(cls, v, values):
+        total = values.get("total_rows")
+        if values.get("status") == "completed":
+            return 1.0
+        if not total:
+            return 0.0
+        return round(min(values.get("processed_rows", 0) / total, 1.0), 4)
+
+    class Config:
+        orm_mode = True
+
+
+# Report schemas
+class UtilizationReport(BaseModel):
+    day: date
+    vehicle_type: str
+    fleet_size: int
+    rented_hours: float
+    utilization: Optional[float]
+
+class RentalLengthReport(BaseModel):
+    vehicle_type: str
+    returns: int
+    average_hours: Optional[float]
+    late_returns: int
+
+class OverdueReport(BaseModel):
+    overdue: int
+    late_returns: int
+
+class TopCustomer(BaseModel):
+    user_id: int
+    name: str
+    rentals: int
+    rental_hours: float
+    last_rental_at: Optional[datetime]
+
+
+# Exports
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
@@ -0,0 +1,95 @@
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app import crud, models
+
+# Substring search over trigram indexes. On SQLite these are external-content FTS5 tables kept in
+# sync by triggers; on PostgreSQL, pg_trgm GIN indexes on the searched columns.
+MIN_QUERY_LENGTH = 3
+
+# table -> (searched columns, bm25 column weights)
+INDEXES = {
+    "vehicles": (("name", "registration_number", "type"), (2.0, 3.0, 1.0)),
+    "users": (("name", "contact"), (2.0, 1.0)),
+}
+
+
+def _sqlite_ddl(table: str, columns) -> List[str]:
+    fts, cols = f"{table}_fts", ", ".join(columns)
+    new, old = ", ".join(f"new.{c}" for c in columns), ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='id', tokenize='trigram')",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});
+        END""",
+        # Only edits to searched columns touch the index, not e.g. is_available flips on checkout
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});
+        END""",
+    ]
+
+
+def _postgresql_ddl(table: str, columns) -> List[str]:
+    return ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_{c}_trgm ON {table} USING gin ({c} gin_trgm_ops)" for c in columns
+    ]
+
+
+def install(engine: Engine):
+    # Idempotent. Run after create_all: a table created (or recreated) without its triggers gets
+    # them, and its search index is rebuilt from the rows already there.
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "postgresql":
+            for table, (columns, _) in INDEXES.items():
+                for statement in _postgresql_ddl(table, columns):
+                    conn.execute(text(statement))
+        elif dialect == "sqlite":
+            triggers = set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).scalars())
+            for table, (columns, _) in INDEXES.items():
+                if f"{table}_fts_ai" in triggers:
+                    continue
+                for statement in _sqlite_ddl(table, columns):
+                    conn.execute(text(statement))
+                conn.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+
+
+def _search(db: Session, model, columns_out, q: str, limit: int):
+    table = model.__tablename__
+    columns, weights = INDEXES[table]
+    select_list = ", ".join(f"t.{c.name}" for c in columns_out)
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        # A quoted phrase matches as a substring with the trigram tokenizer
+        phrase = '"' + q.replace('"', '""') + '"'
+        sql = (
+            f"SELECT {select_list} FROM {table}_fts JOIN {table} t ON t.id = {table}_fts.rowid "
+            f"WHERE {table}_fts MATCH :q ORDER BY bm25({table}_fts, {', '.join(map(str, weights))}) LIMIT :limit"
+        )
+        params = {"q": phrase, "limit": limit}
+    elif dialect == "postgresql":
+        pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        sql = (
+            f"SELECT {select_list} FROM {table} t WHERE {' OR '.join(f't.{c} ILIKE :pattern' for c in columns)} "
+            f"ORDER BY GREATEST({', '.join(f'similarity(t.{c}, :q)' for c in columns)}) DESC LIMIT :limit"
+        )
+        params = {"q": q, "pattern": pattern, "limit": limit}
+    else:
+        raise NotImplementedError(f"Search is not supported on {dialect}")
+    # Typed columns so results get the same conversions as ORM queries
+    return db.execute(text(sql).columns(*columns_out), params).all()
+
+
+def search_vehicles(db: Session, q: str, limit: int = 20):
+    return _search(db, models.Vehicle, crud.VEHICLE_COLUMNS, q, limit)
+
+
+def search_users(db: Session, q: str, limit: int = 20):
+    return _search(db, models.User, crud.USER_COLUMNS, q, limit)
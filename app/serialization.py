@@ -0,0 +1,50 @@
+from typing import List, Optional
+
+from fastapi import Request
+from fastapi.responses import ORJSONResponse
+
+from app.pagination import set_page_headers
+
+
+def columns_for(model, schema) -> list:
+    # The table columns a response schema reads, so list queries fetch plain rows instead of ORM objects
+    return [model.__table__.c[name] for name in schema.__fields__]
+
+
+def rows_response(request: Request, rows: List, next_after_id: Optional[int] = None) -> ORJSONResponse:
+    # Rows go straight to orjson, skipping per-row model validation and jsonable_encoder.
+    # The route's response_model still documents the shape in OpenAPI.
+    keys = rows[0]._fields if rows else ()
+    response = ORJSONResponse([dict(zip(keys, row)) for row in rows])
+    # Headers set on the injected Response are not merged into one returned directly
+    set_page_headers(request, response, next_after_id)
+    return response
+
+
+def values_of(obj, columns) -> dict:
+    return {column.name: getattr(obj, column.name) for column in columns}
+
+
+def expanded(obj, columns, expand, relations, related: Optional[dict] = None) -> dict:
+    # Column values of an ORM object plus the relationships named in `expand`, each already
+    # loaded (see expansion.load_options). `related` supplies them for objects without relationships.
+    item = values_of(obj, columns)
+    for name in expand:
+        value = related[name] if related is not None else getattr(obj, name)
+        nested = relations[name][1]
+        if isinstance(value, list):
+            item[name] = [values_of(child, nested) for child in value]
+        else:
+            item[name] = None if value is None else values_of(value, nested)
+    return item
+
+
+def objects_response(request: Request, objects: List, columns, expand, relations,
+                     next_after_id: Optional[int] = None) -> ORJSONResponse:
+    response = ORJSONResponse([expanded(obj, columns, expand, relations) for obj in objects])
+    set_page_headers(request, response, next_after_id)
+    return response
+
+
+def item_response(obj, columns, expand, relations, related: Optional[dict] = None) -> ORJSONResponse:
+    return ORJSONResponse(expanded(obj, columns, expand, relations, related))
@@ -0,0 +1,187 @@
+import logging
+import os
+import threading
+import uuid
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.config import settings
+
+logger = logging.getLogger("app.versions")
+
+# Version counters behind ETag / If-None-Match on the vehicle routes. Writers bump the counters
+# after they commit; readers read them before they query, so a 304 never needs the database.
+#
+#   vehicles         every change to any vehicle, including availability (GET /vehicles/)
+#   vehicle:<id>     changes to that vehicle (GET /vehicles/{id})
+#   vehicles:bulk    bulk imports, which may touch any vehicle without bumping each one
+VEHICLES = "vehicles"
+VEHICLES_BULK = "vehicles:bulk"
+
+
+class StoreUnavailable(Exception):
+    pass
+
+
+def vehicle_key(vehicle_id: int) -> str:
+    return f"vehicle:{vehicle_id}"
+
+
+def vehicle_keys(vehicle_id: int) -> List[str]:
+    # Everything that changes GET /vehicles/{id}
+    return [VEHICLES_BULK, vehicle_key(vehicle_id)]
+
+
+class MemoryVersions:
+    # Per process: only correct when a single process serves requests and runs all writes
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._counters = Counter()
+        self._lock = threading.Lock()
+
+    def bump(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                self._counters[key] += 1
+
+    def get(self, keys: List[str]) -> Tuple[str, List[int]]:
+        with self._lock:
+            return self.epoch, [self._counters[key] for key in keys]
+
+
+class RedisVersions:
+    def __init__(self, url: str, prefix: str = "versions:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.errors = redis.RedisError
+
+    def bump(self, keys: Iterable[str]):
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.incr(self.prefix + key)
+        try:
+            pipe.execute()
+        except self.errors as e:
+            raise StoreUnavailable(str(e)) from e
+
+    def get(self, keys: List[str]) -> Tuple[str, List[int]]:
+        # The epoch changes if the counters are lost (e.g. Redis restarted without persistence),
+        # so tags handed out before can't match restarted counters
+        epoch_key = self.prefix + "epoch"
+        try:
+            epoch, *values = self.client.mget([epoch_key] + [self.prefix + key for key in keys])
+            if epoch is None:
+                self.client.set(epoch_key, uuid.uuid4().hex[:8], nx=True)
+                epoch = self.client.get(epoch_key)
+        except self.errors as e:
+            raise StoreUnavailable(str(e)) from e
+        return epoch.decode(), [int(value or 0) for value in values]
+
+
+def create_store(url: str):
+    if url == "memory://":
+        return MemoryVersions()
+    return RedisVersions(url)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = create_store(settings.version_store_url or settings.redis_url)
+    return _store
+
+
+# Keys whose bump failed in this process. They go out with its next bump, and until then a timer
+# retries them every VERSION_RETRY_INTERVAL seconds, so every process stops matching the old tags
+# and cache entries at most that long after the store is back.
+_unbumped = set()
+_unbumped_lock = threading.Lock()
+_retry_timer = None
+
+
+def _schedule_retry():
+    # Called with _unbumped_lock held
+    global _retry_timer
+    if _retry_timer is None:
+        _retry_timer = threading.Timer(settings.version_retry_interval, _retry)
+        _retry_timer.daemon = True
+        _retry_timer.start()
+
+
+def _retry():
+    global _retry_timer
+    with _unbumped_lock:
+        _retry_timer = None
+    bump()
+
+
+def _after_fork():
+    # The parent keeps retrying its own missed bumps; its timer thread doesn't exist in the child
+    global _unbumped_lock, _retry_timer
+    _unbumped.clear()
+    _unbumped_lock, _retry_timer = threading.Lock(), None
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def bump(*keys: str):
+    # Runs after the write has committed, so a store outage is logged rather than raised. Until the
+    # keys are bumped, tags and cache entries handed out before the write still match.
+    with _unbumped_lock:
+        keys = tuple(_unbumped.union(keys))
+        _unbumped.clear()
+    if not keys:
+        return
+    try:
+        get_store().bump(keys)
+    except StoreUnavailable:
+        logger.exception(f"Could not bump version counters {sorted(keys)}; will retry")
+        with _unbumped_lock:
+            _unbumped.update(keys)
+            _schedule_retry()
+
+
+def vehicles_changed(vehicle_ids: Iterable[int]):
+    bump(VEHICLES, *(vehicle_key(vehicle_id) for vehicle_id in vehicle_ids))
+
+
+def vehicles_imported():
+    bump(VEHICLES, VEHICLES_BULK)
+
+
+def current(keys: List[str]) -> str:
+    # Changes whenever any of the keys is bumped
+    epoch, values = get_store().get(keys)
+    return "-".join([epoch] + [str(value) for value in values])
+
+
+def etag(keys: List[str]) -> str:
+    return f'"{current(keys)}"'
+
+
+def _matches(if_none_match: Optional[str], tag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Weak comparison, as required for If-None-Match
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
+
+
+def check(request: Request, keys: List[str]) -> Tuple[Optional[str], Optional[Response]]:
+    # The current ETag, and a 304 response if the client already has it. Without the store there is
+    # no tag: the response is served in full, without an ETag, straight from the database.
+    try:
+        tag = etag(keys)
+    except StoreUnavailable as e:
+        logger.warning(f"Version store unavailable, serving without an ETag: {e}")
+        return None, None
+    if _matches(request.headers.get("if-none-match"), tag):
+        return tag, Response(status_code=304, headers={"ETag": tag})
+    return tag, None
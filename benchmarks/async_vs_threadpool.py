@@ -0,0 +1,82 @@
+"""Requests/sec of the sync (threadpool) and async (AsyncSession) route handlers under high concurrency.
+
+Both apps are driven in-process over ASGI, so the sync handlers compete for
+Starlette's threadpool exactly as they do under uvicorn:
+
+    python -m benchmarks.async_vs_threadpool --concurrency 200 --requests 5000
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="rental-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}"
+os.environ["ARCHIVE_DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'archive.db')}"
+# In-process runs never touch Redis
+os.environ.setdefault("VERSION_STORE_URL", "memory://")
+os.environ.setdefault("CACHE_URL", "memory://")
+
+import httpx
+from sqlalchemy import insert
+
+from app import models, schema
+from app.database import SessionLocal
+from app.main import create_app
+
+
+def seed(vehicles):
+    # httpx's ASGI transport runs no startup hooks, so the schema is created here
+    schema.create()
+    with SessionLocal() as db:
+        db.execute(insert(models.Vehicle.__table__), [
+            {"name": f"Car {i}", "type": "Sedan", "registration_number": f"AT-{i}", "is_available": True}
+            for i in range(vehicles)
+        ])
+        db.commit()
+
+
+async def drive(app, args):
+    rng = random.Random(args.seed)
+    queue = asyncio.Queue()
+    for _ in range(args.requests):
+        queue.put_nowait(f"/vehicles/{rng.randint(1, args.vehicles)}")
+    latencies = []
+
+    async def worker(client):
+        while not queue.empty():
+            path = queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return args.requests / elapsed, statistics.median(latencies) * 1000, latencies[math.ceil(0.99 * len(latencies)) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--vehicles", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    seed(args.vehicles)
+    print(f"{args.requests:,} x GET /vehicles/{{id}} at concurrency {args.concurrency}")
+    for label, async_db in (("threadpool", False), ("async", True)):
+        rps, p50, p99 = asyncio.run(drive(create_app(async_db=async_db), args))
+        print(f"{label:<11} {rps:>8,.0f} req/s  p50 {p50:>7.1f} ms  p99 {p99:>7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Time the availability search on a synthetic fleet.
+
+    python -m benchmarks.availability --vehicles 100000 --rentals 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.database import Base
+from app.utils import batched
+
+TYPES = ["SUV", "Sedan", "Hatchback", "Van", "Truck"]
+
+
+def seed(db, vehicles, rentals, rng):
+    now = datetime.utcnow()
+    db.execute(insert(models.Vehicle.__table__), [
+        {"name": f"Vehicle {i}", "type": TYPES[i % len(TYPES)], "registration_number": f"AV-{i:08d}", "is_available": True}
+        for i in range(vehicles)
+    ])
+
+    def rental_rows():
+        # History spread over the past two years; roughly 1 in 20 rentals is still out
+        for _ in range(rentals):
+            start = now - timedelta(days=rng.uniform(0, 730))
+            length = timedelta(days=rng.uniform(0.5, 10))
+            active = rng.random() < 0.05
+            yield {
+                "vehicle_id": rng.randint(1, vehicles),
+                "user_id": 1,
+                "rent_start": start,
+                "expected_return": start + length,
+                "actual_return": None if active else start + length,
+            }
+
+    for batch in batched(rental_rows(), 50_000):
+        db.execute(insert(models.Rental.__table__), batch)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vehicles", type=int, default=100_000)
+    parser.add_argument("--rentals", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'availability.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+
+        started = time.perf_counter()
+        seed(db, args.vehicles, args.rentals, rng)
+        print(f"seeded {args.vehicles:,} vehicles / {args.rentals:,} rentals in {time.perf_counter() - started:.1f}s")
+
+        now = datetime.utcnow()
+        timings = []
+        for _ in range(args.queries):
+            start = now + timedelta(days=rng.uniform(-30, 30))
+            end = start + timedelta(days=rng.uniform(1, 5))
+            began = time.perf_counter()
+            crud.get_available_vehicles(db, start, end, type=rng.choice(TYPES), limit=100)
+            timings.append((time.perf_counter() - began) * 1000)
+
+        timings.sort()
+        print(f"availability (100 per page): p50 {statistics.median(timings):.2f} ms, "
+              f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms, max {timings[-1]:.2f} ms")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Compare the legacy per-row bulk vehicle import with the batched import engine.
+
+    python -m benchmarks.bulk_import --rows 100000 --batch-size 1000
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+import tracemalloc
+from io import StringIO
+
+# In-process runs never touch Redis
+os.environ.setdefault("VERSION_STORE_URL", "memory://")
+os.environ.setdefault("CACHE_URL", "memory://")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import importer, models
+from app.database import Base
+
+
+def write_fleet_csv(path, rows):
+    with open(path, "w", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["name", "type", "registration_number", "is_available"])
+        for i in range(rows):
+            writer.writerow([f"Vehicle {i}", ("SUV", "Sedan", "Hatchback")[i % 3], f"BENCH-{i:08d}", "True"])
+
+
+def legacy_import(db, path):
+    # Body of process_bulk_vehicles before the import engine: whole file as one string, one ORM object per row
+    with open(path, encoding="utf-8") as fh:
+        file_data = fh.read()
+    reader = csv.DictReader(StringIO(file_data))
+    for row in reader:
+        db.add(models.Vehicle(
+            name=row['name'],
+            type=row['type'],
+            registration_number=row['registration_number'],
+            is_available=row.get('is_available', 'True') == 'True'
+        ))
+    db.commit()
+
+
+def engine_import(db, path, batch_size):
+    importer.import_vehicles(db, path, batch_size=batch_size)
+
+
+def run(label, fn, workdir, csv_path, rows):
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, label)}.db")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        fn(db, csv_path)
+    finally:
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        db.close()
+        engine.dispose()
+    print(f"{label:<8} {rows / elapsed:>12,.0f} rows/s {elapsed:>8.2f}s  peak {peak / 2**20:>8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, "fleet.csv")
+        write_fleet_csv(csv_path, args.rows)
+        print(f"{args.rows:,} rows, batch size {args.batch_size}")
+        run("legacy", legacy_import, workdir, csv_path, args.rows)
+        run("engine", lambda db, path: engine_import(db, path, args.batch_size), workdir, csv_path, args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Hammer a small fleet with concurrent checkout/return cycles and count double-bookings.
+
+Compares the old check-then-update checkout and return with the conditional-UPDATE ones:
+
+    python -m benchmarks.checkout_contention --vehicles 20 --threads 16 --attempts 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# In-process runs never touch Redis
+os.environ.setdefault("VERSION_STORE_URL", "memory://")
+os.environ.setdefault("CACHE_URL", "memory://")
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+from app.database import Base, engine_url
+
+
+def legacy_create_rental(db, rental):
+    # crud.create_rental before the conditional UPDATE
+    vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == rental.vehicle_id).first()
+    if not vehicle:
+        raise ValueError(f"Vehicle with ID {rental.vehicle_id} does not exist.")
+    if vehicle.is_available == False:
+        raise ValueError(f"Vehicle with ID {rental.vehicle_id} is not available for rental.")
+    db_rental = models.Rental(**rental.dict())
+    db.query(models.Vehicle).filter(models.Vehicle.id == rental.vehicle_id).update({"is_available": False})
+    db.add(db_rental)
+    db.commit()
+    db.refresh(db_rental)
+    return db_rental
+
+
+def legacy_return_vehicle(db, rental_id):
+    # crud.return_vehicle before the conditional UPDATE
+    rental = db.query(models.Rental).filter(models.Rental.id == rental_id).first()
+    if rental:
+        rental.actual_return = datetime.utcnow()
+        db.query(models.Vehicle).filter(models.Vehicle.id == rental.vehicle_id).update({"is_available": True})
+        db.commit()
+        db.refresh(rental)
+    return rental
+
+
+def run(label, checkout, checkin, workdir, args):
+    engine = create_engine(
+        engine_url(f"sqlite:///{os.path.join(workdir, label)}.db"),
+        connect_args={"check_same_thread": False, "timeout": 30},
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.execute(insert(models.User.__table__), [{"name": "Bench", "contact": "bench@example.com"}])
+        db.execute(insert(models.Vehicle.__table__), [
+            {"name": f"Car {i}", "type": "Sedan", "registration_number": f"CC-{i}", "is_available": True}
+            for i in range(args.vehicles)
+        ])
+        db.commit()
+
+    remaining = iter(range(args.attempts))
+    lock = threading.Lock()
+    held = set()
+    stats = {"booked": 0, "double": 0}
+
+    def worker(seed):
+        rng = random.Random(seed)
+        db = Session()
+        try:
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                vehicle_id = rng.randint(1, args.vehicles)
+                rental = schemas.RentalCreate(
+                    vehicle_id=vehicle_id, user_id=1, expected_return=datetime.utcnow() + timedelta(days=1),
+                )
+                try:
+                    rental_id = checkout(db, rental).id
+                except ValueError:
+                    db.rollback()
+                    continue
+                with lock:
+                    stats["booked"] += 1
+                    # Someone else still holds this vehicle: both checkouts passed the availability check
+                    stats["double"] += vehicle_id in held
+                    held.add(vehicle_id)
+                time.sleep(args.hold)
+                with lock:
+                    held.discard(vehicle_id)
+                checkin(db, rental_id)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    print(f"{label:<8} {stats['booked'] / elapsed:>8,.0f} checkouts/s  {stats['booked']:>5} booked  "
+          f"{stats['double']:>5} double-bookings")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vehicles", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=2000)
+    parser.add_argument("--hold", type=float, default=0.001, help="seconds a vehicle is kept before it is returned")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        run("legacy", legacy_create_rental, legacy_return_vehicle, workdir, args)
+        run("atomic", crud.create_rental, crud.return_vehicle, workdir, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Worker boot latency: importing the app, running its startup hooks and serving the first request.
+
+Every run is a fresh interpreter, as a newly forked or spawned worker would be, against a temporary
+SQLite database whose schema is created beforehand (`python -m app.schema`). Runs with the schema
+created at startup (the default) and with CREATE_SCHEMA_ON_STARTUP=false:
+
+    python -m benchmarks.cold_start --repeat 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Runs in the child; the test client is imported before the clock starts, since a server has its own
+CHILD = """
+import json, time
+from fastapi.testclient import TestClient
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+with TestClient(app) as client:
+    ready = time.perf_counter()
+    assert client.get("/vehicles/1").status_code == 404
+    served = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "startup_ms": (ready - imported) * 1000,
+                  "first_request_ms": (served - ready) * 1000}))
+"""
+
+
+def boot(env):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rental-boot-")
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'boot.db')}",
+        "ARCHIVE_DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'archive.db')}",
+        "VERSION_STORE_URL": "memory://",
+        "CACHE_URL": "memory://",
+        "METRICS_ENABLED": "false",
+    }
+    subprocess.run([sys.executable, "-m", "app.schema"], env=env, check=True, capture_output=True)
+
+    columns = ["import_ms", "startup_ms", "first_request_ms", "process_ms"]
+    print(f"{'schema at startup':<18} " + " ".join(f"{column:>17}" for column in columns) + "  (median)")
+    for create_schema in ("true", "false"):
+        runs = [boot({**env, "CREATE_SCHEMA_ON_STARTUP": create_schema}) for _ in range(args.repeat)]
+        medians = [statistics.median(run[column] for run in runs) for column in columns]
+        print(f"{create_schema:<18} " + " ".join(f"{value:>17.1f}" for value in medians))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compare two runs saved by `benchmarks.load --output` and flag regressions.
+
+    python -m benchmarks.compare runs/base.json runs/new.json --threshold 10
+
+A scenario regresses when its throughput drops, or its p95/p99 latency grows, by more than
+--threshold percent, or when it starts returning errors. Exits with status 1 on any regression.
+"""
+import argparse
+import json
+import sys
+
+# (metric, higher is better)
+METRICS = [("throughput", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False)]
+GATED = {"throughput", "p95_ms", "p99_ms"}
+
+
+def change(base: float, new: float) -> float:
+    return (new - base) / base * 100 if base else 0.0
+
+
+def compare(base: dict, new: dict, threshold: float):
+    # Yields (scenario, metric, base, new, percent change, regressed)
+    for scenario, before in base["results"].items():
+        after = new["results"].get(scenario)
+        if after is None:
+            continue
+        for metric, higher_is_better in METRICS:
+            pct = change(before[metric], after[metric])
+            worse = -pct if higher_is_better else pct
+            yield scenario, metric, before[metric], after[metric], pct, metric in GATED and worse > threshold
+        if after["errors"] > before["errors"]:
+            yield scenario, "errors", before["errors"], after["errors"], 0.0, True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed change in percent")
+    args = parser.parse_args()
+
+    with open(args.base) as fh:
+        base = json.load(fh)
+    with open(args.new) as fh:
+        new = json.load(fh)
+    if (base["meta"]["scale"], base["meta"]["seed"]) != (new["meta"]["scale"], new["meta"]["seed"]):
+        print("warning: runs used different scales or seeds", file=sys.stderr)
+
+    print(f"base {base['meta'].get('revision')} ({base['meta']['created']})  "
+          f"new {new['meta'].get('revision')} ({new['meta']['created']})")
+    regressions = 0
+    for scenario, metric, before, after, pct, regressed in compare(base, new, args.threshold):
+        regressions += regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{scenario:<10} {metric:<10} {before:>10,.1f} -> {after:>10,.1f}  {pct:>+7.1f}%{flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
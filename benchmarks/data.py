@@ -0,0 +1,107 @@
+"""Seeded synthetic fleet of vehicles, users and rentals at a configurable scale.
+
+The same scale and seed always produce the same rows, so runs against separately seeded
+databases are comparable. Seed a database for a local uvicorn run with:
+
+    python -m benchmarks.data --scale 500k --database-url sqlite:///./bench.db
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import create_engine, insert
+
+from app import models
+from app.database import Base
+from app.utils import batched
+
+TYPES = ["SUV", "Sedan", "Hatchback", "Van", "Truck"]
+BATCH_SIZE = 50_000
+
+
+class Scale(NamedTuple):
+    vehicles: int
+    users: int
+    rentals: int
+
+    @property
+    def active(self) -> int:
+        # Every other vehicle is out on an active rental; those rentals get ids 1..active,
+        # the remaining vehicles (active+1..vehicles) are free to check out
+        return min(self.vehicles // 2, self.rentals)
+
+
+SCALES = {
+    "10k": Scale(1_000, 2_000, 10_000),
+    "100k": Scale(10_000, 20_000, 100_000),
+    "500k": Scale(50_000, 100_000, 500_000),
+    "5m": Scale(500_000, 1_000_000, 5_000_000),
+}
+
+
+def vehicle_rows(scale: Scale):
+    for i in range(1, scale.vehicles + 1):
+        yield {
+            "name": f"Vehicle {i}", "type": TYPES[i % len(TYPES)],
+            "registration_number": f"SYN-{i:08d}", "is_available": i > scale.active,
+        }
+
+
+def user_rows(scale: Scale):
+    for i in range(1, scale.users + 1):
+        yield {"name": f"User {i}", "contact": f"user{i}@example.com"}
+
+
+def rental_rows(scale: Scale, rng: random.Random, now: datetime):
+    for vehicle_id in range(1, scale.active + 1):
+        start = now - timedelta(days=rng.uniform(0, 7))
+        yield {
+            "vehicle_id": vehicle_id, "user_id": rng.randint(1, scale.users),
+            "rent_start": start, "expected_return": start + timedelta(days=rng.uniform(1, 14)),
+            "actual_return": None,
+        }
+    # Returned history spread over the past two years
+    for _ in range(scale.rentals - scale.active):
+        start = now - timedelta(days=rng.uniform(7, 730))
+        end = start + timedelta(days=rng.uniform(0.5, 10))
+        yield {
+            "vehicle_id": rng.randint(1, scale.vehicles), "user_id": rng.randint(1, scale.users),
+            "rent_start": start, "expected_return": end, "actual_return": end,
+        }
+
+
+def generate(engine, scale: Scale, seed: int = 42, now: datetime = None):
+    rng = random.Random(seed)
+    # A fixed clock keeps the rows identical between runs
+    now = now or datetime(2024, 1, 1)
+    Base.metadata.create_all(bind=engine)
+    for table, rows in (
+        (models.Vehicle.__table__, vehicle_rows(scale)),
+        (models.User.__table__, user_rows(scale)),
+        (models.Rental.__table__, rental_rows(scale, rng, now)),
+    ):
+        for batch in batched(rows, BATCH_SIZE):
+            with engine.begin() as conn:
+                conn.execute(insert(table), batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--scale", choices=SCALES, default="10k")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale]
+    engine = create_engine(args.database_url)
+    started = time.perf_counter()
+    generate(engine, scale, args.seed)
+    engine.dispose()
+    print(f"Seeded {scale.vehicles:,} vehicles, {scale.users:,} users and {scale.rentals:,} rentals "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
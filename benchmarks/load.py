@@ -0,0 +1,214 @@
+"""Load scenarios against a seeded fleet, with throughput and p50/p95/p99 latency per scenario.
+
+By default the app is driven in-process over ASGI on a freshly seeded temporary SQLite database
+(Celery runs eagerly, emails go to memory). Pass --url to drive a running server instead, seeded
+beforehand with `python -m benchmarks.data` at the same --scale and --seed:
+
+    python -m benchmarks.load --scale 100k --requests 2000 --concurrency 50 --output runs/base.json
+    python -m benchmarks.load --url http://127.0.0.1:8000 --scale 500k --scenarios lookup,list
+
+Save runs with --output and compare them with `python -m benchmarks.compare`.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import itertools
+import json
+import math
+import os
+import random
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+WORKDIR = tempfile.mkdtemp(prefix="rental-load-")
+# In-process runs get their own database and never touch Redis
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(WORKDIR, 'load.db')}")
+os.environ.setdefault("IMPORT_STAGING_DIR", os.path.join(WORKDIR, "imports"))
+os.environ.setdefault("EMAIL_BACKEND", "memory")
+os.environ.setdefault("NOTIFICATION_QUEUE_URL", "memory://")
+os.environ.setdefault("VERSION_STORE_URL", "memory://")
+os.environ.setdefault("CACHE_URL", "memory://")
+
+import httpx
+
+from benchmarks.data import SCALES, TYPES, Scale, generate
+
+
+# Scenarios: each takes the client, a seeded RNG and the run state, and sends one request
+async def lookup(client, rng, state):
+    kind, count = rng.choice([("vehicles", state.scale.vehicles), ("users", state.scale.users),
+                              ("rentals", state.scale.rentals)])
+    return await client.get(f"/{kind}/{rng.randint(1, count)}")
+
+
+async def list_(client, rng, state):
+    if rng.random() < 0.5:
+        return await client.get("/rentals/", params={"status": "active", "limit": 100})
+    return await client.get("/vehicles/", params={"type": rng.choice(TYPES), "limit": 100})
+
+
+async def checkout(client, rng, state):
+    return await client.post("/rentals/", json={
+        "vehicle_id": next(state.free_vehicles), "user_id": rng.randint(1, state.scale.users),
+        "expected_return": "2030-01-01T10:00:00",
+    })
+
+
+async def return_(client, rng, state):
+    return await client.post(f"/rentals/{next(state.active_rentals)}/return")
+
+
+async def bulk_import(client, rng, state):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["name", "type", "registration_number", "is_available"])
+    for _ in range(state.import_rows):
+        i = next(state.import_counter)
+        writer.writerow([f"Imported {i}", rng.choice(TYPES), f"IMP-{i:09d}", "True"])
+    return await client.post("/vehicles/vehicles_bulk/", files={"file": ("fleet.csv", out.getvalue(), "text/csv")})
+
+
+SCENARIOS = {
+    "lookup": lookup,
+    "list": list_,
+    "checkout": checkout,
+    "return": return_,
+    "import": bulk_import,
+}
+
+
+class RunState:
+    def __init__(self, scale: Scale, import_rows: int):
+        self.scale = scale
+        # Each checkout takes a vehicle that is still free, each return a rental that is still out
+        self.free_vehicles = iter(range(scale.active + 1, scale.vehicles + 1))
+        self.active_rentals = iter(range(1, scale.active + 1))
+        self.import_counter = itertools.count()
+        self.import_rows = import_rows
+
+
+def percentile(sorted_values, pct):
+    # Nearest rank
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, name, requests, concurrency, state, seed):
+    scenario, rng = SCENARIOS[name], random.Random(f"{seed}-{name}")
+    remaining = iter(range(requests))
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        while next(remaining, None) is not None:
+            started = time.perf_counter()
+            try:
+                response = await scenario(client, rng, state)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def in_process_app(scale, seed):
+    from app import schema
+    from app.celery_app import celery_app
+    from app.database import get_engine
+    from app.main import app
+
+    celery_app.conf.task_always_eager = True
+    # httpx does not run the app's startup hooks
+    schema.create()
+    generate(get_engine(), scale, seed)
+    return app
+
+
+async def drive(args, scale):
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        client = httpx.AsyncClient(app=in_process_app(scale, args.seed), base_url="http://bench", timeout=60)
+
+    state = RunState(scale, args.import_rows)
+    results = {}
+    async with client:
+        for name in args.scenarios:
+            requests = args.import_requests if name == "import" else args.requests
+            if name in ("checkout", "return") and requests > scale.active:
+                print(f"{name}: capping at {scale.active:,} requests, the number of seeded "
+                      f"{'free vehicles' if name == 'checkout' else 'active rentals'}")
+                requests = scale.active
+            results[name] = await run_scenario(client, name, requests, args.concurrency, state, args.seed)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    print(f"{'scenario':<10} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, r in results.items():
+        print(f"{name:<10} {r['requests']:>9,} {r['errors']:>7,} {r['throughput']:>9,.0f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="10k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenarios", default="lookup,list,checkout,return,import",
+                        type=lambda value: value.split(","))
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--import-requests", type=int, default=5)
+    parser.add_argument("--import-rows", type=int, default=5000, help="CSV rows per import request")
+    parser.add_argument("--url", help="base URL of a running server; in-process when omitted")
+    parser.add_argument("--output", help="write the results as JSON for benchmarks.compare")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    scale = SCALES[args.scale]
+    results = asyncio.run(drive(args, scale))
+    print_results(results)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as fh:
+            json.dump({
+                "meta": {
+                    "scale": args.scale, "seed": args.seed, "concurrency": args.concurrency,
+                    "target": args.url or "in-process", "revision": git_revision(),
+                    "created": datetime.utcnow().isoformat(timespec="seconds"),
+                },
+                "results": results,
+            }, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Confirmation email throughput: one task per rental vs coalesced batches over a pooled connection.
+
+Both variants deliver to an in-process SMTP stub:
+
+    python -m benchmarks.notifications --rentals 2000 --batch-size 200
+"""
+import argparse
+import os
+import smtplib
+import tempfile
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, notifications
+from app.celery_app.tasks import send_rental_confirmations
+from app.database import Base
+from tests.smtp_stub import SMTPStub
+
+
+def seed(engine, count):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), [
+            {"name": f"User {i}", "contact": f"user{i}@example.com"} for i in range(count)
+        ])
+        conn.execute(insert(models.Vehicle.__table__), [
+            {"name": f"Car {i}", "type": "Sedan", "registration_number": f"NT-{i}", "is_available": False}
+            for i in range(count)
+        ])
+        conn.execute(insert(models.Rental.__table__), [
+            {"user_id": i + 1, "vehicle_id": i + 1, "rent_start": now, "expected_return": now + timedelta(days=1)}
+            for i in range(count)
+        ])
+
+
+def legacy_send(Session, rental_id, port):
+    # The old send_rental_conf_email: three lookups and a fresh SMTP session per rental
+    db = Session()
+    try:
+        rental = crud.get_rental(db, rental_id)
+        user = crud.get_user(db, rental.user_id)
+        vehicle = crud.get_vehicle(db, rental.vehicle_id)
+        email = EmailMessage()
+        email["From"] = "rentals@example.com"
+        email["To"] = user.contact
+        email["Subject"] = "Rental Confirmation"
+        email.set_content(f"Dear {user.name}, {vehicle.name} {vehicle.registration_number} {rental.rent_start}")
+        with smtplib.SMTP("127.0.0.1", port, local_hostname="localhost") as smtp:
+            smtp.send_message(email)
+    finally:
+        db.close()
+
+
+def report(label, stub, queries, elapsed):
+    count = len(stub.messages)
+    print(f"{label:<10} {count / elapsed:>8,.0f} msgs/s  {count:>6} sent  "
+          f"{queries:>6} queries  {stub.connections:>6} SMTP connections")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rentals", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        seed(engine, args.rentals)
+        Session = sessionmaker(bind=engine)
+        rental_ids = list(range(1, args.rentals + 1))
+
+        queries = 0
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def count(*_):
+            nonlocal queries
+            queries += 1
+
+        with SMTPStub() as stub:
+            started = time.perf_counter()
+            for rental_id in rental_ids:
+                legacy_send(Session, rental_id, stub.port)
+            report("per-task", stub, queries, time.perf_counter() - started)
+
+        queries = 0
+        with SMTPStub() as stub:
+            sink = notifications.SMTPSink("127.0.0.1", stub.port, sender="rentals@example.com")
+            notifications._sink = sink
+            started = time.perf_counter()
+            db = Session()
+            for start in range(0, len(rental_ids), args.batch_size):
+                send_rental_confirmations(db, rental_ids[start:start + args.batch_size])
+            db.close()
+            sink.close()
+            report("coalesced", stub, queries, time.perf_counter() - started)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Latency of the /reports queries on the seeded fleet, after a rollup backfill.
+
+    python -m benchmarks.reports --scale 500k
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import rollups
+from benchmarks.data import SCALES, generate
+
+NOW = datetime(2024, 1, 1)
+START, END = date(2023, 12, 1), date(2024, 1, 1)
+
+REPORTS = {
+    "utilization": lambda db: rollups.utilization(db, START, END, now=NOW),
+    "rental_length": lambda db: rollups.rental_lengths(db, START, END),
+    "overdue": lambda db: rollups.overdue(db, START, END, now=NOW),
+    "top_customers": lambda db: rollups.top_customers(db, 10),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="100k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'reports.db')}")
+        generate(engine, SCALES[args.scale], args.seed, now=NOW)
+        Session = sessionmaker(bind=engine)
+
+        with Session() as db:
+            started = time.perf_counter()
+            days, customers = rollups.rebuild(db)
+            print(f"backfill: {days:,} day/type rows, {customers:,} customers in {time.perf_counter() - started:.1f}s")
+
+        for name, report in REPORTS.items():
+            timings = []
+            with Session() as db:
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    report(db)
+                    timings.append((time.perf_counter() - started) * 1000)
+            print(f"{name:<14} p50 {statistics.median(timings):>7.2f} ms  max {max(timings):>7.2f} ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Serialized rows/sec of a large rental list: ORM objects through the response model vs plain rows through orjson.
+
+    python -m benchmarks.serialization --rentals 50000 --repeat 5
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from app import crud, models, schemas
+from app.database import Base
+from app.serialization import rows_response
+
+
+def seed(db, count):
+    now = datetime.utcnow()
+    db.execute(insert(models.Rental.__table__), [
+        {"vehicle_id": i % 1000 + 1, "user_id": i % 500 + 1, "rent_start": now - timedelta(days=i % 30),
+         "expected_return": now + timedelta(days=i % 7), "actual_return": None if i % 3 else now}
+        for i in range(count)
+    ])
+    db.commit()
+
+
+def model_response(db, limit):
+    # What FastAPI does for response_model=list[Rental] on ORM objects: validate, encode, dump
+    rentals = db.query(models.Rental).order_by(models.Rental.id).limit(limit).all()
+    return JSONResponse(jsonable_encoder(parse_obj_as(List[schemas.Rental], rentals)))
+
+
+def fast_response(db, limit):
+    rows, next_after_id = crud.get_rentals(db, limit=limit)
+    return rows_response(Request({"type": "http", "query_string": b"", "headers": []}), rows, next_after_id)
+
+
+def measure(label, render, Session, args):
+    timings = []
+    for _ in range(args.repeat):
+        db = Session()
+        started = time.perf_counter()
+        body = render(db, args.rentals).body
+        timings.append(time.perf_counter() - started)
+        db.close()
+    best = min(timings)
+    print(f"{label:<8} {args.rentals / best:>12,.0f} rows/s  {best * 1000:>8.1f} ms  {len(body) / 1024:>8,.0f} KiB")
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rentals", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'serialization.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            seed(db, args.rentals)
+
+        measure("model", model_response, Session, args)
+        measure("rows", fast_response, Session, args)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""SQL statements, commits and latency per request for each write endpoint.
+
+The app is driven in-process on a fresh temporary SQLite database; statements and commits are
+counted with engine events, so the numbers are the same on any machine:
+
+    python -m benchmarks.writes --requests 500
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+WORKDIR = tempfile.mkdtemp(prefix="rental-writes-")
+# In-process runs get their own database and never touch Redis
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(WORKDIR, 'writes.db')}")
+os.environ.setdefault("ARCHIVE_DATABASE_URL", f"sqlite:///{os.path.join(WORKDIR, 'archive.db')}")
+os.environ.setdefault("EMAIL_BACKEND", "memory")
+os.environ.setdefault("NOTIFICATION_QUEUE_URL", "memory://")
+os.environ.setdefault("VERSION_STORE_URL", "memory://")
+os.environ.setdefault("CACHE_URL", "memory://")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+
+def _vehicle():
+    return {"name": "Bench Car", "type": "Sedan", "registration_number": f"WR-{uuid.uuid4().hex[:12]}"}
+
+
+def _user():
+    return {"name": "Bench User", "contact": "bench@example.com"}
+
+
+def run(client, engine, requests):
+    counts = {"statements": 0, "commits": 0}
+
+    def statement(*args):
+        counts["statements"] += 1
+
+    def commit(*args):
+        counts["commits"] += 1
+
+    def measure(name, send, setup=lambda: None):
+        # setup() runs outside the measured window, e.g. to create the rental a return needs
+        statements = commits = elapsed = 0.0
+        for _ in range(requests):
+            arg = setup()
+            counts.update(statements=0, commits=0)
+            start = time.perf_counter()
+            response = send(arg)
+            elapsed += time.perf_counter() - start
+            assert response.status_code < 300, (name, response.status_code, response.text)
+            statements += counts["statements"]
+            commits += counts["commits"]
+        return name, statements / requests, commits / requests, elapsed / requests * 1000
+
+    def checkout(_=None):
+        vehicle = client.post("/vehicles/", json=_vehicle()).json()
+        user = client.post("/users/", json=_user()).json()
+        return client.post("/rentals/", json={
+            "vehicle_id": vehicle["id"], "user_id": user["id"], "expected_return": "2030-01-01T10:00:00",
+        }).json()
+
+    def free_vehicle():
+        return client.post("/vehicles/", json=_vehicle()).json()["id"]
+
+    event.listen(engine, "before_cursor_execute", statement)
+    event.listen(engine, "commit", commit)
+    try:
+        user_id = client.post("/users/", json=_user()).json()["id"]
+        return [
+            measure("POST /vehicles/", lambda _: client.post("/vehicles/", json=_vehicle())),
+            measure("POST /users/", lambda _: client.post("/users/", json=_user())),
+            measure("POST /rentals/", lambda vehicle_id: client.post("/rentals/", json={
+                "vehicle_id": vehicle_id, "user_id": user_id, "expected_return": "2030-01-01T10:00:00",
+            }), free_vehicle),
+            measure("POST /rentals/{id}/return",
+                    lambda rental: client.post(f"/rentals/{rental['id']}/return"), checkout),
+            measure("DELETE /rentals/{id}", lambda rental: client.delete(f"/rentals/{rental['id']}"), checkout),
+            measure("POST /users/Onboard&Rent", lambda vehicle_id: client.post("/users/Onboard&Rent", json={
+                **_user(), "vehicle_id": vehicle_id, "expected_return": "2030-01-01T10:00:00",
+            }), free_vehicle),
+        ]
+    finally:
+        event.remove(engine, "before_cursor_execute", statement)
+        event.remove(engine, "commit", commit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    args = parser.parse_args()
+
+    from app.celery_app import celery_app
+    from app.database import get_engine
+    from app.main import app
+
+    celery_app.conf.task_always_eager = True
+    with TestClient(app) as client:
+        results = run(client, get_engine(), args.requests)
+
+    print(f"{'endpoint':<28} {'statements':>10} {'commits':>8} {'ms/req':>8}")
+    for name, statements, commits, ms in results:
+        print(f"{name:<28} {statements:>10.1f} {commits:>8.1f} {ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
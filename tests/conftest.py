@@ -1,20 +1,43 @@
 
 
+import os
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from app.main import app
-from app.database import Base
-from app.dependencies import get_db
 
 TEST_DATABASE_URL = "sqlite:///./test_rental_manager.db"
+TEST_ARCHIVE_DATABASE_URL = "sqlite:///./test_rental_archive.db"
 
-engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
+# Point the app (and the Celery tasks it runs) at the test database before it is imported
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ["ARCHIVE_DATABASE_URL"] = TEST_ARCHIVE_DATABASE_URL
+os.environ["IMPORT_STAGING_DIR"] = tempfile.mkdtemp(prefix="rental-imports-")
+os.environ["EMAIL_BACKEND"] = "memory"
+os.environ["NOTIFICATION_QUEUE_URL"] = "memory://"
+os.environ["VERSION_STORE_URL"] = "memory://"
+os.environ["CACHE_URL"] = "memory://"
+
+from app.main import app
+from app import search
+from app.database import ArchiveBase, ArchiveSessionLocal, Base, engine_url, get_archive_engine
+from app.dependencies import get_db
+from app.celery_app import celery_app
+
+engine = create_engine(engine_url(TEST_DATABASE_URL), connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Create tables before tests run
+# Start every run from an empty schema
+Base.metadata.drop_all(bind=engine)
 Base.metadata.create_all(bind=engine)
+search.install(engine)
+ArchiveBase.metadata.drop_all(bind=get_archive_engine())
+ArchiveBase.metadata.create_all(bind=get_archive_engine())
+
+# Run tasks in-process instead of going through the Redis broker
+celery_app.conf.task_always_eager = True
 
 # Dependency override
 def override_get_db():
@@ -30,3 +53,21 @@ app.dependency_overrides[get_db] = override_get_db
 @pytest.fixture(scope="function")
 def client():
     yield TestClient(app)
+
+
+@pytest.fixture(scope="function")
+def db():
+    session = TestingSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture(scope="function")
+def archive_db():
+    session = ArchiveSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,86 @@
+import asyncio
+import io
+import math
+import time
+import uuid
+
+import httpx
+
+from app import admission, crud
+from app.config import settings
+from app.main import app
+
+
+def _p99(latencies):
+    # Nearest rank: the smallest sample at or above 99% of them
+    return sorted(latencies)[math.ceil(0.99 * len(latencies)) - 1]
+
+
+def _flood(vehicle_id, writers, reads):
+    # `writers` clients posting checkouts back to back while GET /vehicles/{id} is timed `reads` times
+    async def run():
+        statuses, done = [], asyncio.Event()
+
+        async def writer(client):
+            while not done.is_set():
+                response = await client.post("/rentals/", json={
+                    "vehicle_id": vehicle_id, "user_id": 1, "expected_return": "2030-01-01T10:00:00",
+                })
+                statuses.append(response)
+                if response.status_code == 503:
+                    # Clients wait as long as Retry-After says
+                    try:
+                        await asyncio.wait_for(done.wait(), float(response.headers["Retry-After"]))
+                    except asyncio.TimeoutError:
+                        pass
+
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            flood = [asyncio.create_task(writer(client)) for _ in range(writers)]
+            await asyncio.sleep(0.1)
+            latencies = []
+            for _ in range(reads):
+                started = time.perf_counter()
+                assert (await client.get(f"/vehicles/{vehicle_id}")).status_code == 200
+                latencies.append(time.perf_counter() - started)
+            done.set()
+            await asyncio.gather(*flood)
+        return latencies, statuses
+
+    return asyncio.run(run())
+
+
+def test_reads_hold_steady_under_a_write_flood(client, monkeypatch):
+    vehicle_id = client.post("/vehicles/", json={
+        "name": "Flooded", "type": "Sedan", "registration_number": f"FL-{uuid.uuid4().hex[:10]}"
+    }).json()["id"]
+
+    def slow_checkout(db, rental):
+        # A checkout stuck behind the SQLite writer lock, holding its threadpool thread
+        time.sleep(0.05)
+        raise ValueError("Vehicle is not available for rental.")
+
+    monkeypatch.setattr(crud, "create_rental", slow_checkout)
+    monkeypatch.setattr(settings, "admission_write_limit", 4)
+    monkeypatch.setattr(settings, "admission_write_queue", 8)
+
+    monkeypatch.setattr(settings, "admission_enabled", False)
+    unprotected, _ = _flood(vehicle_id, writers=80, reads=20)
+    monkeypatch.setattr(settings, "admission_enabled", True)
+    protected, responses = _flood(vehicle_id, writers=80, reads=20)
+
+    # Without admission control the flood takes every threadpool thread and reads queue behind it.
+    # Compared as a ratio, since absolute latencies depend on the machine.
+    assert _p99(unprotected) > 5 * _p99(protected)
+    shed = [response for response in responses if response.status_code == 503]
+    assert shed
+    assert shed[0].headers["Retry-After"] == str(settings.admission_retry_after)
+
+
+def test_bulk_upload_is_refused_while_the_task_queue_is_backed_up(client, monkeypatch):
+    monkeypatch.setattr(admission, "task_backlog", lambda: settings.admission_max_task_backlog)
+    upload = {"file": ("vehicles.csv", io.BytesIO(b"name,type,registration_number\nA,Sedan,BK-1\n"), "text/csv")}
+
+    response = client.post("/vehicles/vehicles_bulk/", files=upload)
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(settings.admission_retry_after)
@@ -0,0 +1,101 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, inspect, text
+
+from app import archive, database, models, schema
+from app.celery_app import tasks
+
+
+def _rental(client):
+    user_id = client.post("/users/", json={"name": "Archived", "contact": "archived@example.com"}).json()["id"]
+    vehicle_id = client.post("/vehicles/", json={
+        "name": "Old Car", "type": "Archive", "registration_number": f"AR-{uuid.uuid4().hex[:10]}"
+    }).json()["id"]
+    return client.post("/rentals/", json={
+        "user_id": user_id, "vehicle_id": vehicle_id, "expected_return": "2030-01-01T10:00:00",
+    }).json()
+
+
+def test_closed_rentals_move_to_the_archive(client, db, archive_db):
+    closed = _rental(client)
+    closed = client.post(f"/rentals/{closed['id']}/return").json()
+    active = _rental(client)
+
+    moved = archive.archive_rentals(db, archive_db, datetime.utcnow() + timedelta(seconds=1), batch_size=1, max_batches=100)
+
+    assert moved >= 1
+    assert db.get(models.Rental, closed["id"]) is None
+    assert db.get(models.Rental, active["id"]) is not None
+    assert archive_db.get(models.ArchivedRental, closed["id"]).vehicle_type == "Archive"
+    # Reads by id fall through to the archive
+    assert client.get(f"/rentals/{closed['id']}").json() == closed
+    assert client.get(f"/rentals/{active['id']}").status_code == 200
+    assert client.get("/rentals/999999999").status_code == 404
+
+
+def test_archiving_is_idempotent_and_respects_the_cutoff(client, db, archive_db):
+    rental = client.post(f"/rentals/{_rental(client)['id']}/return").json()
+    # A copy left behind by a run whose delete was lost
+    archive_db.add(models.ArchivedRental(
+        id=rental["id"], vehicle_id=rental["vehicle_id"], vehicle_type="Archive", user_id=rental["user_id"],
+        rent_start=datetime.fromisoformat(rental["rent_start"]), expected_return=datetime.fromisoformat(rental["expected_return"]),
+        actual_return=datetime.fromisoformat(rental["actual_return"]),
+    ))
+    archive_db.commit()
+
+    assert tasks.archive_rentals.delay().get() == 0  # returned just now, well inside ARCHIVE_AFTER_DAYS
+    assert archive.archive_batch(db, archive_db, datetime.utcnow() + timedelta(seconds=1), 1000) >= 1
+    assert db.get(models.Rental, rental["id"]) is None
+    assert archive_db.query(models.ArchivedRental).filter_by(id=rental["id"]).count() == 1
+
+
+def test_reused_id_is_not_deleted(client, db, archive_db):
+    rental = client.post(f"/rentals/{_rental(client)['id']}/return").json()
+    # A different rental archived under the same id, as a table that reused ids would leave behind
+    other = models.ArchivedRental(
+        id=rental["id"], vehicle_id=rental["vehicle_id"], vehicle_type="Archive", user_id=rental["user_id"],
+        rent_start=datetime(2020, 1, 1), expected_return=datetime(2020, 1, 2), actual_return=datetime(2020, 1, 2),
+    )
+    archive_db.add(other)
+    archive_db.commit()
+
+    try:
+        with pytest.raises(RuntimeError):
+            archive.archive_batch(db, archive_db, datetime.utcnow() + timedelta(seconds=1), 1000)
+        assert db.get(models.Rental, rental["id"]) is not None
+    finally:
+        # Later tests archive and report over the same databases
+        archive_db.delete(other)
+        archive_db.commit()
+
+
+def test_migration_stops_rentals_reusing_archived_ids(tmp_path):
+    engine = database.create_db_engine(f"sqlite:///{tmp_path / 'live.db'}")
+    archive_engine = database.create_db_engine(f"sqlite:///{tmp_path / 'archive.db'}")
+    with engine.begin() as conn:
+        # The rentals table as created before it was declared AUTOINCREMENT
+        conn.execute(text(
+            "CREATE TABLE rentals (id INTEGER PRIMARY KEY, vehicle_id INTEGER, user_id INTEGER, "
+            "rent_start DATETIME, expected_return DATETIME, actual_return DATETIME)"
+        ))
+        conn.execute(text("INSERT INTO rentals (id, vehicle_id, user_id) VALUES (1, 1, 1), (2, 1, 1)"))
+    database.ArchiveBase.metadata.create_all(bind=archive_engine)
+    with archive_engine.begin() as conn:
+        conn.execute(insert(models.ArchivedRental.__table__).values(
+            id=7, vehicle_id=1, user_id=1, rent_start=datetime(2020, 1, 1), expected_return=datetime(2020, 1, 2),
+            actual_return=datetime(2020, 1, 2),
+        ))
+
+    database.Base.metadata.create_all(bind=engine)
+    schema.migrate(engine, archive_engine)
+    schema.migrate(engine, archive_engine)
+
+    with engine.begin() as conn:
+        assert "AUTOINCREMENT" in conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'rentals'")).scalar()
+        assert conn.execute(text("SELECT id FROM rentals ORDER BY id")).scalars().all() == [1, 2]
+        assert "ix_rentals_active_due" in {index["name"] for index in inspect(conn).get_indexes("rentals")}
+        assert conn.execute(insert(models.Rental.__table__).values(vehicle_id=1, user_id=1)).inserted_primary_key[0] == 8
+    engine.dispose()
+    archive_engine.dispose()
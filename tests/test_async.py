@@ -0,0 +1,59 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import APIRouter
+from fastapi.testclient import TestClient
+
+from app.main import create_app, with_async_routes
+
+
+@pytest.fixture(scope="module")
+def async_client():
+    with TestClient(create_app(async_db=True)) as client:
+        yield client
+
+
+def test_async_routes_replace_sync_handlers():
+    app = create_app(async_db=True)
+    endpoints = {route.path: route.endpoint for route in app.routes if "GET" in getattr(route, "methods", ())}
+    assert endpoints["/vehicles/{vehicle_id}"].__module__ == "app.routers.aio.vehicles"
+    # Routes without an async version keep their sync handler, in their original order
+    assert endpoints["/vehicles/availability"].__module__ == "app.routers.vehicles"
+    paths = [route.path for route in app.routes]
+    assert paths.index("/vehicles/availability") < paths.index("/vehicles/{vehicle_id}")
+
+
+def test_async_route_without_sync_counterpart_is_refused():
+    async_router = APIRouter()
+    async_router.add_api_route("/orphan", lambda: None, methods=["GET"])
+
+    with pytest.raises(RuntimeError, match="/orphan"):
+        with_async_routes(APIRouter(), async_router)
+
+
+def test_async_rental_lifecycle(async_client):
+    user = async_client.post("/users/", json={"name": "Async User", "contact": "async@example.com"}).json()
+    vehicle = async_client.post("/vehicles/", json={
+        "name": "Async Car", "type": "Sedan", "registration_number": f"AS-{uuid.uuid4().hex[:10]}"
+    }).json()
+    rental_data = {
+        "user_id": user["id"], "vehicle_id": vehicle["id"],
+        "expected_return": (datetime.now() + timedelta(days=1)).isoformat(),
+    }
+
+    response = async_client.post("/rentals/", json=rental_data)
+    assert response.status_code == 200
+    rental = response.json()
+    assert async_client.post("/rentals/", json=rental_data).status_code == 400
+    assert async_client.get(f"/vehicles/{vehicle['id']}").json()["is_available"] is False
+    assert [r["id"] for r in async_client.get("/rentals/", params={"vehicle_id": vehicle["id"]}).json()] == [rental["id"]]
+
+    returned = async_client.post(f"/rentals/{rental['id']}/return")
+    assert returned.status_code == 200
+    assert returned.json()["actual_return"] is not None
+    assert async_client.post(f"/rentals/{rental['id']}/return").status_code == 400
+
+    assert async_client.delete(f"/rentals/{rental['id']}").status_code == 204
+    assert async_client.get(f"/rentals/{rental['id']}").status_code == 404
+    assert async_client.get("/users/-1").status_code == 404
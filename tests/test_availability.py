@@ -0,0 +1,36 @@
+import uuid
+from datetime import datetime, timedelta
+
+
+def _vehicle(client, type_):
+    return client.post("/vehicles/", json={
+        "name": "Avail Car", "type": type_, "registration_number": f"AV-{uuid.uuid4().hex[:10]}"
+    }).json()["id"]
+
+
+def _available(client, type_, start, end):
+    response = client.get("/vehicles/availability", params={
+        "type": type_, "start": start.isoformat(), "end": end.isoformat(),
+    })
+    assert response.status_code == 200
+    return {v["id"] for v in response.json()}
+
+
+def test_availability_excludes_overlapping_rentals(client):
+    type_ = f"SUV-{uuid.uuid4().hex[:6]}"
+    free, rented = _vehicle(client, type_), _vehicle(client, type_)
+    user_id = client.post("/users/", json={"name": "Avail User", "contact": "avail@example.com"}).json()["id"]
+    now = datetime.utcnow()
+    client.post("/rentals/", json={
+        "user_id": user_id, "vehicle_id": rented, "expected_return": (now + timedelta(days=2)).isoformat(),
+    })
+
+    assert _available(client, type_, now + timedelta(days=1), now + timedelta(days=3)) == {free}
+    # The rental is due back before this window opens
+    assert _available(client, type_, now + timedelta(days=3), now + timedelta(days=4)) == {free, rented}
+
+
+def test_availability_rejects_empty_window(client):
+    now = datetime.utcnow()
+    response = client.get("/vehicles/availability", params={"start": now.isoformat(), "end": now.isoformat()})
+    assert response.status_code == 400
@@ -0,0 +1,57 @@
+import uuid
+
+from app import notifications
+
+
+def _vehicle(client):
+    return client.post("/vehicles/", json={
+        "name": "Fleet Car", "type": "Sedan", "registration_number": f"BT-{uuid.uuid4().hex[:10]}"
+    }).json()["id"]
+
+
+def _user(client, contact):
+    return client.post("/users/", json={"name": "Fleet Customer", "contact": contact}).json()["id"]
+
+
+def test_batch_checkout_reports_each_item(client):
+    contact = f"{uuid.uuid4().hex}@example.com"
+    user_id = _user(client, contact)
+    free, taken = _vehicle(client), _vehicle(client)
+    client.post("/rentals/", json={"user_id": user_id, "vehicle_id": taken, "expected_return": "2030-01-01T10:00:00"})
+
+    items = [{"user_id": user_id, "vehicle_id": v, "expected_return": "2030-01-01T10:00:00"}
+             for v in (free, taken, 999999, free)]
+    response = client.post("/rentals/batch", json={"rentals": items})
+
+    assert response.status_code == 200
+    results = response.json()
+    assert results[0]["rental"]["vehicle_id"] == free and results[0]["error"] is None
+    assert "not available" in results[1]["error"]
+    assert "does not exist" in results[2]["error"]
+    assert "more than once" in results[3]["error"]
+    assert client.get(f"/vehicles/{free}").json()["is_available"] is False
+    confirmations = [m for m in notifications.get_sink().outbox if m.to_email == contact]
+    assert len(confirmations) == 2
+
+
+def test_batch_return(client):
+    user_id = _user(client, "fleet@example.com")
+    vehicles = [_vehicle(client), _vehicle(client)]
+    rentals = client.post("/rentals/batch", json={"rentals": [
+        {"user_id": user_id, "vehicle_id": v, "expected_return": "2030-01-01T10:00:00"} for v in vehicles
+    ]}).json()
+    rental_ids = [item["rental"]["id"] for item in rentals]
+    client.post(f"/rentals/{rental_ids[1]}/return")
+
+    response = client.post("/rentals/batch_return", json={"rental_ids": rental_ids + [999999]})
+
+    assert response.status_code == 200
+    results = response.json()
+    assert results[0]["rental"]["actual_return"] is not None
+    assert "already been returned" in results[1]["error"]
+    assert "not found" in results[2]["error"]
+    assert all(client.get(f"/vehicles/{v}").json()["is_available"] for v in vehicles)
+
+
+def test_batch_rejects_empty_request(client):
+    assert client.post("/rentals/batch", json={"rentals": []}).status_code == 422
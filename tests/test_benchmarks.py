@@ -0,0 +1,29 @@
+from sqlalchemy import create_engine, func, select
+
+from app import models
+from benchmarks.compare import compare
+from benchmarks.data import Scale, generate
+
+
+def test_seeded_fleet_is_reproducible(tmp_path):
+    scale = Scale(vehicles=20, users=10, rentals=50)
+    snapshots = []
+    for name in ("a", "b"):
+        engine = create_engine(f"sqlite:///{tmp_path / name}.db")
+        generate(engine, scale, seed=7)
+        with engine.connect() as conn:
+            snapshots.append(conn.execute(select(models.Rental.__table__).order_by(models.Rental.id)).all())
+            free = conn.execute(select(func.count()).where(models.Vehicle.is_available == True)).scalar()
+        engine.dispose()
+
+    assert snapshots[0] == snapshots[1] and len(snapshots[0]) == 50
+    assert free == scale.vehicles - scale.active
+
+
+def test_compare_flags_regressions():
+    def run(throughput, p95):
+        return {"results": {"lookup": {"requests": 100, "errors": 0, "throughput": throughput,
+                                       "p50_ms": 5.0, "p95_ms": p95, "p99_ms": 10.0}}}
+
+    flagged = {metric for _, metric, *_, regressed in compare(run(100, 8), run(80, 8.4), 10) if regressed}
+    assert flagged == {"throughput"}
@@ -0,0 +1,111 @@
+import io
+import os
+import uuid
+
+import pytest
+
+from app import importer, models
+from app.celery_app import tasks
+from app.config import settings
+
+
+def _write_csv(tmp_path, text):
+    path = tmp_path / f"{uuid.uuid4().hex}.csv"
+    path.write_text(text)
+    return str(path)
+
+
+def test_import_vehicles_upserts_on_registration_number(db, tmp_path):
+    prefix = uuid.uuid4().hex[:6].upper()
+    first = _write_csv(tmp_path, (
+        "name,type,registration_number,is_available\n"
+        f"Swift,Hatchback,{prefix}-1,True\n"
+        f"City,Sedan,{prefix}-2,False\n"
+        f",Sedan,{prefix}-3,True\n"
+    ))
+    result = importer.import_vehicles(db, first, batch_size=1)
+    assert (result.inserted, result.updated, result.skipped, result.failed) == (2, 0, 1, 0)
+
+    second = _write_csv(tmp_path, (
+        "name,type,registration_number,is_available\n"
+        f"Swift Dzire,Sedan,{prefix}-1,False\n"
+        f"Creta,SUV,{prefix}-4,True\n"
+    ))
+    result = importer.import_vehicles(db, second, batch_size=10)
+    assert (result.inserted, result.updated, result.skipped, result.failed) == (1, 1, 0, 0)
+
+    vehicle = db.query(models.Vehicle).filter(models.Vehicle.registration_number == f"{prefix}-1").one()
+    assert (vehicle.name, vehicle.type, vehicle.is_available) == ("Swift Dzire", "Sedan", True)
+
+
+def test_reimport_does_not_free_a_rented_vehicle(client, db, tmp_path):
+    registration_number = f"RI-{uuid.uuid4().hex[:10]}"
+    vehicle_id = client.post("/vehicles/", json={
+        "name": "Rented", "type": "Sedan", "registration_number": registration_number
+    }).json()["id"]
+    user_id = client.post("/users/", json={"name": "Renter", "contact": "renter@example.com"}).json()["id"]
+    rental = {"vehicle_id": vehicle_id, "user_id": user_id, "expected_return": "2030-01-01T10:00:00"}
+    assert client.post("/rentals/", json=rental).status_code == 200
+
+    path = _write_csv(tmp_path, f"name,type,registration_number,is_available\nRenamed,SUV,{registration_number},True\n")
+    assert importer.import_vehicles(db, path).updated == 1
+
+    vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == vehicle_id).one()
+    assert (vehicle.name, vehicle.type, vehicle.is_available) == ("Renamed", "SUV", False)
+    assert client.post("/rentals/", json=rental).status_code == 400
+
+
+def test_import_users_accepts_legacy_email_column(db, tmp_path):
+    contact = f"{uuid.uuid4().hex}@example.com"
+    path = _write_csv(tmp_path, f"name,email\nBulk User,{contact}\nNo Contact,\n")
+
+    result = importer.import_users(db, path)
+
+    assert (result.inserted, result.skipped) == (1, 1)
+    assert db.query(models.User).filter(models.User.contact == contact).count() == 1
+
+
+def test_split_into_shards_keeps_header_and_row_ranges(tmp_path):
+    path = _write_csv(tmp_path, "name,contact\n" + "".join(f"user {i},{i}@example.com\n" for i in range(5)))
+
+    shards, total = importer.split_into_shards(path, shard_rows=2)
+
+    assert total == 5
+    assert [shard.rsplit(".", 1)[1] for shard in shards] == ["0-2", "2-4", "4-5"]
+    assert open(shards[-1]).read().splitlines() == ["name,contact", "user 4,4@example.com"]
+
+
+def test_vehicle_bulk_upload_runs_sharded_job(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "import_shard_rows", 2)
+    monkeypatch.setattr(settings, "import_batch_size", 1)
+    prefix = f"UP-{uuid.uuid4().hex[:8]}"
+    rows = "".join(f"Nexon,SUV,{prefix}-{i}\n" for i in range(5))
+    csv_file = io.BytesIO(f"name,type,registration_number\n{rows},SUV,{prefix}-bad\n".encode())
+
+    response = client.post("/vehicles/vehicles_bulk/", files={"file": ("fleet.csv", csv_file, "text/csv")})
+    assert response.status_code == 200
+
+    job = client.get(f"/imports/{response.json()['job_id']}").json()
+    assert job["status"] == "completed"
+    assert (job["total_rows"], job["processed_rows"], job["shards_total"], job["shards_done"]) == (6, 6, 3, 3)
+    assert (job["inserted"], job["updated"], job["skipped"], job["failed"]) == (5, 0, 1, 0)
+    assert job["progress"] == 1.0
+    assert db.query(models.Vehicle).filter(models.Vehicle.registration_number.like(f"{prefix}-%")).count() == 5
+
+
+def test_upload_that_cannot_be_queued_leaves_nothing_staged(client, monkeypatch):
+    def broker_down(*args):
+        raise ConnectionError("broker down")
+
+    monkeypatch.setattr(tasks.plan_import, "delay", broker_down)
+    staged = set(os.listdir(settings.import_staging_dir))
+    upload = {"file": ("fleet.csv", io.BytesIO(b"name,type,registration_number\nA,Sedan,ST-1\n"), "text/csv")}
+
+    with pytest.raises(ConnectionError):
+        client.post("/vehicles/vehicles_bulk/", files=upload)
+
+    assert set(os.listdir(settings.import_staging_dir)) == staged
+
+
+def test_unknown_import_job_returns_404(client):
+    assert client.get("/imports/does-not-exist").status_code == 404
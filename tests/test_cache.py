@@ -0,0 +1,86 @@
+import uuid
+
+from prometheus_client import REGISTRY
+
+from app import cache, crud, models, versions
+
+
+def _lookups(result, name="vehicle"):
+    return REGISTRY.get_sample_value("cache_requests_total", {"cache": name, "result": result}) or 0
+
+
+def _vehicle(client):
+    return client.post("/vehicles/", json={
+        "name": "Cached Car", "type": "Sedan", "registration_number": f"CA-{uuid.uuid4().hex[:10]}"
+    }).json()
+
+
+def test_local_cache_evicts_least_recently_used_and_expired():
+    lru = cache.LocalCache(maxsize=2, ttl=60)
+    lru.set("a", {"id": 1})
+    lru.set("b", {"id": 2})
+    lru.get("a")
+    lru.set("c", {"id": 3})
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == ({"id": 1}, None, {"id": 3})
+
+    expired = cache.LocalCache(maxsize=2, ttl=-1)
+    expired.set("a", {"id": 1})
+    assert expired.get("a") is None
+
+
+def test_lookups_are_served_from_the_tiers(client):
+    vehicle = _vehicle(client)
+    misses, local_hits, shared_hits = _lookups("miss"), _lookups("local_hit"), _lookups("shared_hit")
+
+    client.get(f"/vehicles/{vehicle['id']}")
+    client.get(f"/vehicles/{vehicle['id']}")
+    local, _ = cache.vehicles.tiers
+    local.clear()
+    client.get(f"/vehicles/{vehicle['id']}")
+
+    assert _lookups("miss") - misses == 1
+    assert _lookups("local_hit") - local_hits == 1
+    assert _lookups("shared_hit") - shared_hits == 1
+
+
+def test_availability_is_never_stale_after_a_checkout(client, db):
+    vehicle = _vehicle(client)
+    user = client.post("/users/", json={"name": "Cache User", "contact": "cache@example.com"}).json()
+    # Another worker's cache: its own tiers, the same version store
+    other_worker = cache.ReadThrough("vehicle", versioned=True)
+    loads = []
+
+    def load():
+        loads.append(vehicle["id"])
+        db.expire_all()
+        return {**vehicle, "is_available": db.get(models.Vehicle, vehicle["id"]).is_available}
+
+    def lookup():
+        # As GET /vehicles/{id} does, with the tag it read for its ETag
+        return other_worker.get(vehicle["id"], load, versions.etag(versions.vehicle_keys(vehicle["id"])))
+
+    assert lookup()["is_available"] is True
+    assert lookup()["is_available"] is True
+    assert client.get(f"/vehicles/{vehicle['id']}").json()["is_available"] is True
+
+    rental = client.post("/rentals/", json={
+        "user_id": user["id"], "vehicle_id": vehicle["id"], "expected_return": "2030-01-01T10:00:00",
+    }).json()
+    assert client.get(f"/vehicles/{vehicle['id']}").json()["is_available"] is False
+    assert crud.get_vehicle(db, vehicle["id"]).is_available is False
+    assert lookup()["is_available"] is False
+    assert len(loads) == 2
+
+    client.post("/rentals/batch_return", json={"rental_ids": [rental["id"]]})
+    assert client.get(f"/vehicles/{vehicle['id']}").json()["is_available"] is True
+
+
+def test_lookups_without_versions_go_to_the_database(client, db):
+    vehicle = _vehicle(client)
+    bypassed, local_hits = _lookups("bypass"), _lookups("local_hit")
+
+    client.get(f"/vehicles/{vehicle['id']}")
+    assert crud.get_vehicle(db, vehicle["id"]).id == vehicle["id"]
+
+    assert _lookups("bypass") - bypassed == 1
+    assert _lookups("local_hit") - local_hits == 0
@@ -0,0 +1,54 @@
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import crud, models, schemas
+from conftest import TestingSessionLocal
+
+
+def _setup(db):
+    vehicle = crud.create_veh(db, schemas.VehicleCreate(name="Race Car", type="Sedan", registration_number=f"RC-{uuid.uuid4().hex[:10]}"))
+    user = crud.create_user(db, schemas.UserCreate(name="Racer", contact="race@example.com"))
+    return vehicle.id, user.id
+
+
+def test_concurrent_checkouts_book_a_vehicle_once(db):
+    vehicle_id, user_id = _setup(db)
+    rental = schemas.RentalCreate(vehicle_id=vehicle_id, user_id=user_id, expected_return=datetime.utcnow() + timedelta(days=1))
+    workers = 8
+    barrier = threading.Barrier(workers)
+    outcomes = []
+
+    def checkout():
+        session = TestingSessionLocal()
+        try:
+            barrier.wait()
+            crud.create_rental(session, rental)
+            outcomes.append("booked")
+        except ValueError:
+            outcomes.append("rejected")
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=checkout) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == ["booked"] + ["rejected"] * (workers - 1)
+    assert db.query(models.Rental).filter(models.Rental.vehicle_id == vehicle_id).count() == 1
+
+
+def test_return_is_applied_once(db):
+    vehicle_id, user_id = _setup(db)
+    rental = crud.create_rental(db, schemas.RentalCreate(vehicle_id=vehicle_id, user_id=user_id, expected_return=datetime.utcnow()))
+
+    returned = crud.return_vehicle(db, rental.id)
+    assert returned.actual_return is not None
+    assert crud.get_vehicle(db, vehicle_id).is_available is True
+    with pytest.raises(ValueError):
+        crud.return_vehicle(db, rental.id)
+    assert crud.return_vehicle(db, -1) is None
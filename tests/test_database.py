@@ -0,0 +1,122 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.dialects import sqlite as sqlite_dialect
+from sqlalchemy.exc import CompileError, OperationalError
+from starlette.requests import Request
+
+from app import database, dependencies, models
+from app.celery_app import celery_app
+
+
+def _request(method):
+    return Request({"type": "http", "method": method, "headers": []})
+
+
+def test_sqlite_engine_applies_pragmas(tmp_path):
+    engine = database.create_db_engine(f"sqlite:///{tmp_path / 'pragmas.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    assert engine.pool.size() == 5
+    engine.dispose()
+
+
+def test_read_only_engine_rejects_writes(tmp_path):
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    writer = database.create_db_engine(url)
+    with writer.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+    reader = database.create_db_engine(url, read_only=True)
+    with reader.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 0
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO t DEFAULT VALUES"))
+    reader.dispose()
+    writer.dispose()
+
+
+def test_returning_is_compiled_only_for_app_engines(tmp_path):
+    stmt = insert(models.User.__table__).values(name="Returned", contact="r@example.com").returning(models.User.id)
+    engine = database.create_db_engine(f"sqlite:///{tmp_path / 'returning.db'}")
+    models.User.__table__.create(engine)
+    with engine.begin() as conn:
+        assert conn.execute(stmt).scalar() == 1
+    engine.dispose()
+
+    with pytest.raises(CompileError):
+        stmt.compile(dialect=sqlite_dialect.dialect())
+
+
+class _FakeSession:
+    def __init__(self, name):
+        self.name = name
+
+    def close(self):
+        pass
+
+
+def test_get_db_routes_reads_to_read_engine(monkeypatch):
+    monkeypatch.setattr(dependencies, "ReadSessionLocal", lambda: _FakeSession("reader"))
+    monkeypatch.setattr(dependencies, "SessionLocal", lambda: _FakeSession("writer"))
+
+    def session_for(method):
+        gen = dependencies.get_db(_request(method))
+        session = next(gen)
+        gen.close()
+        return session.name
+
+    assert session_for("GET") == "reader"
+    assert session_for("HEAD") == "reader"
+    assert session_for("POST") == "writer"
+
+
+def test_importing_the_app_opens_no_database(tmp_path):
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'lazy.db'}"}
+    code = "import app.main, app.database as d; print(len(d._engines))"
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "0"
+    assert not (tmp_path / "lazy.db").exists()
+
+
+def test_forked_child_starts_on_a_fresh_pool():
+    engine = database.get_engine()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert engine.pool.checkedin() >= 1
+
+    pid = os.fork()
+    if pid == 0:
+        # The inherited connections are dropped, not closed, and new ones work
+        fresh = engine.pool.checkedin() == 0
+        with engine.connect() as conn:
+            fresh = fresh and conn.execute(text("SELECT 1")).scalar() == 1
+        os._exit(0 if fresh else 1)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.WEXITSTATUS(status) == 0
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_forked_child_starts_on_a_fresh_broker_pool():
+    # Broker connections are lazy, so this needs no broker
+    inherited = celery_app.pool.acquire()
+    inherited.release()
+
+    pid = os.fork()
+    if pid == 0:
+        connection = celery_app.pool.acquire()
+        fresh = connection is not inherited
+        connection.release()
+        os._exit(0 if fresh else 1)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.WEXITSTATUS(status) == 0
+    connection = celery_app.pool.acquire()
+    assert connection is inherited
+    connection.release()
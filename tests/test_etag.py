@@ -0,0 +1,81 @@
+import time
+import uuid
+
+from sqlalchemy import event
+
+from app import importer, versions
+from app.config import settings
+
+from conftest import engine
+
+
+def _vehicle(client):
+    return client.post("/vehicles/", json={
+        "name": "Tagged Car", "type": "Sedan", "registration_number": f"ET-{uuid.uuid4().hex[:10]}"
+    }).json()
+
+
+def test_unchanged_vehicle_is_not_modified_without_a_query(client):
+    vehicle = _vehicle(client)
+    first = client.get(f"/vehicles/{vehicle['id']}")
+    tag = first.headers["ETag"]
+
+    queries = []
+    listener = lambda *args: queries.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        cached = client.get(f"/vehicles/{vehicle['id']}", headers={"If-None-Match": tag})
+        weak = client.get(f"/vehicles/{vehicle['id']}", headers={"If-None-Match": f'"other", W/{tag}'})
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert (cached.status_code, cached.headers["ETag"], cached.content) == (304, tag, b"")
+    assert weak.status_code == 304
+    assert queries == []
+
+
+def test_writes_change_the_tags(client, db, tmp_path):
+    vehicle = _vehicle(client)
+    item_tag = client.get(f"/vehicles/{vehicle['id']}").headers["ETag"]
+    list_tag = client.get("/vehicles/").headers["ETag"]
+    assert client.get("/vehicles/", headers={"If-None-Match": list_tag}).status_code == 304
+
+    user = client.post("/users/", json={"name": "Tagger", "contact": "tag@example.com"}).json()
+    client.post("/rentals/", json={"user_id": user["id"], "vehicle_id": vehicle["id"], "expected_return": "2030-01-01T10:00:00"})
+
+    changed = client.get(f"/vehicles/{vehicle['id']}", headers={"If-None-Match": item_tag})
+    assert changed.status_code == 200
+    assert changed.json()["is_available"] is False
+    assert client.get("/vehicles/", headers={"If-None-Match": list_tag}).status_code == 200
+
+    # Bulk imports invalidate every vehicle's tag
+    item_tag = changed.headers["ETag"]
+    path = tmp_path / "vehicles.csv"
+    path.write_text(f"name,type,registration_number\nImported,SUV,ET-{uuid.uuid4().hex[:10]}\n")
+    importer.import_vehicles(db, str(path))
+    assert client.get(f"/vehicles/{vehicle['id']}", headers={"If-None-Match": item_tag}).status_code == 200
+
+
+def test_reads_and_writes_work_while_the_version_store_is_down(client, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "version_retry_interval", 0.05)
+    vehicle = _vehicle(client)
+    tag = client.get(f"/vehicles/{vehicle['id']}").headers["ETag"]
+    store = versions.get_store()
+    # Nothing listens on port 1
+    monkeypatch.setattr(versions, "_store", versions.create_store("redis://127.0.0.1:1/0"))
+
+    listed, item = client.get("/vehicles/"), client.get(f"/vehicles/{vehicle['id']}", headers={"If-None-Match": tag})
+    assert (listed.status_code, item.status_code) == (200, 200)
+    assert "ETag" not in listed.headers and "ETag" not in item.headers
+    user = client.post("/users/", json={"name": "Offline", "contact": "offline@example.com"}).json()
+    assert client.post("/rentals/", json={
+        "user_id": user["id"], "vehicle_id": vehicle["id"], "expected_return": "2030-01-01T10:00:00",
+    }).status_code == 200
+    assert "Could not bump version counters" in caplog.text
+
+    # Once the store is back the missed bump goes out on its own, without waiting for another write
+    monkeypatch.setattr(versions, "_store", store)
+    deadline = time.monotonic() + 2
+    while versions._unbumped and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert client.get(f"/vehicles/{vehicle['id']}", headers={"If-None-Match": tag}).status_code == 200
@@ -0,0 +1,91 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.config import settings
+from app.main import create_app
+from app.pagination import encode_cursor
+
+from conftest import engine
+
+
+def _customer_with_rentals(client, count):
+    user = client.post("/users/", json={"name": "Expanded", "contact": "expand@example.com"}).json()
+    rentals = []
+    for _ in range(count):
+        vehicle = client.post("/vehicles/", json={
+            "name": "Expanded Car", "type": "Sedan", "registration_number": f"EX-{uuid.uuid4().hex[:10]}"
+        }).json()
+        rentals.append(client.post("/rentals/", json={
+            "user_id": user["id"], "vehicle_id": vehicle["id"], "expected_return": "2030-01-01T10:00:00",
+        }).json())
+    return user, rentals
+
+
+def _queries(request):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        response = request()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return response, len(statements)
+
+
+def test_expand_rentals_with_one_query_per_relation(client):
+    user, rentals = _customer_with_rentals(client, 3)
+    params = {"user_id": user["id"], "expand": "user,vehicle"}
+
+    response, queries = _queries(lambda: client.get("/rentals/", params=params))
+    _, single_row_queries = _queries(lambda: client.get("/rentals/", params={**params, "limit": 1}))
+
+    items = response.json()
+    assert [item["id"] for item in items] == [rental["id"] for rental in rentals]
+    assert all(item["user"] == user for item in items)
+    assert [item["vehicle"]["id"] for item in items] == [rental["vehicle_id"] for rental in rentals]
+    assert all(item["vehicle"]["is_available"] is False for item in items)
+    # The page, then one SELECT ... IN per relation, however many rows
+    assert queries == single_row_queries == 3
+
+    plain = client.get("/rentals/", params={"user_id": user["id"]}).json()
+    assert plain == [{key: item[key] for key in rentals[0]} for item in items]
+
+
+def test_expand_single_resources(client):
+    user, rentals = _customer_with_rentals(client, 2)
+
+    expanded_user = client.get(f"/users/{user['id']}", params={"expand": "rentals"}).json()
+    assert expanded_user == {**user, "rentals": rentals}
+    rental = client.get(f"/rentals/{rentals[0]['id']}", params={"expand": "vehicle"}).json()
+    assert set(rental) == set(rentals[0]) | {"vehicle"}
+    assert client.get(f"/users/{user['id']}").json() == user
+
+    assert client.get("/rentals/", params={"expand": "user,owner"}).status_code == 400
+
+
+def test_expand_on_async_routes(client):
+    user, rentals = _customer_with_rentals(client, 2)
+    with TestClient(create_app(async_db=True)) as async_client:
+        items = async_client.get("/rentals/", params={"user_id": user["id"], "expand": "user,vehicle"}).json()
+        expanded_user = async_client.get(f"/users/{user['id']}", params={"expand": "rentals"}).json()
+    assert [item["user"]["id"] for item in items] == [user["id"]] * 2
+    assert [rental["id"] for rental in expanded_user["rentals"]] == [rental["id"] for rental in rentals]
+
+
+def test_expanded_rentals_are_capped_per_user(client, monkeypatch):
+    monkeypatch.setattr(settings, "expand_many_limit", 2)
+    user, rentals = _customer_with_rentals(client, 3)
+    other, other_rentals = _customer_with_rentals(client, 1)
+
+    expanded_user = client.get(f"/users/{user['id']}", params={"expand": "rentals"}).json()
+    assert expanded_user["rentals"] == rentals[1:]
+
+    response, queries = _queries(lambda: client.get("/users/", params={
+        "expand": "rentals", "cursor": encode_cursor(user["id"] - 1), "limit": 2,
+    }))
+    by_id = {item["id"]: item["rentals"] for item in response.json()}
+    assert by_id[user["id"]] == rentals[1:] and by_id[other["id"]] == other_rentals
+    # The page, then one windowed SELECT for every user's latest rentals
+    assert queries == 2
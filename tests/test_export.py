@@ -0,0 +1,58 @@
+import csv
+import gzip
+import io
+import itertools
+import uuid
+from datetime import datetime, timedelta
+
+import orjson
+
+from app import archive, export
+
+
+def _rental(client):
+    user_id = client.post("/users/", json={"name": "Exported", "contact": "export@example.com"}).json()["id"]
+    vehicle_id = client.post("/vehicles/", json={
+        "name": "Export Car", "type": "Export", "registration_number": f"XP-{uuid.uuid4().hex[:10]}"
+    }).json()["id"]
+    return client.post("/rentals/", json={
+        "user_id": user_id, "vehicle_id": vehicle_id, "expected_return": "2030-01-01T10:00:00",
+    }).json()
+
+
+def test_rental_export_merges_live_and_archived(client, db, archive_db):
+    since = datetime.utcnow()
+    archived = client.post(f"/rentals/{_rental(client)['id']}/return").json()
+    archive.archive_rentals(db, archive_db, datetime.utcnow() + timedelta(seconds=1), batch_size=100, max_batches=100)
+    live = [_rental(client) for _ in range(3)]
+
+    response = client.get("/export/rentals", params={"start": since.isoformat(), "format": "ndjson"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [orjson.loads(line) for line in response.content.splitlines()]
+    assert rows == [archived, *live]
+
+    recent = client.get("/export/rentals", params={"start": since.isoformat(), "include_archived": False})
+    lines = list(csv.DictReader(io.StringIO(recent.text)))
+    assert [int(line["id"]) for line in lines] == [rental["id"] for rental in live]
+    assert lines[0]["actual_return"] == "" and lines[0]["rent_start"] == live[0]["rent_start"]
+
+    assert client.get("/export/rentals", params={"start": "2030-01-02", "end": "2030-01-01"}).status_code == 400
+
+
+def test_vehicle_export_gzip(client):
+    rental = _rental(client)
+    response = client.get("/export/vehicles", params={"type": "Export", "is_available": False, "gzip": True})
+
+    assert response.headers["content-disposition"] == 'attachment; filename="vehicles.csv.gz"'
+    lines = list(csv.DictReader(io.StringIO(gzip.decompress(response.content).decode())))
+    assert rental["vehicle_id"] in [int(line["id"]) for line in lines]
+    assert {line["is_available"] for line in lines} == {"false"}
+
+
+def test_encoding_is_lazy():
+    # An endless result: chunks come out one at a time without reading ahead
+    rows = ((i, f"user {i}") for i in itertools.count())
+    chunks = export.encode("ndjson", ["id", "name"], rows, chunk_size=2)
+
+    assert next(chunks) == b'{"id":0,"name":"user 0"}\n{"id":1,"name":"user 1"}\n'
+    assert next(chunks).startswith(b'{"id":2,')
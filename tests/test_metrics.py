@@ -0,0 +1,47 @@
+import logging
+import uuid
+
+from prometheus_client import REGISTRY
+
+from app.celery_app import tasks
+from app.config import settings
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_requests_record_latency_and_sql_counts(client):
+    vehicle_id = client.post("/vehicles/", json={
+        "name": "Metric Car", "type": "Sedan", "registration_number": f"MT-{uuid.uuid4().hex[:10]}"
+    }).json()["id"]
+    labels = {"method": "GET", "route": "/vehicles/{vehicle_id}"}
+    before = _sample("http_request_db_queries_sum", **labels), _sample("http_request_db_queries_count", **labels)
+
+    assert client.get(f"/vehicles/{vehicle_id}").status_code == 200
+
+    assert _sample("http_request_db_queries_count", **labels) == before[1] + 1
+    assert _sample("http_request_db_queries_sum", **labels) >= before[0] + 1
+    assert _sample("http_request_duration_seconds_count", status="200", **labels) >= 1
+    body = client.get("/metrics").text
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/vehicles/{vehicle_id}"' in body
+
+
+def test_slow_requests_are_logged_with_their_sql(client, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "slow_request_ms", 0)
+    with caplog.at_level(logging.WARNING, logger="app.metrics"):
+        client.get("/users/", params={"limit": 1})
+
+    message = next(r.getMessage() for r in caplog.records if r.name == "app.metrics")
+    assert message.startswith("Slow request GET /users/")
+    assert "SELECT" in message
+
+
+def test_celery_tasks_record_runtime_and_queries():
+    name = tasks.flush_rental_confirmations.name
+    before = _sample("celery_task_duration_seconds_count", task=name, state="SUCCESS")
+
+    tasks.flush_rental_confirmations.delay()
+
+    assert _sample("celery_task_duration_seconds_count", task=name, state="SUCCESS") == before + 1
+    assert _sample("celery_task_db_queries_count", task=name) >= 1
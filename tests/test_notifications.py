@@ -0,0 +1,95 @@
+import smtplib
+import uuid
+
+import pytest
+
+from app import notifications
+from app.celery_app import tasks
+from smtp_stub import SMTPStub
+
+
+def _rent(client, contact):
+    user_id = client.post("/users/", json={"name": "Notify User", "contact": contact}).json()["id"]
+    vehicle_id = client.post("/vehicles/", json={
+        "name": "Notify Car", "type": "Sedan", "registration_number": f"NT-{uuid.uuid4().hex[:10]}"
+    }).json()["id"]
+    response = client.post("/rentals/", json={
+        "user_id": user_id, "vehicle_id": vehicle_id, "expected_return": "2030-01-01T10:00:00",
+    })
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def _confirmations(contacts):
+    return [m for m in notifications.get_sink().outbox
+            if m.subject == "Rental Confirmation" and m.to_email in contacts]
+
+
+def test_confirmations_in_one_window_share_a_flush(client, monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(tasks.flush_rental_confirmations, "apply_async", lambda **kw: scheduled.append(kw))
+    contacts = {f"{uuid.uuid4().hex}@example.com" for _ in range(3)}
+
+    for contact in contacts:
+        _rent(client, contact)
+    assert len(scheduled) == 1
+    assert _confirmations(contacts) == []
+
+    assert tasks.flush_rental_confirmations() == 3
+    assert {m.to_email for m in _confirmations(contacts)} == contacts
+    assert notifications.pending_confirmations().pop(10) == []
+
+
+def test_failed_flush_requeues_the_batch(client, monkeypatch):
+    monkeypatch.setattr(tasks.flush_rental_confirmations, "apply_async", lambda **kw: None)
+    contact = f"{uuid.uuid4().hex}@example.com"
+    rental_id = _rent(client, contact)
+
+    def broken(messages):
+        raise ConnectionError("relay down")
+
+    sink = notifications.get_sink()
+    monkeypatch.setattr(sink, "send_many", broken)
+    with pytest.raises(ConnectionError):
+        tasks.flush_rental_confirmations()
+    monkeypatch.undo()
+
+    assert notifications.pending_confirmations().pop(10) == [rental_id]
+
+
+def test_smtp_sink_reuses_one_connection():
+    with SMTPStub() as stub:
+        sink = notifications.SMTPSink("127.0.0.1", stub.port, sender="rentals@example.com")
+        sink.send_many(notifications.Message(f"u{i}@example.com", "Hi", "Body") for i in range(3))
+        sink.send_many([notifications.Message("late@example.com", "Hi", "Body")])
+        sink.close()
+
+    assert stub.connections == 1
+    assert len(stub.messages) == 4
+
+
+def test_failed_flush_requeues_only_unsent_confirmations(client, monkeypatch):
+    monkeypatch.setattr(tasks.flush_rental_confirmations, "apply_async", lambda **kw: None)
+    contacts = [f"{uuid.uuid4().hex}@example.com" for _ in range(3)]
+    rental_ids = {contact: _rent(client, contact) for contact in contacts}
+
+    delivered = []
+    with SMTPStub() as stub:
+        sink = notifications.SMTPSink("127.0.0.1", stub.port, sender="rentals@example.com")
+        send = sink._send
+
+        def relay_drops_after_two(message):
+            if len(delivered) == 2:
+                raise smtplib.SMTPServerDisconnected("relay went away")
+            send(message)
+            delivered.append(message.to_email)
+
+        monkeypatch.setattr(sink, "_send", relay_drops_after_two)
+        monkeypatch.setattr(notifications, "_sink", sink)
+        with pytest.raises(notifications.SendFailed):
+            tasks.flush_rental_confirmations()
+        sink.close()
+
+    assert len(stub.messages) == 2
+    unsent = [rental_ids[contact] for contact in contacts if contact not in delivered]
+    assert notifications.pending_confirmations().pop(10) == unsent
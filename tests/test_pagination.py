@@ -0,0 +1,84 @@
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+
+from app import crud, schemas
+
+
+def _create_vehicles(client, count, type_):
+    return [
+        client.post("/vehicles/", json={
+            "name": f"Page Car {i}", "type": type_, "registration_number": f"PG-{uuid.uuid4().hex[:10]}"
+        }).json()["id"]
+        for i in range(count)
+    ]
+
+
+def test_vehicles_keyset_pagination_follows_cursor(client):
+    type_ = f"Type-{uuid.uuid4().hex[:6]}"
+    ids = _create_vehicles(client, 5, type_)
+
+    seen, cursor = [], None
+    while True:
+        params = {"type": type_, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/vehicles/", params=params)
+        assert response.status_code == 200
+        seen.extend(v["id"] for v in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        assert 'rel="next"' in response.headers["Link"]
+
+    assert seen == ids
+
+
+def test_vehicles_filter_by_availability(client):
+    type_ = f"Type-{uuid.uuid4().hex[:6]}"
+    available, rented = _create_vehicles(client, 2, type_)
+    user_id = client.post("/users/", json={"name": "Filter User", "contact": "filter@example.com"}).json()["id"]
+    client.post("/rentals/", json={
+        "user_id": user_id, "vehicle_id": rented,
+        "expected_return": (datetime.now() + timedelta(days=1)).isoformat(),
+    })
+
+    response = client.get("/vehicles/", params={"type": type_, "is_available": False})
+    assert [v["id"] for v in response.json()] == [rented]
+
+
+def test_rentals_filters(client):
+    user_id = client.post("/users/", json={"name": "Rental Filter", "contact": "rf@example.com"}).json()["id"]
+    first, second = _create_vehicles(client, 2, "Sedan")
+    due = datetime.now() + timedelta(days=3)
+    returned = client.post("/rentals/", json={"user_id": user_id, "vehicle_id": first, "expected_return": due.isoformat()}).json()
+    active = client.post("/rentals/", json={"user_id": user_id, "vehicle_id": second, "expected_return": (due + timedelta(days=2)).isoformat()}).json()
+    client.post(f"/rentals/{returned['id']}/return")
+
+    def ids(**params):
+        return [r["id"] for r in client.get("/rentals/", params={"user_id": user_id, **params}).json()]
+
+    assert ids() == [returned["id"], active["id"]]
+    assert ids(status="active") == [active["id"]]
+    assert ids(status="returned") == [returned["id"]]
+    assert ids(vehicle_id=second) == [active["id"]]
+    assert ids(expected_return_to=(due + timedelta(days=1)).isoformat()) == [returned["id"]]
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get("/users/", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/users/", params={"limit": 0}).status_code == 422
+
+
+def test_list_rows_match_response_model(client, db):
+    _create_vehicles(client, 2, "Sedan")
+    rentals = client.get("/rentals/", params={"limit": 50}).json()
+    vehicles = client.get("/vehicles/", params={"limit": 50}).json()
+
+    for item in rentals:
+        assert item == jsonable_encoder(schemas.Rental.from_orm(crud.get_rental(db, item["id"])))
+    for item in vehicles:
+        assert item == jsonable_encoder(schemas.Vehicle.from_orm(crud.get_vehicle(db, item["id"])))
+    schema = client.get("/openapi.json").json()["paths"]["/rentals/"]["get"]["responses"]["200"]
+    assert schema["content"]["application/json"]["schema"]["items"]["$ref"].endswith("/RentalExpanded")
@@ -0,0 +1,103 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import models, notifications
+from app.celery_app import tasks
+
+
+class _Outbox:
+    def __init__(self, outbox):
+        self.outbox = outbox
+
+    def count(self, to_email):
+        return sum(1 for m in self.outbox if m.to_email == to_email and m.subject == "Rental Return Reminder")
+
+
+@pytest.fixture
+def sent_emails():
+    return _Outbox(notifications.get_sink().outbox)
+
+
+def _rent(client, contact, due_in):
+    user_id = client.post("/users/", json={"name": "Reminder User", "contact": contact}).json()["id"]
+    vehicle_id = client.post("/vehicles/", json={
+        "name": "Reminder Car", "type": "Sedan", "registration_number": f"RM-{uuid.uuid4().hex[:10]}"
+    }).json()["id"]
+    return client.post("/rentals/", json={
+        "user_id": user_id, "vehicle_id": vehicle_id,
+        "expected_return": (datetime.now() + due_in).isoformat(),
+    }).json()["id"]
+
+
+def test_reminders_are_sent_once_per_due_date(client, db, sent_emails):
+    contact = f"{uuid.uuid4().hex}@example.com"
+    rental_id = _rent(client, contact, timedelta(hours=12))
+
+    tasks.send_return_reminders()
+    tasks.send_return_reminders()
+
+    assert sent_emails.count(contact) == 1
+    ledger = db.query(models.RentalReminder).filter(models.RentalReminder.rental_id == rental_id).one()
+    assert ledger.sent_at is not None
+
+
+def test_rental_created_inside_scanned_window_is_picked_up(client, sent_emails):
+    tasks.send_return_reminders()
+    contact = f"{uuid.uuid4().hex}@example.com"
+    # Due well before the horizon the previous tick already scanned up to
+    _rent(client, contact, timedelta(hours=3))
+
+    tasks.send_return_reminders()
+
+    assert sent_emails.count(contact) == 1
+
+
+def _reminder(rental_id, contact):
+    return {
+        "rental_id": rental_id, "expected_return": "2030-01-01T10:00:00",
+        "user_name": "Reminder User", "contact": contact,
+        "vehicle_name": "Reminder Car", "registration_number": "RM",
+    }
+
+
+def test_redelivered_batch_does_not_resend(client, sent_emails):
+    contact = f"{uuid.uuid4().hex}@example.com"
+    reminder = _reminder(_rent(client, contact, timedelta(hours=6)), contact)
+
+    tasks.send_reminder_batch.delay([dict(reminder)])
+    tasks.send_reminder_batch.delay([dict(reminder)])
+
+    assert sent_emails.count(contact) == 1
+
+
+def test_redelivery_of_the_same_task_does_not_resend(client, sent_emails):
+    # acks_late or a worker crash delivers the same task id again
+    contact = f"{uuid.uuid4().hex}@example.com"
+    reminder = _reminder(_rent(client, contact, timedelta(hours=6)), contact)
+    task_id = uuid.uuid4().hex
+
+    tasks.send_reminder_batch.apply(args=[[dict(reminder)]], task_id=task_id)
+    tasks.send_reminder_batch.apply(args=[[dict(reminder)]], task_id=task_id)
+
+    assert sent_emails.count(contact) == 1
+
+
+def test_failed_send_is_retried(client, sent_emails, monkeypatch):
+    contact = f"{uuid.uuid4().hex}@example.com"
+    reminder = _reminder(_rent(client, contact, timedelta(hours=6)), contact)
+    sink = notifications.get_sink()
+    send_many, attempts = sink.send_many, []
+
+    def fails_once(messages):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("relay down")
+        send_many(messages)
+
+    monkeypatch.setattr(sink, "send_many", fails_once)
+    tasks.send_reminder_batch.delay([dict(reminder)])
+
+    assert len(attempts) == 2
+    assert sent_emails.count(contact) == 1
@@ -0,0 +1,65 @@
+import uuid
+from datetime import date, datetime
+
+import pytest
+
+from app import models, rollups
+from app.celery_app import tasks
+
+
+def _snapshot(db):
+    db.expire_all()
+    usage = {(r.day, r.vehicle_type): (pytest.approx(r.rented_seconds), r.returns, pytest.approx(r.returned_seconds), r.late_returns)
+             for r in db.query(models.DailyTypeUsage) if r.returns or r.rented_seconds}
+    customers = {r.user_id: (r.rentals, pytest.approx(r.rental_seconds)) for r in db.query(models.CustomerTotal) if r.rentals}
+    return usage, customers
+
+
+def _checkout(client, user_id, type_):
+    vehicle_id = client.post("/vehicles/", json={
+        "name": "Report Car", "type": type_, "registration_number": f"RP-{uuid.uuid4().hex[:10]}"
+    }).json()["id"]
+    return client.post("/rentals/", json={
+        "user_id": user_id, "vehicle_id": vehicle_id, "expected_return": "2030-01-01T10:00:00",
+    }).json()["id"]
+
+
+def test_day_slices_split_at_midnight():
+    slices = list(rollups.day_slices(datetime(2024, 1, 1, 22), datetime(2024, 1, 3, 1)))
+    assert slices == [(date(2024, 1, 1), 7200.0), (date(2024, 1, 2), 86400.0), (date(2024, 1, 3), 3600.0)]
+
+
+def test_incremental_rollups_match_a_rebuild(client, db, archive_db):
+    type_ = f"Type-{uuid.uuid4().hex[:6]}"
+    user_id = client.post("/users/", json={"name": "Top Customer", "contact": "top@example.com"}).json()["id"]
+    rentals = [_checkout(client, user_id, type_) for _ in range(3)]
+    client.post(f"/rentals/{rentals[0]}/return")
+    client.post("/rentals/batch_return", json={"rental_ids": [rentals[1]]})
+    client.delete(f"/rentals/{rentals[2]}")
+
+    # The writes only recorded their changes; the rollups move when the outbox is folded
+    before = _snapshot(db)
+    assert tasks.fold_rollups() >= 6
+    assert db.query(models.RollupChange).count() == 0
+    incremental = _snapshot(db)
+    assert incremental != before
+    rollups.rebuild(db, archive_db=archive_db)
+    assert _snapshot(db) == incremental
+
+    lengths = client.get("/reports/rental_length", params={"type": type_}).json()
+    assert lengths == [{"vehicle_type": type_, "returns": 2, "average_hours": pytest.approx(0, abs=0.01), "late_returns": 0}]
+    top = client.get("/reports/top_customers", params={"limit": 100}).json()
+    assert {"user_id": user_id, "rentals": 2} in [{"user_id": c["user_id"], "rentals": c["rentals"]} for c in top]
+
+
+def test_utilization_includes_rentals_still_out(client):
+    type_ = f"Type-{uuid.uuid4().hex[:6]}"
+    user_id = client.post("/users/", json={"name": "Active", "contact": "active@example.com"}).json()["id"]
+    _checkout(client, user_id, type_)
+
+    rows = client.get("/reports/utilization", params={"type": type_}).json()
+
+    assert [row["fleet_size"] for row in rows] == [1]
+    assert 0 <= rows[0]["utilization"] <= 1
+    assert client.get("/reports/overdue").json()["overdue"] >= 0
+    assert client.get("/reports/utilization", params={"start": "2024-02-01", "end": "2024-01-01"}).status_code == 400
@@ -0,0 +1,54 @@
+import uuid
+
+from sqlalchemy import text
+
+
+def _vehicle(client, name, registration_number, type_="Sedan"):
+    return client.post("/vehicles/", json={
+        "name": name, "type": type_, "registration_number": registration_number,
+    }).json()["id"]
+
+
+def test_search_vehicles_by_substring(client):
+    tag = uuid.uuid4().hex[:8]
+    plate = _vehicle(client, "Fleet Car", f"SR-{tag}-01")
+    named = _vehicle(client, f"Car {tag} Deluxe", "SR-OTHER-01")
+    _vehicle(client, "Unrelated", "SR-NONE-01")
+
+    response = client.get("/vehicles/search", params={"q": tag})
+
+    assert response.status_code == 200
+    results = response.json()
+    # Registration number is weighted above name
+    assert [v["id"] for v in results] == [plate, named]
+    assert results[0]["is_available"] is True
+    assert client.get("/vehicles/search", params={"q": tag[2:7].upper()}).json()[0]["id"] == plate
+    assert len(client.get("/vehicles/search", params={"q": tag, "limit": 1}).json()) == 1
+
+
+def test_search_index_follows_updates_and_deletes(client, db):
+    tag = uuid.uuid4().hex[:8]
+    vehicle_id = _vehicle(client, "Before", f"SU-{tag}")
+    db.execute(text("UPDATE vehicles SET registration_number = :reg WHERE id = :id"), {"reg": "SU-renamed", "id": vehicle_id})
+    db.commit()
+    assert client.get("/vehicles/search", params={"q": tag}).json() == []
+
+    user_id = client.post("/users/", json={"name": f"Searchable {tag}", "contact": f"{tag}@example.com"}).json()["id"]
+    assert [u["id"] for u in client.get("/users/search", params={"q": tag}).json()] == [user_id]
+    db.execute(text("DELETE FROM users WHERE id = :id"), {"id": user_id})
+    db.commit()
+    assert client.get("/users/search", params={"q": tag}).json() == []
+
+
+def test_search_rejects_short_queries(client):
+    assert client.get("/vehicles/search", params={"q": "ab"}).status_code == 422
+    assert client.get("/users/search").status_code == 422
+
+
+def test_search_uses_the_index(db):
+    plan = [row[3] for row in db.execute(text(
+        "EXPLAIN QUERY PLAN SELECT t.id FROM vehicles_fts JOIN vehicles t ON t.id = vehicles_fts.rowid "
+        "WHERE vehicles_fts MATCH :q"), {"q": '"abc"'})]
+    # A MATCH lookup on the trigram index, then primary-key lookups; never a scan of vehicles
+    assert plan[0].startswith("SCAN vehicles_fts VIRTUAL TABLE INDEX") and ":M" in plan[0]
+    assert plan[1].startswith("SEARCH t")
@@ -0,0 +1,75 @@
+import uuid
+
+import pytest
+from sqlalchemy import event, func
+
+from app import crud, models, schemas
+
+from conftest import engine
+
+
+def _vehicle(client):
+    return client.post("/vehicles/", json={
+        "name": "Unit Car", "type": "Sedan", "registration_number": f"UW-{uuid.uuid4().hex[:10]}"
+    }).json()
+
+
+def _users(db, contact):
+    return db.query(func.count(models.User.id)).filter(models.User.contact == contact).scalar()
+
+
+def test_onboard_and_rent_commits_once(client, db):
+    vehicle = _vehicle(client)
+    contact = f"{uuid.uuid4().hex[:8]}@example.com"
+    commits = []
+    listener = lambda *args: commits.append(args)
+    event.listen(engine, "commit", listener)
+    try:
+        response = client.post("/users/Onboard&Rent", json={
+            "name": "Onboarded", "contact": contact, "vehicle_id": vehicle["id"], "expected_return": "2030-01-01T10:00:00",
+        })
+    finally:
+        event.remove(engine, "commit", listener)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["rental"]["user_id"] == body["user"]["id"] and body["user"]["contact"] == contact
+    assert len(commits) == 1
+    assert client.get(f"/vehicles/{vehicle['id']}").json()["is_available"] is False
+
+
+def test_onboard_and_rent_leaves_no_user_behind(client, db):
+    vehicle = _vehicle(client)
+    first = client.post("/users/Onboard&Rent", json={
+        "name": "First", "contact": "first@example.com", "vehicle_id": vehicle["id"], "expected_return": "2030-01-01T10:00:00",
+    })
+    contact = f"{uuid.uuid4().hex[:8]}@example.com"
+    second = client.post("/users/Onboard&Rent", json={
+        "name": "Second", "contact": contact, "vehicle_id": vehicle["id"], "expected_return": "2030-01-01T10:00:00",
+    })
+
+    assert first.status_code == 200
+    assert (second.status_code, second.json()["detail"]) == (400, f"Vehicle with ID {vehicle['id']} is not available for rental.")
+    assert _users(db, contact) == 0
+
+    missing = client.post("/users/Onboard&Rent", json={
+        "name": "Third", "contact": contact, "vehicle_id": 999999999, "expected_return": "2030-01-01T10:00:00",
+    })
+    assert missing.json()["detail"] == "Vehicle with ID 999999999 does not exist."
+
+
+def test_failed_step_rolls_back_the_whole_unit(client, db):
+    vehicle = _vehicle(client)
+    contact = f"{uuid.uuid4().hex[:8]}@example.com"
+    with pytest.raises(ValueError):
+        with crud.unit_of_work(db):
+            user = crud.create_user(db, schemas.UserCreate(name="Rolled Back", contact=contact))
+            crud.create_rental(db, schemas.RentalCreate(
+                vehicle_id=vehicle["id"], user_id=user.id, expected_return="2030-01-01T10:00:00",
+            ))
+            crud.create_rental(db, schemas.RentalCreate(
+                vehicle_id=vehicle["id"], user_id=user.id, expected_return="2030-01-01T10:00:00",
+            ))
+
+    assert _users(db, contact) == 0
+    assert client.get(f"/vehicles/{vehicle['id']}").json()["is_available"] is True